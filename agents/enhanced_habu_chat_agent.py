@@ -5,27 +5,38 @@ Uses OpenAI GPT-4 for intelligent conversation and tool orchestration
 import json
 import os
 import logging
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Optional
 import openai
 from openai import AsyncOpenAI
 import keyring
-from tools.habu_list_partners import habu_list_partners
-from tools.habu_enhanced_templates import habu_enhanced_templates, habu_list_templates
-from tools.habu_submit_query import habu_submit_query
-from tools.habu_check_status import habu_check_status
-from tools.habu_get_results import habu_get_results
-from tools.habu_list_exports import habu_list_exports, habu_download_export
+from tools.habu_list_partners import habu_list_partners_result
+from tools.habu_enhanced_templates import habu_enhanced_templates_result
+from tools.habu_submit_query import habu_submit_query_result
+from tools.habu_check_status import habu_check_status_result
+from tools.habu_get_results import habu_get_results_result
+from tools.habu_list_exports import habu_list_exports_result, habu_download_export_result
 from utils.error_handling import (
-    retry_async,
-    format_error_response,
+    RetryPolicy,
     APIError,
     AuthenticationError,
     openai_circuit_breaker,
     with_circuit_breaker
 )
+from utils.rate_limiter import openai_rate_limiter, parse_retry_after
+from utils.tool_result import ToolResult
 
 logger = logging.getLogger(__name__)
 
+# Transient OpenAI failures are retried here, around the single API call,
+# rather than by re-running the whole request
+openai_retry_policy = RetryPolicy(
+    "openai_chat",
+    max_attempts=int(os.getenv("OPENAI_RETRY_MAX_ATTEMPTS", "3")),
+    base_delay=0.5,
+    max_delay=10.0,
+    retry_on=(openai.APIConnectionError,)
+)
+
 class EnhancedHabuChatAgent:
     """
     LLM-powered agent for intelligent interaction with Habu Clean Room API.
@@ -71,7 +82,8 @@ class EnhancedHabuChatAgent:
                         continue
             
             if api_key and api_key.startswith('sk-'):
-                self.client = AsyncOpenAI(api_key=api_key)
+                # Retries go through _create_chat_completion so they respect the shared rate limit
+                self.client = AsyncOpenAI(api_key=api_key, max_retries=0)
                 logger.info("✅ OpenAI client initialized successfully")
             else:
                 logger.warning(f"❌ No valid OpenAI API key found. Key present: {bool(api_key)}, Valid format: {api_key.startswith('sk-') if api_key else False}")
@@ -81,7 +93,26 @@ class EnhancedHabuChatAgent:
             logger.error(f"⚠️ Failed to setup OpenAI client: {e}. Using rule-based fallback.")
             self.client = None
     
-    @retry_async(max_retries=2, delay=1.0)
+    async def _create_chat_completion(self, **kwargs):
+        """
+        Call the OpenAI chat API through the cluster-wide rate limiter.
+        
+        A 429 with Retry-After pauses the shared bucket for every instance; the
+        retry policy then retries transient failures, waiting on the limiter
+        (which gives up, without retrying, past its max wait).
+        """
+        async def attempt():
+            await openai_rate_limiter.acquire()
+            try:
+                return await self.client.chat.completions.create(**kwargs)
+            except openai.RateLimitError as e:
+                retry_after = parse_retry_after(e.response.headers.get("retry-after"))
+                if retry_after is not None:
+                    await openai_rate_limiter.block_for(retry_after)
+                raise
+        
+        return await openai_retry_policy.call(attempt)
+    
     async def process_request(self, user_input: str) -> str:
         """
         Process a natural language request using LLM-powered understanding.
@@ -164,6 +195,14 @@ class EnhancedHabuChatAgent:
         
         return " | ".join(context_parts) if context_parts else "New conversation"
     
+    def downstream(self) -> str:
+        """Service a request mostly waits on (picks the admission limiter for /api/enhanced-chat)"""
+        return "openai" if self.client else "habu"
+    
+    def context_fingerprint(self) -> str:
+        """Conversation state that changes the answer to the same prompt (used in chat cache keys)"""
+        return f"{self._get_context_summary()} | last_query={self.last_query_id or 'None'} | llm={bool(self.client)}"
+    
     @with_circuit_breaker(openai_circuit_breaker)
     async def _llm_powered_processing(self, user_input: str) -> str:
         """Process request using LLM for intent understanding and tool orchestration."""
@@ -321,7 +360,7 @@ Always use JSON actions for these query patterns:
 
         try:
             # Create the conversation with GPT-4
-            response = await self.client.chat.completions.create(
+            response = await self._create_chat_completion(
                 model="gpt-4o",  # Using GPT-4 Omni model
                 max_tokens=1000,
                 messages=[
@@ -362,15 +401,15 @@ Always use JSON actions for these query patterns:
             explanation = action_plan.get("explanation", "")
             
             if action == "habu_list_partners":
-                result = await habu_list_partners()
+                result = await habu_list_partners_result()
                 return self._format_llm_response(explanation, result, "partners")
                 
             elif action == "habu_list_templates":
-                result = await habu_enhanced_templates()
+                result = await habu_enhanced_templates_result()
                 return self._format_llm_response(explanation, result, "enhanced_templates")
                 
             elif action == "habu_enhanced_templates":
-                result = await habu_enhanced_templates()
+                result = await habu_enhanced_templates_result()
                 return self._format_llm_response(explanation, result, "enhanced_templates")
                 
             elif action == "habu_submit_query":
@@ -382,11 +421,11 @@ Always use JSON actions for these query patterns:
                     return "I need a template ID to submit a query. Please specify which template you'd like to use."
                 
                 # Execute the actual query submission
-                result = await habu_submit_query(template_id, parameters, query_name)
+                result = await habu_submit_query_result(template_id, parameters, query_name)
                 
                 # Parse the result to update context
                 try:
-                    result_data = json.loads(result)
+                    result_data = result
                     if result_data.get("status") == "success":
                         query_id = result_data.get("query_id")
                         if query_id:
@@ -415,11 +454,11 @@ Always use JSON actions for these query patterns:
                         return "I don't have a query ID to check. Please provide a query ID or submit a query first."
                 
                 # Execute the actual status check
-                result = await habu_check_status(query_id)
+                result = await habu_check_status_result(query_id)
                 
                 # Parse result to update context
                 try:
-                    result_data = json.loads(result)
+                    result_data = result
                     if result_data.get("status") == "success":
                         new_status = result_data.get("query_status")
                         if query_id in self.active_queries and new_status:
@@ -443,11 +482,11 @@ Always use JSON actions for these query patterns:
                     return "I don't have a query ID to get results for. Please provide a query ID or submit a query first."
                 
                 # Execute the actual results retrieval
-                result = await habu_get_results(query_id)
+                result = await habu_get_results_result(query_id)
                 
                 # Parse result to update context
                 try:
-                    result_data = json.loads(result)
+                    result_data = result
                     if result_data.get("status") == "success":
                         # Query completed successfully - remove from pending
                         if query_id in self.conversation_context["pending_results"]:
@@ -465,7 +504,7 @@ Always use JSON actions for these query patterns:
                 
             elif action == "habu_list_exports":
                 status_filter = tool_params.get("status_filter")
-                result = await habu_list_exports(status_filter)
+                result = await habu_list_exports_result(status_filter)
                 return self._format_llm_response(explanation, result, "exports")
                 
             elif action == "habu_download_export":
@@ -473,7 +512,7 @@ Always use JSON actions for these query patterns:
                 if not export_id:
                     return "I need an export ID to download. Please check available exports first."
                 
-                result = await habu_download_export(export_id)
+                result = await habu_download_export_result(export_id)
                 return self._format_llm_response(explanation, result, "download")
                 
             else:
@@ -483,10 +522,10 @@ Always use JSON actions for these query patterns:
         except Exception as e:
             return f"I encountered an error with the AI processing: {str(e)}. Let me try a simpler approach."
     
-    def _format_llm_response(self, explanation: str, tool_result: str, result_type: str) -> str:
+    def _format_llm_response(self, explanation: str, tool_result: ToolResult, result_type: str) -> str:
         """Format tool results with intelligent, context-aware explanations."""
         try:
-            result_data = json.loads(tool_result)
+            result_data = tool_result
             
             if result_type == "partners":
                 if result_data.get("status") == "success":
@@ -782,15 +821,14 @@ Always use JSON actions for these query patterns:
             return f"{explanation}\n\nHowever, I encountered an issue: {error_msg}"
             
         except:
-            return f"{explanation}\n\nI got a response but had trouble parsing it. Here's the raw result: {tool_result[:200]}..."
+            return f"{explanation}\n\nI got a response but had trouble parsing it. Here's the raw result: {tool_result.to_json()[:200]}..."
     
     async def _rule_based_processing(self, user_input: str) -> str:
         """Fallback rule-based processing when LLM is not available."""
         user_lower = user_input.lower()
         
         if any(phrase in user_lower for phrase in ["partners", "who can", "available partners"]):
-            result = await habu_list_partners()
-            result_data = json.loads(result)
+            result_data = await habu_list_partners_result()
             if result_data["status"] == "success" and result_data["partners"]:
                 partners = [p.get("name", "Unknown") for p in result_data["partners"]]
                 return f"Your clean room partners:\n• " + "\n• ".join(partners)
@@ -798,8 +836,7 @@ Always use JSON actions for these query patterns:
                 return "No clean room partners are currently available."
                 
         elif any(phrase in user_lower for phrase in ["templates", "queries", "what can"]):
-            result = await habu_enhanced_templates()
-            result_data = json.loads(result)
+            result_data = await habu_enhanced_templates_result()
             if result_data["status"] == "success" and result_data["templates"]:
                 templates = []
                 for t in result_data["templates"]:
@@ -817,8 +854,7 @@ Always use JSON actions for these query patterns:
                 
         elif any(phrase in user_lower for phrase in ["status", "check", "how is"]):
             if self.last_query_id:
-                result = await habu_check_status(self.last_query_id)
-                result_data = json.loads(result)
+                result_data = await habu_check_status_result(self.last_query_id)
                 if result_data["status"] == "success":
                     return f"Your query {self.last_query_id} is {result_data['query_status']}"
                 else:
@@ -828,8 +864,7 @@ Always use JSON actions for these query patterns:
                 
         elif any(phrase in user_lower for phrase in ["results", "show me", "what were"]):
             if self.last_query_id:
-                result = await habu_get_results(self.last_query_id)
-                result_data = json.loads(result)
+                result_data = await habu_get_results_result(self.last_query_id)
                 if result_data["status"] == "success":
                     summary = result_data.get("business_summary", "Results retrieved")
                     return f"Results: {summary}"
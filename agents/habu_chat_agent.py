@@ -3,14 +3,13 @@ Habu Chat Agent
 LLM-driven agent for intelligent interaction with Habu Clean Room API
 Orchestrates tool calls and provides conversational interface
 """
-import json
 import re
 from typing import Dict, Any, List, Optional, Tuple
-from tools.habu_list_partners import habu_list_partners
-from tools.habu_list_templates import habu_list_templates
-from tools.habu_submit_query import habu_submit_query
-from tools.habu_check_status import habu_check_status
-from tools.habu_get_results import habu_get_results
+from tools.habu_list_partners import habu_list_partners_result
+from tools.habu_list_templates import habu_list_templates_result
+from tools.habu_submit_query import habu_submit_query_result
+from tools.habu_check_status import habu_check_status_result
+from tools.habu_get_results import habu_get_results_result
 
 class HabuChatAgent:
     """
@@ -141,8 +140,7 @@ class HabuChatAgent:
     
     async def _handle_list_partners(self) -> str:
         """Handle partner listing request."""
-        result = await habu_list_partners()
-        result_data = json.loads(result)
+        result_data = await habu_list_partners_result()
         
         if result_data["status"] == "success":
             partners = result_data.get("partners", [])
@@ -156,8 +154,7 @@ class HabuChatAgent:
     
     async def _handle_list_templates(self) -> str:
         """Handle template listing request."""
-        result = await habu_list_templates()
-        result_data = json.loads(result)
+        result_data = await habu_list_templates_result()
         
         if result_data["status"] == "success":
             templates = result_data.get("templates", [])
@@ -184,8 +181,7 @@ class HabuChatAgent:
         # For now, use empty parameters - this could be enhanced to parse parameters from input
         parameters = entities.get("parameters", {})
         
-        result = await habu_submit_query(template_id, parameters)
-        result_data = json.loads(result)
+        result_data = await habu_submit_query_result(template_id, parameters)
         
         if result_data["status"] == "success":
             query_id = result_data["query_id"]
@@ -200,8 +196,7 @@ class HabuChatAgent:
         if not query_id:
             return "I need a query ID to check status. Please provide the query ID or run a query first."
         
-        result = await habu_check_status(query_id)
-        result_data = json.loads(result)
+        result_data = await habu_check_status_result(query_id)
         
         if result_data["status"] == "success":
             status = result_data["query_status"]
@@ -225,8 +220,7 @@ class HabuChatAgent:
         if not query_id:
             return "I need a query ID to get results. Please provide the query ID or run a query first."
         
-        result = await habu_get_results(query_id)
-        result_data = json.loads(result)
+        result_data = await habu_get_results_result(query_id)
         
         if result_data["status"] == "success":
             business_summary = result_data.get("business_summary", "Results retrieved successfully")
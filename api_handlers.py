@@ -0,0 +1,580 @@
+"""
+Shared handlers for the demo API /api/* surface
+Used by both the Flask bridge (demo_api.py) and the ASGI app (asgi_api.py),
+so both return exactly the same JSON contract to the React demo_app.
+
+Async handlers return (payload, status_code); framework adapters only parse
+the request and serialize the payload.
+"""
+import os
+import json
+import math
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import parse_qsl, urlsplit
+from agents.enhanced_habu_chat_agent import enhanced_habu_agent
+from config.production import production_config
+from config.habu_config import habu_config
+from redis_cache import cache
+from utils.admission import admission_controllers, admission_stats
+from utils.chat_cache import chat_cache
+from utils.concurrency import gather_limited
+from utils.dashboard_snapshot import DashboardSnapshot
+from utils.error_handling import OverloadedError
+from utils.response_cache import EncodedResponse, encode_response, etag_matches, response_cache
+
+# Import MCP tools
+from tools.habu_list_partners import habu_list_partners_result
+from tools.habu_enhanced_templates import habu_enhanced_templates_result, habu_list_templates_result
+from tools.habu_submit_query import habu_submit_query_result
+from tools.habu_check_status import habu_check_status_result
+from tools.habu_get_results import habu_get_results_result
+from tools.habu_list_exports import habu_list_exports_result, habu_download_export_result
+
+logger = logging.getLogger(__name__)
+
+# Payload is a dict, or an EncodedResponse (precompressed body + ETag) for cached catalog reads
+Response = Tuple[Union[Dict[str, Any], EncodedResponse], int]
+
+API_VERSION = 'Phase H1.1 - Stable Redis Only'
+
+def root_info() -> Dict[str, Any]:
+    """Root endpoint payload"""
+    return {
+        'service': 'Habu Enhanced Chat API',
+        'version': API_VERSION,
+        'status': 'operational',
+        'endpoints': [
+            '/api/enhanced-chat',
+            '/api/batch',
+            '/api/dashboard',
+            '/api/health',
+            '/api/cache-stats',
+            '/api/habu-client-stats',
+            '/api/mcp/habu_list_templates',
+            '/api/mcp/habu_enhanced_templates',
+            '/api/mcp/habu_list_partners'
+        ]
+    }
+
+def simple_health() -> Dict[str, Any]:
+    """Simple health check payload"""
+    return {'status': 'healthy', 'service': 'habu-chat-api', 'timestamp': 'working'}
+
+def api_health() -> Dict[str, Any]:
+    """API health check payload for system monitoring"""
+    # Check OpenAI availability
+    openai_available = bool(os.getenv("OPENAI_API_KEY"))
+
+    # Check real API mode
+    real_api_mode = not production_config.HABU_USE_MOCK_DATA
+
+    # Check Redis connection
+    redis_connected = cache.connected if hasattr(cache, 'connected') else False
+
+    # Demo readiness - all systems operational
+    demo_ready = openai_available and (real_api_mode or production_config.HABU_USE_MOCK_DATA)
+
+    return {
+        'status': 'healthy',
+        'service': 'habu-demo-api-v2',
+        'version': API_VERSION,
+        'timestamp': 'working',
+        'redis_connected': redis_connected,
+        'real_api_mode': real_api_mode,
+        'openai_available': openai_available,
+        'demo_ready': demo_ready,
+        'mcp_server': 'online',
+        'demo_mode': 'real-api' if real_api_mode else 'mock-data',
+        'habu_client_configured': bool(production_config.HABU_CLIENT_ID),
+        'cache_enabled': redis_connected,
+        'redis': cache.manager.health()
+    }
+
+def support_context() -> Dict[str, Any]:
+    """Current support context for Customer Support mode"""
+    return {
+        "commonQuestions": [
+            "Can we do lookalike modeling?",
+            "What's the minimum data size?", 
+            "How long does implementation take?",
+            "What industries do you support?"
+        ],
+        "industryFocus": ["retail", "automotive", "finance"],
+        "customerTier": "enterprise",
+        "supportLevel": "standard",
+        "escalationThreshold": 3,
+        "lastUpdate": "2025-01-22T10:00:00Z"
+    }
+
+def technical_context() -> Dict[str, Any]:
+    """Current technical context for Technical Expert mode"""
+    return {
+        "availableTools": [
+            "habu_list_partners",
+            "habu_enhanced_templates", 
+            "habu_submit_query",
+            "habu_check_status",
+            "habu_get_results",
+            "habu_list_exports"
+        ],
+        "apiVersion": "2.0",
+        "documentationVersion": "2.0.1",
+        "limitations": [
+            "Rate limits apply to high-volume queries",
+            "Some features require partner agreements"
+        ],
+        "recentChanges": [
+            "Added enhanced privacy controls",
+            "Improved match rate algorithms"
+        ],
+        "capabilityMatrix": {
+            "lookalike_modeling": True,
+            "identity_resolution": True,
+            "segmentation": True,
+            "attribution": True,
+            "real_time_activation": True
+        },
+        "integrationPatterns": [
+            "REST API integration",
+            "Batch file processing",
+            "Real-time streaming"
+        ]
+    }
+
+def quick_customer_assessment(data: Optional[Dict[str, Any]]) -> Response:
+    """Quick customer capability assessment for support mode"""
+    if not data or 'query' not in data:
+        return {'error': 'Query is required'}, 400
+
+    query = data['query']
+    industry = data.get('industry')
+
+    try:
+        # Simple capability assessment logic
+        return generate_quick_assessment(query, industry), 200
+    except Exception as e:
+        logger.error(f"Error in quick assessment: {e}")
+        return {'error': 'Assessment failed'}, 500
+
+def generate_quick_assessment(query, industry=None):
+    """Generate a quick capability assessment"""
+    query_lower = query.lower()
+    
+    # Check for common use cases
+    if any(keyword in query_lower for keyword in ['lookalike', 'similar', 'audience', 'expand']):
+        return {
+            'feasibility': 'yes',
+            'confidence': 'high',
+            'summary': '✅ **Yes, lookalike modeling is fully supported!**\n\nCreate audiences similar to your best customers using our 300M+ identity graph.',
+            'timeline': '24-48 hours for model creation',
+            'businessValue': 'Increase customer acquisition efficiency by 40-60%',
+            'competitiveAdvantage': ['90%+ match rates vs industry 60-70%', 'Real-time audience activation'],
+            'nextSteps': ['Confirm data requirements', 'Set up proof of concept']
+        }
+    elif any(keyword in query_lower for keyword in ['segment', 'group', 'cohort', 'cluster']):
+        return {
+            'feasibility': 'yes',
+            'confidence': 'high',
+            'summary': '✅ **Yes, customer segmentation is fully supported!**\n\nCreate behavioral and demographic customer segments for targeted marketing.',
+            'timeline': '3-5 days for analysis',
+            'businessValue': 'Increase campaign effectiveness through personalized targeting',
+            'competitiveAdvantage': ['AI-powered segment discovery', 'Real-time segment updates'],
+            'nextSteps': ['Review data requirements', 'Schedule implementation planning']
+        }
+    elif any(keyword in query_lower for keyword in ['identity', 'resolution', 'unify', 'match']):
+        return {
+            'feasibility': 'yes',
+            'confidence': 'high',
+            'summary': '✅ **Yes, identity resolution is fully supported!**\n\nUnify customer identities across devices, channels, and data sources.',
+            'timeline': '1-3 weeks depending on complexity',
+            'businessValue': 'Create unified customer view for personalized experiences',
+            'competitiveAdvantage': ['Industry-leading match rates', 'Privacy-first approach'],
+            'nextSteps': ['Assess data sources', 'Plan integration approach']
+        }
+    else:
+        return {
+            'feasibility': 'partially',
+            'confidence': 'medium',
+            'summary': '⚠️ **Partially supported - need more details**\n\nPlease provide more specific information about your use case.',
+            'timeline': 'Depends on specific requirements',
+            'businessValue': 'Business value depends on specific use case',
+            'competitiveAdvantage': ['Privacy-first architecture', 'Comprehensive API coverage'],
+            'nextSteps': ['Clarify specific requirements', 'Schedule discovery call']
+        }
+
+async def cache_stats() -> Response:
+    """Redis cache statistics"""
+    try:
+        stats = await cache.get_cache_stats()
+        return {
+            'cache_stats': stats,
+            'chat_cache': chat_cache.stats(),
+            'encoded_responses': response_cache.stats(),
+            'dashboard_snapshot': dashboard_snapshot.stats(),
+            'timestamp': 'working'
+        }, 200
+    except Exception as e:
+        logger.error(f"Error getting cache stats: {e}")
+        return {
+            'error': 'Failed to get cache stats',
+            'detail': str(e)
+        }, 500
+
+async def enhanced_chat(data: Optional[Dict[str, Any]]) -> Response:
+    """Handle enhanced chat requests from React frontend with Redis caching"""
+    try:
+        if not data:
+            logger.warning("No JSON data received")
+            return {'error': 'No JSON data provided'}, 400
+
+        user_input = data.get('user_input', '')
+        session_id = data.get('session_id', 'default')
+
+        if not user_input:
+            logger.warning("Empty user input received")
+            return {'error': 'No user input provided'}, 400
+
+        logger.info(f"Processing chat request: {user_input[:100]}...")
+
+        # Same prompt in the same conversation state (and session, for session-scoped intents)
+        context = enhanced_habu_agent.context_fingerprint()
+        cached_response = await chat_cache.get(user_input, context, session_id)
+        if cached_response:
+            logger.info(f"✅ Serving cached chat response ({cached_response['intent']})")
+            return {
+                'response': cached_response['response'],
+                'cached': True,
+                'cached_at': cached_response['cached_at']
+            }, 200
+
+        # Process new request, shedding load when the downstream's queue is full
+        # (cache hits above never wait for a slot)
+        admission = admission_controllers[enhanced_habu_agent.downstream()]
+        try:
+            async with admission.admit():
+                response = await enhanced_habu_agent.process_request(user_input)
+        except OverloadedError as e:
+            return {
+                'error': 'Service overloaded',
+                'detail': 'Too many chat requests in progress, please retry shortly',
+                'retry_after': e.retry_after
+            }, 503
+
+        # Cached under the context the answer was generated in; failures are logged, not raised
+        await chat_cache.set(user_input, context, response, session_id)
+
+        logger.info("Chat request processed successfully")
+        return {
+            'response': response,
+            'cached': False
+        }, 200
+
+    except Exception as e:
+        logger.error(f"Error in enhanced_chat: {e}")
+        return {
+            'error': 'Internal server error',
+            'detail': str(e) if production_config.DEBUG else 'An error occurred processing your request'
+        }, 500
+
+def _is_success(result_data: Dict[str, Any]) -> bool:
+    """Only successful tool envelopes are worth caching"""
+    return isinstance(result_data, dict) and result_data.get('status') != 'error'
+
+async def _cached_tool_result(cache_key: str, fetch, cache_type: str, ttl: int, label: str,
+                              if_none_match: Optional[str] = None, tags: Sequence[str] = ()) -> Response:
+    """
+    Serve a tool result from Redis with stale-while-revalidate: an expired entry
+    is served immediately while one background task re-runs the tool.
+    
+    Cached results are returned as a precomputed EncodedResponse; a matching
+    If-None-Match is answered with 304 from the ETag alone.
+    """
+    etag = await response_cache.fresh_etag(cache_key)
+    if etag_matches(if_none_match, etag):
+        response_cache.count_not_modified()
+        return EncodedResponse(etag, b'', cache_status='HIT'), 304
+
+    cached_result = await cache.get_or_refresh(
+        cache_key,
+        fetch,
+        cache_type=cache_type,
+        custom_ttl=ttl,
+        should_cache=_is_success,
+        tags=tags
+    )
+    response_data = cached_result['data']
+    if not cached_result['cache_hit']:
+        if not _is_success(response_data):
+            return {**response_data, 'cached': False}, 200
+        encoded = encode_response(response_data, {'cached': False})
+    else:
+        logger.info(f"✅ Serving {'stale' if cached_result['stale'] else 'cached'} {label}")
+        encoded = await response_cache.get_or_encode(
+            cache_key,
+            response_data,
+            {'cached': True, 'cached_at': cached_result.get('cached_at')},
+            version=cached_result.get('cached_at'),
+            expires_at=cached_result.get('expires_at'),
+            cache_status='STALE' if cached_result['stale'] else 'HIT'
+        )
+
+    if etag_matches(if_none_match, encoded.etag):
+        response_cache.count_not_modified()
+        return encoded, 304
+    return encoded, 200
+
+async def list_templates(if_none_match: Optional[str] = None) -> Response:
+    """List templates"""
+    try:
+        return await _cached_tool_result(
+            'templates_list',
+            habu_list_templates_result,
+            cache_type='template_data',
+            ttl=1800,  # 30 minutes
+            label='templates',
+            if_none_match=if_none_match,
+            tags=['template']
+        )
+    except Exception as e:
+        logger.error(f"Error in list_templates: {e}")
+        return {'error': str(e)}, 500
+
+async def enhanced_templates(cleanroom_id: str = 'default', all_cleanrooms: bool = False,
+                             if_none_match: Optional[str] = None) -> Response:
+    """List enhanced templates with detailed metadata and caching"""
+    try:
+        cache_key = "enhanced_templates_all" if all_cleanrooms else f"enhanced_templates_{cleanroom_id}"
+        return await _cached_tool_result(
+            cache_key,
+            lambda: habu_enhanced_templates_result(cleanroom_id, all_cleanrooms),
+            cache_type='template_data',
+            ttl=1800,  # 30 minutes
+            label='enhanced templates',
+            if_none_match=if_none_match,
+            tags=['template'] if all_cleanrooms else ['template', f'cleanroom:{cleanroom_id}']
+        )
+    except Exception as e:
+        logger.error(f"Error in enhanced_templates: {e}")
+        return {'error': str(e)}, 500
+
+async def list_partners(if_none_match: Optional[str] = None) -> Response:
+    """List partners with Redis caching"""
+    try:
+        return await _cached_tool_result(
+            'partners_list',
+            habu_list_partners_result,
+            cache_type='partner_data',
+            ttl=900,  # 15 minutes
+            label='partners list',
+            if_none_match=if_none_match,
+            tags=['partner']
+        )
+    except Exception as e:
+        logger.error(f"Error in list_partners: {e}")
+        return {'error': str(e)}, 500
+
+async def submit_query(data: Optional[Dict[str, Any]]) -> Response:
+    """Submit a query"""
+    try:
+        data = data or {}
+        template_id = data.get('template_id')
+        parameters = data.get('parameters', {})
+
+        if not template_id:
+            return {'error': 'template_id is required'}, 400
+
+        return await habu_submit_query_result(template_id, parameters), 200
+    except Exception as e:
+        logger.error(f"Error in submit_query: {e}")
+        return {'error': str(e)}, 500
+
+async def check_status(query_id: Optional[str]) -> Response:
+    """Check query status"""
+    try:
+        if not query_id:
+            return {'error': 'query_id is required'}, 400
+        return await habu_check_status_result(query_id), 200
+    except Exception as e:
+        logger.error(f"Error in check_status: {e}")
+        return {'error': str(e)}, 500
+
+async def get_results(query_id: Optional[str]) -> Response:
+    """Get query results"""
+    try:
+        if not query_id:
+            return {'error': 'query_id is required'}, 400
+        return await habu_get_results_result(query_id), 200
+    except Exception as e:
+        logger.error(f"Error in get_results: {e}")
+        return {'error': str(e)}, 500
+
+async def list_exports(status_filter: Optional[str] = None) -> Response:
+    """List exports"""
+    try:
+        return await habu_list_exports_result(status_filter), 200
+    except Exception as e:
+        logger.error(f"Error in list_exports: {e}")
+        return {'error': str(e)}, 500
+
+async def download_export(export_id: Optional[str]) -> Response:
+    """Download an export"""
+    try:
+        if not export_id:
+            return {'error': 'export_id is required'}, 400
+        return await habu_download_export_result(export_id), 200
+    except Exception as e:
+        logger.error(f"Error in download_export: {e}")
+        return {'error': str(e)}, 500
+
+def habu_client_stats() -> Dict[str, Any]:
+    """Habu HTTP client layer statistics"""
+    return {
+        'habu_client': habu_config.get_stats(),
+        'admission': admission_stats(),
+        'timestamp': 'working'
+    }
+
+# Batch limits: items per request, items run at once, per-item timeout (default and ceiling)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "20"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "10"))
+BATCH_ITEM_TIMEOUT = float(os.getenv("BATCH_ITEM_TIMEOUT", "10"))
+BATCH_MAX_ITEM_TIMEOUT = float(os.getenv("BATCH_MAX_ITEM_TIMEOUT", "30"))
+
+async def _done(result: Any) -> Any:
+    return result
+
+# (method, path) -> handler(query params, JSON body); same arguments the framework adapters pass
+BatchRoute = Callable[[Dict[str, str], Optional[Dict[str, Any]]], Awaitable[Response]]
+
+BATCH_ROUTES: Dict[Tuple[str, str], BatchRoute] = {
+    ('GET', '/api/health'): lambda params, body: _done((api_health(), 200)),
+    ('GET', '/api/cache-stats'): lambda params, body: cache_stats(),
+    ('GET', '/api/habu-client-stats'): lambda params, body: _done((habu_client_stats(), 200)),
+    ('GET', '/api/support-context'): lambda params, body: _done((support_context(), 200)),
+    ('GET', '/api/technical-context'): lambda params, body: _done((technical_context(), 200)),
+    ('POST', '/api/customer-support/quick-assess'): lambda params, body: _done(quick_customer_assessment(body)),
+    ('POST', '/api/enhanced-chat'): lambda params, body: enhanced_chat(body),
+    ('GET', '/api/dashboard'): lambda params, body: dashboard(),
+    ('GET', '/api/mcp/habu_list_templates'): lambda params, body: list_templates(),
+    ('GET', '/api/mcp/habu_enhanced_templates'): lambda params, body: enhanced_templates(
+        params.get('cleanroom_id', 'default'), params.get('all_cleanrooms', 'false').lower() == 'true'
+    ),
+    ('GET', '/api/mcp/habu_list_partners'): lambda params, body: list_partners(),
+    ('POST', '/api/mcp/habu_submit_query'): lambda params, body: submit_query(body),
+    ('GET', '/api/mcp/habu_check_status'): lambda params, body: check_status(params.get('query_id')),
+    ('GET', '/api/mcp/habu_get_results'): lambda params, body: get_results(params.get('query_id')),
+    ('GET', '/api/mcp/habu_list_exports'): lambda params, body: list_exports(params.get('status')),
+    ('GET', '/api/mcp/habu_download_export'): lambda params, body: download_export(params.get('export_id')),
+}
+
+async def _run_batch_item(index: int, item: Any) -> Dict[str, Any]:
+    """One sub-request as {'id', 'status', 'body'}; failures become per-item errors"""
+    if not isinstance(item, dict):
+        return {'id': index, 'status': 400, 'body': {'error': 'Each request must be an object'}}
+    item_id = item.get('id', index)
+    if not item.get('path'):
+        return {'id': item_id, 'status': 400, 'body': {'error': 'Each request needs a path'}}
+
+    method = str(item.get('method', 'GET')).upper()
+    url = urlsplit(item['path'])
+    route = BATCH_ROUTES.get((method, url.path))
+    if route is None:
+        return {'id': item_id, 'status': 404, 'body': {'error': f'No batchable route for {method} {url.path}'}}
+
+    params = dict(parse_qsl(url.query))
+    params.update({key: str(value) for key, value in (item.get('params') or {}).items()})
+    try:
+        timeout = float(item.get('timeout', BATCH_ITEM_TIMEOUT))
+    except (TypeError, ValueError):
+        timeout = math.nan
+    # Also rejects NaN, which fails every comparison
+    if not 0 < timeout < math.inf:
+        return {'id': item_id, 'status': 400, 'body': {'error': 'timeout must be a positive number of seconds'}}
+    timeout = min(timeout, BATCH_MAX_ITEM_TIMEOUT)
+
+    try:
+        payload, status = await asyncio.wait_for(route(params, item.get('body')), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Batch item {item_id} ({method} {url.path}) timed out after {timeout}s")
+        return {'id': item_id, 'status': 504, 'body': {'error': f'Timed out after {timeout}s'}}
+
+    result = {'id': item_id, 'status': status}
+    if isinstance(payload, EncodedResponse):
+        result['etag'] = payload.etag
+        payload = json.loads(payload.body) if payload.body else None
+    result['body'] = payload
+    return result
+
+async def batch(data: Optional[Dict[str, Any]]) -> Response:
+    """
+    Run several /api/* sub-requests concurrently and return them in one response.
+
+    Each item is {"id", "method", "path", "params", "body", "timeout"}; only
+    "path" is required and its query string is merged into params. Items fail
+    independently (their own status and error body), so the batch itself is a
+    200 whenever the request was well formed, and takes about as long as its
+    slowest item.
+    """
+    requests = (data or {}).get('requests')
+    if not isinstance(requests, list) or not requests:
+        return {'error': 'requests must be a non-empty list'}, 400
+    if len(requests) > BATCH_MAX_ITEMS:
+        return {'error': f'At most {BATCH_MAX_ITEMS} requests per batch'}, 400
+
+    outcomes = await gather_limited(
+        list(enumerate(requests)),
+        lambda indexed: _run_batch_item(*indexed),
+        BATCH_MAX_CONCURRENCY
+    )
+
+    responses: List[Dict[str, Any]] = []
+    for (index, item), outcome in zip(enumerate(requests), outcomes):
+        if outcome['error'] is not None:
+            logger.error(f"Batch item {index} failed: {outcome['error']}")
+            result = {
+                'id': item.get('id', index) if isinstance(item, dict) else index,
+                'status': 500,
+                'body': {'error': 'Internal server error'}
+            }
+        else:
+            result = outcome['result']
+        result['elapsed_ms'] = outcome['elapsed_ms']
+        responses.append(result)
+
+    return {
+        'responses': responses,
+        'count': len(responses),
+        'failed': sum(1 for r in responses if r['status'] >= 400),
+        'elapsed_ms': max(r['elapsed_ms'] for r in responses)
+    }, 200
+
+def _dashboard_health() -> Dict[str, Any]:
+    """API health without the Redis pool counters, which change on every refresh"""
+    return {key: value for key, value in api_health().items() if key != 'redis'}
+
+# One document for the dashboard, rebuilt by a background refresher (see utils/dashboard_snapshot.py)
+dashboard_snapshot = DashboardSnapshot(
+    cache,
+    sources={
+        'partners': lambda: habu_list_partners_result(),
+        'templates': lambda: habu_list_templates_result(),
+        'exports': lambda: habu_list_exports_result(None),
+        'health': lambda: _done(_dashboard_health())
+    },
+    interval=float(os.getenv("DASHBOARD_REFRESH_INTERVAL", "60")),
+    section_timeout=float(os.getenv("DASHBOARD_SECTION_TIMEOUT", "30"))
+)
+
+async def dashboard(if_none_match: Optional[str] = None) -> Response:
+    """Dashboard snapshot (partners, templates, exports, health) with ETag revalidation"""
+    try:
+        encoded = await dashboard_snapshot.current()
+    except Exception as e:
+        logger.error(f"Error building dashboard snapshot: {e}")
+        return {'error': 'Dashboard snapshot unavailable', 'retry_after': 5}, 503
+
+    not_modified = etag_matches(if_none_match, encoded.etag)
+    dashboard_snapshot.count_served(not_modified)
+    return encoded, 304 if not_modified else 200
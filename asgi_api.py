@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+ASGI (Starlette) version of the demo API bridge
+Serves the same /api/* JSON contract as demo_api.py, calling the async tools
+directly on uvicorn's event loop instead of blocking a Flask thread per call.
+
+Run with multiple workers:
+    uvicorn asgi_api:app --host 0.0.0.0 --port $PORT --workers 4
+or mount the routes into the FastMCP server with MOUNT_DEMO_API=true (main.py).
+"""
+import os
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import List
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+import api_handlers
+from utils.response_cache import EncodedResponse
+from utils.tool_result import dumps_bytes
+from config.production import production_config
+from config.habu_config import habu_config
+from redis_cache import initialize_cache, shutdown_cache
+
+logger = logging.getLogger(__name__)
+
+class FastJSONResponse(JSONResponse):
+    """JSON response serialized once with orjson (compact unless pretty)"""
+
+    def __init__(self, content, status_code: int = 200, pretty: bool = False, **kwargs):
+        self.pretty = pretty
+        super().__init__(content, status_code=status_code, **kwargs)
+
+    def render(self, content) -> bytes:
+        return dumps_bytes(content, pretty=self.pretty)
+
+def json_response(request: Request, payload, status: int = 200) -> FastJSONResponse:
+    """Serialize a handler payload; ?pretty=true asks for indented output"""
+    pretty = request.query_params.get('pretty', 'false').lower() == 'true'
+    return FastJSONResponse(payload, status_code=status, pretty=pretty)
+
+def respond(request: Request, result) -> Response:
+    """Serialize a (payload, status) handler result"""
+    payload, status = result
+    if isinstance(payload, EncodedResponse):
+        if status == 200 and request.query_params.get('pretty', 'false').lower() == 'true':
+            return json_response(request, json.loads(payload.body), status)
+        # Precompressed: GZipMiddleware leaves responses with Content-Encoding alone
+        body, encoding = payload.select(request.headers.get('accept-encoding'))
+        if status == 304:
+            body, encoding = b'', None
+        return Response(body, status_code=status, headers=payload.headers(encoding), media_type='application/json')
+    response = json_response(request, payload, status)
+    if status in (429, 503) and payload.get('retry_after') is not None:
+        response.headers['Retry-After'] = str(payload['retry_after'])
+    return response
+
+async def read_json(request: Request):
+    """Request body as JSON, or None if missing/invalid (like Flask's silent get_json)"""
+    try:
+        return await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+async def root(request: Request):
+    return json_response(request, api_handlers.root_info())
+
+async def simple_health(request: Request):
+    return json_response(request, api_handlers.simple_health())
+
+async def api_health(request: Request):
+    return json_response(request, api_handlers.api_health())
+
+async def cache_stats(request: Request):
+    return respond(request, await api_handlers.cache_stats())
+
+async def habu_client_stats(request: Request):
+    return json_response(request, api_handlers.habu_client_stats())
+
+async def support_context(request: Request):
+    return json_response(request, api_handlers.support_context())
+
+async def technical_context(request: Request):
+    return json_response(request, api_handlers.technical_context())
+
+async def quick_customer_assessment(request: Request):
+    return respond(request, api_handlers.quick_customer_assessment(await read_json(request)))
+
+async def enhanced_chat(request: Request):
+    return respond(request, await api_handlers.enhanced_chat(await read_json(request)))
+
+async def batch(request: Request):
+    return respond(request, await api_handlers.batch(await read_json(request)))
+
+async def dashboard(request: Request):
+    return respond(request, await api_handlers.dashboard(request.headers.get('if-none-match')))
+
+async def list_templates(request: Request):
+    return respond(request, await api_handlers.list_templates(request.headers.get('if-none-match')))
+
+async def enhanced_templates(request: Request):
+    cleanroom_id = request.query_params.get('cleanroom_id', 'default')
+    all_cleanrooms = request.query_params.get('all_cleanrooms', 'false').lower() == 'true'
+    return respond(request, await api_handlers.enhanced_templates(
+        cleanroom_id, all_cleanrooms, request.headers.get('if-none-match')
+    ))
+
+async def list_partners(request: Request):
+    return respond(request, await api_handlers.list_partners(request.headers.get('if-none-match')))
+
+async def submit_query(request: Request):
+    return respond(request, await api_handlers.submit_query(await read_json(request)))
+
+async def check_status(request: Request):
+    return respond(request, await api_handlers.check_status(request.query_params.get('query_id')))
+
+async def get_results(request: Request):
+    return respond(request, await api_handlers.get_results(request.query_params.get('query_id')))
+
+async def list_exports(request: Request):
+    return respond(request, await api_handlers.list_exports(request.query_params.get('status')))
+
+async def download_export(request: Request):
+    return respond(request, await api_handlers.download_export(request.query_params.get('export_id')))
+
+# /api/* routes, shared by the standalone app and the FastMCP mount
+api_routes: List[Route] = [
+    Route('/api/health', api_health, methods=['GET']),
+    Route('/api/cache-stats', cache_stats, methods=['GET']),
+    Route('/api/habu-client-stats', habu_client_stats, methods=['GET']),
+    Route('/api/support-context', support_context, methods=['GET']),
+    Route('/api/technical-context', technical_context, methods=['GET']),
+    Route('/api/customer-support/quick-assess', quick_customer_assessment, methods=['POST']),
+    Route('/api/enhanced-chat', enhanced_chat, methods=['POST']),
+    Route('/api/batch', batch, methods=['POST']),
+    Route('/api/dashboard', dashboard, methods=['GET']),
+    Route('/api/mcp/habu_list_templates', list_templates, methods=['GET']),
+    Route('/api/mcp/habu_enhanced_templates', enhanced_templates, methods=['GET']),
+    Route('/api/mcp/habu_list_partners', list_partners, methods=['GET']),
+    Route('/api/mcp/habu_submit_query', submit_query, methods=['POST']),
+    Route('/api/mcp/habu_check_status', check_status, methods=['GET']),
+    Route('/api/mcp/habu_get_results', get_results, methods=['GET']),
+    Route('/api/mcp/habu_list_exports', list_exports, methods=['GET']),
+    Route('/api/mcp/habu_download_export', download_export, methods=['GET']),
+]
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    """Connect Redis and start the dashboard refresher on startup; close the shared clients on shutdown"""
+    try:
+        await initialize_cache()
+    except Exception as e:
+        logger.warning(f"⚠️ Redis cache initialization failed: {e}")
+    await api_handlers.dashboard_snapshot.start()
+    yield
+    await api_handlers.dashboard_snapshot.stop()
+    await habu_config.aclose()
+    await shutdown_cache()
+
+def create_app() -> Starlette:
+    """Standalone ASGI app with the same routes and middleware as demo_api.py"""
+    return Starlette(
+        routes=[Route('/', root, methods=['GET']), Route('/health', simple_health, methods=['GET'])] + api_routes,
+        middleware=[
+            Middleware(CORSMiddleware, allow_origins=production_config.CORS_ORIGINS,
+                       allow_methods=['*'], allow_headers=['*']),
+            Middleware(GZipMiddleware, minimum_size=500)
+        ],
+        lifespan=lifespan
+    )
+
+app = create_app()
+
+if __name__ == '__main__':
+    import uvicorn
+    logging.basicConfig(
+        level=getattr(logging, production_config.LOG_LEVEL),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    uvicorn.run(
+        'asgi_api:app',
+        host='0.0.0.0',
+        port=int(os.environ.get('PORT', 5000)),
+        workers=int(os.environ.get('WEB_CONCURRENCY', '4')),
+        log_level=production_config.LOG_LEVEL.lower()
+    )
@@ -1,61 +1,227 @@
 """
 Habu Clean Room API Configuration
-Handles OAuth2 client credentials flow and API settings
+Handles OAuth2 client credentials flow, API settings and the shared HTTP client
 """
 import os
+import time
+import json
+import asyncio
+import base64
+import hashlib
+import logging
 from typing import Optional, Dict, Any
 import httpx
 from dotenv import load_dotenv
+from utils.single_flight import SingleFlight
+from utils.conditional_cache import ValidatorCache
+from utils.latency_tracker import LatencyTracker
+from utils.error_handling import current_hedge_budget, habu_hedge_budget, habu_retry_policy, hedged_call
+from utils.rate_limiter import TokenBucketLimiter, habu_rate_limiter, parse_retry_after
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401 - HTTP/2 support is optional (pip install httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 class HabuConfig:
     """Configuration and authentication for Habu Clean Room API"""
-    
-    def __init__(self):
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None,
+                 rate_limiter: Optional[TokenBucketLimiter] = None):
         self.base_url = "https://api.habu.com/v1"
         self.token_url = "https://api.habu.com/v1/oauth/token"
         self.client_id = os.getenv("HABU_CLIENT_ID")
         self.client_secret = os.getenv("HABU_CLIENT_SECRET")
         self._access_token: Optional[str] = None
         self._token_type: str = "Bearer"
-    
+        self._token_expires_at: Optional[float] = None
+        self._token_refresh_at: Optional[float] = None
+        self._token_refresh_task: Optional[asyncio.Task] = None
+        self._token_refreshes = 0
+        # Refresh this many seconds before the token expires
+        self.token_refresh_margin = float(os.getenv("HABU_TOKEN_REFRESH_MARGIN", "120"))
+
+        # Shared HTTP client pool configuration
+        self.max_connections = int(os.getenv("HABU_HTTP_MAX_CONNECTIONS", "20"))
+        self.max_keepalive_connections = int(os.getenv("HABU_HTTP_MAX_KEEPALIVE", "10"))
+        self.keepalive_expiry = float(os.getenv("HABU_HTTP_KEEPALIVE_EXPIRY", "60"))
+        self.default_timeout = float(os.getenv("HABU_HTTP_TIMEOUT", "30"))
+        self.http2 = os.getenv("HABU_HTTP2", "true").lower() == "true" and HTTP2_AVAILABLE
+        # Max concurrent per-cleanroom requests when a tool fans out across cleanrooms
+        self.fanout_concurrency = int(os.getenv("HABU_FANOUT_CONCURRENCY", "8"))
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Identical concurrent GETs share one upstream request
+        self.single_flight = SingleFlight("habu_get")
+        # ETag / Last-Modified validators and parsed payloads for conditional GETs
+        self.validators = ValidatorCache(max_entries=int(os.getenv("HABU_VALIDATOR_CACHE_SIZE", "256")))
+        # Rolling per-endpoint latency histograms driving adaptive timeouts
+        self.latency = LatencyTracker(
+            window=float(os.getenv("HABU_LATENCY_WINDOW", "300")),
+            min_samples=int(os.getenv("HABU_TIMEOUT_MIN_SAMPLES", "20")),
+            margin=float(os.getenv("HABU_TIMEOUT_MARGIN", "1.0")),
+            floor=float(os.getenv("HABU_TIMEOUT_FLOOR", "2")),
+            ceiling=float(os.getenv("HABU_TIMEOUT_CEILING", "60"))
+        )
+        # Never hedge sooner than this, even for very fast endpoints
+        self.min_hedge_delay = float(os.getenv("HABU_MIN_HEDGE_DELAY", "0.05"))
+        # Retries for idempotent reads (classified, jittered, budgeted)
+        self.retry_policy = habu_retry_policy
+        # Outbound rate limit shared by all instances (falls back to in-process)
+        self.rate_limiter = rate_limiter or habu_rate_limiter
+
+    def get_client(self) -> httpx.AsyncClient:
+        """
+        Get the process-wide pooled HTTP client for Habu API calls.
+
+        The client keeps connections alive between tool calls (and multiplexes
+        them over HTTP/2 when available). Connections are bound to the event loop
+        that opened them, so a new client is created if the running loop changes.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            if self._client is not None and not self._client.is_closed:
+                logger.debug("Event loop changed, creating a new Habu HTTP client")
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry
+                ),
+                timeout=httpx.Timeout(self.default_timeout),
+                headers={"Accept-Encoding": "gzip, deflate"},
+                transport=self._transport
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self):
+        """Close the shared HTTP client (call from the application lifespan)"""
+        if self._client is not None and not self._client.is_closed:
+            if self._client_loop is asyncio.get_running_loop():
+                await self._client.aclose()
+            logger.info("Habu HTTP client closed")
+        self._client = None
+        self._client_loop = None
+
     async def get_access_token(self) -> str:
-        """Get or refresh OAuth2 access token using client credentials flow"""
+        """
+        Get a valid OAuth2 access token using client credentials flow.
+
+        Tokens are tracked against their expiry (expiresIn or the JWT exp claim).
+        Inside the refresh margin the current token is still returned while a
+        background refresh runs; concurrent callers share one in-flight refresh.
+        """
         if not self.client_id or not self.client_secret:
             raise ValueError("HABU_CLIENT_ID and HABU_CLIENT_SECRET must be set in environment variables")
-        
-        if self._access_token:
-            return self._access_token
-        
-        async with httpx.AsyncClient() as client:
-            # Habu API requires Basic Auth for OAuth2 client credentials
-            import base64
-            credentials = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode()
-            
-            headers = {
-                "Authorization": f"Basic {credentials}",
-                "Content-Type": "application/x-www-form-urlencoded"
-            }
-            
-            data = {
-                "grant_type": "client_credentials"
-            }
-            
-            response = await client.post(self.token_url, data=data, headers=headers)
-            
-            response.raise_for_status()
-            
-            token_data = response.json()
-            # Habu uses 'accessToken' instead of 'access_token'
-            self._access_token = token_data.get("accessToken") or token_data.get("access_token")
-            self._token_type = token_data.get("tokenType") or token_data.get("token_type", "Bearer")
-            
-            if not self._access_token:
-                raise ValueError(f"Failed to obtain access token from Habu API. Response: {token_data}")
-            
+
+        now = time.time()
+        if self._access_token and not self._token_expired(now):
+            if self._token_refresh_at is not None and now >= self._token_refresh_at:
+                self._start_token_refresh()
             return self._access_token
-    
+
+        return await asyncio.shield(self._start_token_refresh())
+
+    def _token_expired(self, now: float) -> bool:
+        """Check whether the cached token is past its expiry"""
+        return self._token_expires_at is not None and now >= self._token_expires_at
+
+    def _start_token_refresh(self) -> asyncio.Task:
+        """Start a token refresh, or join the one already in flight on this loop"""
+        task = self._token_refresh_task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(self._fetch_token())
+            task.add_done_callback(self._on_token_refresh_done)
+            self._token_refresh_task = task
+        return task
+
+    def _on_token_refresh_done(self, task: asyncio.Task):
+        """Log background refresh failures (foreground callers see the exception)"""
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Habu token refresh failed: {task.exception()}")
+
+    async def _fetch_token(self) -> str:
+        """POST to the token endpoint and store the new token and its expiry"""
+        client = self.get_client()
+
+        # Habu API requires Basic Auth for OAuth2 client credentials
+        credentials = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode()
+
+        headers = {
+            "Authorization": f"Basic {credentials}",
+            "Content-Type": "application/x-www-form-urlencoded"
+        }
+
+        data = {
+            "grant_type": "client_credentials"
+        }
+
+        response = await client.post(self.token_url, data=data, headers=headers)
+
+        response.raise_for_status()
+
+        token_data = response.json()
+        # Habu uses 'accessToken' instead of 'access_token'
+        access_token = token_data.get("accessToken") or token_data.get("access_token")
+
+        if not access_token:
+            raise ValueError(f"Failed to obtain access token from Habu API. Response: {token_data}")
+
+        self._access_token = access_token
+        self._token_type = token_data.get("tokenType") or token_data.get("token_type", "Bearer")
+        self._token_expires_at = self._resolve_token_expiry(access_token, token_data)
+        self._token_refresh_at = None
+        if self._token_expires_at is not None:
+            # Never spend more than half the token lifetime in the refresh window
+            lifetime = max(self._token_expires_at - time.time(), 0.0)
+            self._token_refresh_at = self._token_expires_at - min(self.token_refresh_margin, lifetime / 2)
+        self._token_refreshes += 1
+
+        return self._access_token
+
+    @staticmethod
+    def _resolve_token_expiry(access_token: str, token_data: Dict[str, Any]) -> Optional[float]:
+        """Work out the token expiry from expiresIn/expires_in or the JWT exp claim"""
+        expires_in = token_data.get("expiresIn") or token_data.get("expires_in")
+        if expires_in:
+            try:
+                return time.time() + float(expires_in)
+            except (TypeError, ValueError):
+                pass
+
+        # Fall back to the exp claim of a JWT access token
+        try:
+            payload = access_token.split(".")[1]
+            payload += "=" * (-len(payload) % 4)
+            claims = json.loads(base64.urlsafe_b64decode(payload))
+            if "exp" in claims:
+                return float(claims["exp"])
+        except Exception:
+            pass
+
+        return None
+
+    def get_token_info(self) -> Dict[str, Any]:
+        """Token manager state for health and stats endpoints"""
+        expires_in = None
+        if self._token_expires_at is not None:
+            expires_in = round(self._token_expires_at - time.time(), 1)
+        return {
+            "has_token": self._access_token is not None,
+            "expires_in_seconds": expires_in,
+            "refresh_margin_seconds": self.token_refresh_margin,
+            "refresh_in_flight": self._token_refresh_task is not None and not self._token_refresh_task.done(),
+            "refresh_count": self._token_refreshes
+        }
+
     async def get_auth_headers(self) -> Dict[str, str]:
         """Get authenticated headers for API requests"""
         token = await self.get_access_token()
@@ -64,10 +230,184 @@ class HabuConfig:
             "Content-Type": "application/json",
             "Accept": "application/json"
         }
-    
+
     def reset_token(self):
         """Reset cached token (force refresh on next request)"""
         self._access_token = None
+        self._token_expires_at = None
+        self._token_refresh_at = None
+
+    async def request(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        """
+        Send an authenticated request to the Habu API over the shared client.
+
+        Identical concurrent GETs (same URL, params and credentials) are coalesced
+        into one upstream request whose response is shared by every caller, so
+        callers must treat the response as read-only.
+
+        Tokens are refreshed ahead of expiry, so the 401 retry (once, with a
+        fresh token) only happens if Habu revokes a token early.
+
+        Args:
+            method: HTTP method
+            path: API path relative to base_url (e.g. "/cleanrooms")
+            **kwargs: Passed through to httpx (params, json, timeout, ...)
+        """
+        headers = await self.get_auth_headers()
+
+        if method.upper() == "GET":
+            key = self._request_key(path, kwargs.get("params"), headers)
+            return await self.single_flight.do(key, lambda: self._send_read(path, headers, **kwargs))
+
+        return await self._send(method, path, headers, **kwargs)
+
+    async def get_json(self, path: str, params: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Any:
+        """
+        GET a Habu API resource and return its parsed JSON body.
+
+        Responses carrying an ETag or Last-Modified are remembered together with
+        the parsed payload. The next GET sends If-None-Match / If-Modified-Since,
+        and a 304 reuses the stored payload without downloading or parsing the
+        body again. Identical concurrent calls share one upstream request, and
+        transient failures are retried by the Habu retry policy.
+        The returned payload may be shared, so callers must not mutate it.
+
+        Raises:
+            httpx.HTTPStatusError: For non-2xx responses
+        """
+        headers = await self.get_auth_headers()
+        flight_key = ("json",) + self._request_key(path, params, headers)
+        return await self.single_flight.do(
+            flight_key,
+            lambda: self.retry_policy.call(lambda: self._get_json(path, params, headers, **kwargs))
+        )
+
+    async def _get_json(self, path: str, params: Optional[Dict[str, Any]],
+                        headers: Dict[str, str], **kwargs: Any) -> Any:
+        """Conditional GET against the validator cache"""
+        # Validators are scoped to the client credentials, not the (rotating) token
+        validator_key = self._request_key(path, params, {"Authorization": self.client_id or ""})
+        conditional_headers = self.validators.conditional_headers(validator_key)
+
+        response = await self._send_read(path, headers, params=params,
+                                         extra_headers=conditional_headers, **kwargs)
+
+        if response.status_code == 304 and self.validators.get(validator_key) is not None:
+            return self.validators.mark_not_modified(validator_key)
+
+        response.raise_for_status()
+        payload = response.json()
+        self.validators.store(
+            validator_key,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+            payload,
+            len(response.content)
+        )
+        return payload
+
+    async def _send_read(self, path: str, headers: Dict[str, str], **kwargs: Any) -> httpx.Response:
+        """
+        Send an idempotent GET, hedged when the caller opted in with with_hedging.
+
+        The hedge goes out once the endpoint's p95 has passed (no hedging until
+        the endpoint has enough latency samples) and the budget allows it.
+        """
+        budget = current_hedge_budget()
+        delay = self.latency.percentile("GET", path, 95) if budget is not None else None
+        if delay is None:
+            return await self._send("GET", path, headers, **kwargs)
+        return await hedged_call(
+            lambda: self._send("GET", path, headers, **kwargs),
+            max(delay, self.min_hedge_delay),
+            budget
+        )
+
+    async def _send(self, method: str, path: str, headers: Dict[str, str],
+                    extra_headers: Optional[Dict[str, str]] = None, **kwargs: Any) -> httpx.Response:
+        """Send one request, retrying once with a fresh token on 401"""
+        response = await self._dispatch(method, path, {**headers, **(extra_headers or {})}, **kwargs)
+
+        if response.status_code == 401:
+            logger.warning("Authentication failed, refreshing token")
+            # Token might be revoked, reset and retry (unless a concurrent caller already did)
+            if headers["Authorization"] == f"{self._token_type} {self._access_token}":
+                self.reset_token()
+            headers = await self.get_auth_headers()
+            response = await self._dispatch(method, path, {**headers, **(extra_headers or {})}, **kwargs)
+
+        return response
+
+    async def _dispatch(self, method: str, path: str, headers: Dict[str, str], **kwargs: Any) -> httpx.Response:
+        """
+        Send through the cluster-wide rate limiter.
+
+        A 429/503 with Retry-After pauses the shared bucket for every instance,
+        and the request is sent once more when the pause fits within the
+        limiter's max wait.
+        """
+        client = self.get_client()
+        url = f"{self.base_url}{path}"
+
+        await self.rate_limiter.acquire()
+        response = await self._timed_request(client, method, path, url, headers, **kwargs)
+
+        if response.status_code in (429, 503):
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                await self.rate_limiter.block_for(retry_after)
+                if retry_after <= self.rate_limiter.max_wait:
+                    await self.rate_limiter.acquire()
+                    response = await self._timed_request(client, method, path, url, headers, **kwargs)
+
+        return response
+
+    async def _timed_request(self, client: httpx.AsyncClient, method: str, path: str, url: str,
+                             headers: Dict[str, str], timeout: Optional[float] = None,
+                             **kwargs: Any) -> httpx.Response:
+        """
+        Send with a timeout derived from the endpoint's observed latency.
+
+        The caller's timeout only applies until the endpoint has enough samples.
+        Timeouts are counted separately, never as latency samples, so repeated
+        timeouts can't push the budget up.
+        """
+        default = self.default_timeout if timeout is None else float(timeout)
+        adaptive = httpx.Timeout(**self.latency.timeouts_for(method, path, default))
+
+        started = time.monotonic()
+        try:
+            response = await client.request(method, url, headers=headers, timeout=adaptive, **kwargs)
+        except httpx.TimeoutException:
+            self.latency.observe(method, path, time.monotonic() - started, timed_out=True)
+            raise
+        self.latency.observe(method, path, time.monotonic() - started)
+        return response
+
+    @staticmethod
+    def _request_key(path: str, params: Optional[Dict[str, Any]], headers: Dict[str, str]) -> tuple:
+        """Coalescing key: path, normalized params and a fingerprint of the credentials"""
+        normalized_params = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+        credentials = hashlib.sha256(headers.get("Authorization", "").encode()).hexdigest()[:16]
+        return (path, normalized_params, credentials)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Client layer statistics for monitoring endpoints"""
+        return {
+            "http2": self.http2,
+            "pool_limits": {
+                "max_connections": self.max_connections,
+                "max_keepalive_connections": self.max_keepalive_connections,
+                "keepalive_expiry": self.keepalive_expiry
+            },
+            "token": self.get_token_info(),
+            "single_flight": self.single_flight.stats(),
+            "conditional_get": self.validators.stats(),
+            "rate_limiter": self.rate_limiter.stats(),
+            "latency": self.latency.snapshot(),
+            "hedging": habu_hedge_budget.stats(),
+            "retries": self.retry_policy.stats()
+        }
 
 # Global config instance
-habu_config = HabuConfig()
\ No newline at end of file
+habu_config = HabuConfig()
@@ -33,6 +33,8 @@ from tools.habu_submit_query import habu_submit_query
 from tools.habu_check_status import habu_check_status
 from tools.habu_get_results import habu_get_results
 from tools.habu_list_exports import habu_list_exports, habu_download_export
+from config.habu_config import habu_config
+from redis_cache import initialize_cache, shutdown_cache
 from agents.habu_chat_agent import habu_agent
 from agents.enhanced_habu_chat_agent import enhanced_habu_agent
 
@@ -53,12 +55,31 @@ if config_errors:
         logger.warning("Continuing with mock data enabled due to configuration issues")
         os.environ["HABU_USE_MOCK_DATA"] = "true"
 
+# Serve the demo API routes (asgi_api.py) from the MCP server process
+MOUNT_DEMO_API = os.getenv("MOUNT_DEMO_API", "false").lower() == "true"
+# Mounted demo routes served without an API key: read-only health and catalog data.
+# Everything else (chat, batch, query submission, results, exports, stats) needs X-API-Key.
+PUBLIC_DEMO_API_PATHS = frozenset({
+    "/api/health",
+    "/api/support-context",
+    "/api/technical-context",
+    "/api/dashboard",
+    "/api/mcp/habu_list_templates",
+    "/api/mcp/habu_enhanced_templates",
+    "/api/mcp/habu_list_partners"
+})
+
 # 3. Lifespan manager for initial database table creation
 @asynccontextmanager
 async def lifespan(app: Starlette):
     logger.info("MCP Server starting up...")
     logger.info(f"Mock data mode: {production_config.HABU_USE_MOCK_DATA}")
     
+    if MOUNT_DEMO_API:
+        await initialize_cache()
+        from api_handlers import dashboard_snapshot
+        await dashboard_snapshot.start()
+    
     try:
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
@@ -69,6 +90,11 @@ async def lifespan(app: Starlette):
     
     yield
     logger.info("MCP Server shutting down...")
+    if MOUNT_DEMO_API:
+        await dashboard_snapshot.stop()
+    await habu_config.aclose()
+    if MOUNT_DEMO_API:
+        await shutdown_cache()
 
 # 4. Create the MCP server instance
 mcp_server = FastMCP(
@@ -100,6 +126,11 @@ class ApiKeyAuthMiddleware(BaseHTTPMiddleware):
                 "documentation": "Model Context Protocol Server for Habu Clean Room APIs"
             })
         
+        # Read-only mounted demo routes are public; mutating or expensive ones fall through to auth
+        if (MOUNT_DEMO_API and request.method in ("GET", "HEAD")
+                and request.url.path.rstrip("/") in PUBLIC_DEMO_API_PATHS):
+            return await call_next(request)
+        
         # Allow MCP endpoint to proceed to authentication
         if request.url.path.startswith("/mcp"):
             pass  # Continue to auth check below
@@ -179,11 +210,12 @@ async def habu_list_templates_tool() -> str:
 
 @mcp_server.tool(
     name="habu_enhanced_templates",
-    description="Advanced template listing with detailed metadata, parameter specifications, categorization, and data type information for better query building."
+    description="Advanced template listing with detailed metadata, parameter specifications, categorization, and data type information for better query building. Pass all_cleanrooms=true to see every runnable template across all cleanrooms in one call."
 )
-async def habu_enhanced_templates_tool(cleanroom_id: str = None) -> str:
-    """Get enhanced template data with full metadata for intelligent query building."""
-    return await habu_enhanced_templates(cleanroom_id)
+async def habu_enhanced_templates_tool(cleanroom_id: str = None, all_cleanrooms: bool = False) -> str:
+    """Get enhanced template data with full metadata for intelligent query building.
+    Set all_cleanrooms to get one deduplicated catalog across every cleanroom."""
+    return await habu_enhanced_templates(cleanroom_id, all_cleanrooms)
 
 @mcp_server.tool(
     name="habu_submit_query",
@@ -277,6 +309,13 @@ async def habu_enable_mock_mode(enable: bool = True) -> str:
             "message": "Mock mode disabled. Tools will use real Habu API endpoints."
         }, indent=2)
 
+# 5b. Optionally serve the demo API (/api/*) from this process, sharing caches and pools
+if MOUNT_DEMO_API:
+    from asgi_api import api_routes
+    for route in api_routes:
+        mcp_server.custom_route(route.path, methods=sorted(route.methods - {"HEAD"}))(route.endpoint)
+    logger.info(f"Mounted {len(api_routes)} demo API routes on the MCP server")
+
 # 6. Run the server with FastMCP
 if __name__ == "__main__":
     logger.info(f"Starting Habu Clean Room MCP Server")
@@ -3,28 +3,89 @@ Redis Cache Implementation for Phase H Performance Optimization
 Provides intelligent caching for API responses and session management
 """
 
+import fnmatch
 import json
 import logging
+import math
 import os
 import hashlib
-from typing import Optional, Any, Dict, Union
+import random
+import time
+import uuid
+from typing import Optional, Any, Awaitable, Callable, Dict, Iterable, List, Tuple, Union
 from datetime import datetime, timedelta
-import redis.asyncio as redis
 import asyncio
+from redis.commands.core import AsyncScript
+from utils.cache_codec import CacheCodec, VERSION_OFFSET
+from utils.cache_invalidation import VERSION_KEY, CacheInvalidator
+from utils.local_cache import LocalCache
+from utils.rate_limiter import request_priority
+from utils.redis_connection import RedisConnectionManager
+from utils.single_flight import SingleFlight
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# One round trip per write: take the next cluster-wide version, stamp it into the
+# encoded entry's header, store the entry, index it under its tags (dropping
+# members that have expired since) and tell the other workers.
+# KEYS: version counter, entry, tag sets...
+# ARGV: entry, version offset, entry TTL (ms), now, stale_until, tag TTL (s),
+#       channel, message before the version, message after it
+WRITE_ENTRY_SCRIPT = AsyncScript(None, b"""
+local version = redis.call('INCR', KEYS[1])
+local offset = tonumber(ARGV[2])
+local entry = string.sub(ARGV[1], 1, offset) .. struct.pack('>I8', version) .. string.sub(ARGV[1], offset + 9)
+redis.call('SET', KEYS[2], entry, 'PX', ARGV[3])
+for i = 3, #KEYS do
+    redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', ARGV[4])
+    redis.call('ZADD', KEYS[i], ARGV[5], KEYS[2])
+    redis.call('EXPIRE', KEYS[i], ARGV[6])
+end
+redis.call('PUBLISH', ARGV[7], ARGV[8] .. string.format('%d', version) .. ARGV[9])
+return version
+""")
+
 class RedisCache:
     """
     Advanced Redis caching system for API responses and session management
+    
+    Two tiers: a bounded in-process LRU (L1) of decoded entries in front of
+    Redis (L2). Both use the same TTL policy; with Redis unavailable the
+    cache keeps working from L1 alone. Writes and invalidations are broadcast
+    over pub/sub so other workers drop their L1 copies.
+    
+    Every entry is indexed under its tags (e.g. 'cleanroom:<id>', 'template',
+    'partner', 'session:<id>', plus 'type:<cache_type>') in a sorted set scored
+    by the entry's expiry, so invalidation touches only the tagged entries and
+    nothing needs KEYS. Data derived from an entry (see add_derived) is
+    dropped together with it.
+    
+    Recomputation is stampede-protected: a fresh entry is refreshed early with
+    a probability that rises towards its expiry (XFetch, scaled by how long
+    the last fetch took), and a miss takes a short Redis lock so only one
+    worker calls upstream while the others wait for its entry.
+    
+    Entries are stored in Redis in a compact binary form (see CacheCodec);
+    pass a codec to change the serializer or compression. L1 accounts each
+    entry at its uncompressed encoded size, whichever tier it came from.
     """
     
-    def __init__(self):
-        self.redis = None
-        self.connected = False
+    def __init__(self, codec: Optional[CacheCodec] = None):
         self.redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379')
+        # One pool per worker loop, reconnected in the background when Redis drops
+        self.manager = RedisConnectionManager(
+            self.redis_url,
+            max_connections=int(os.getenv('REDIS_MAX_CONNECTIONS', '20')),
+            max_backoff=float(os.getenv('REDIS_RECONNECT_MAX_BACKOFF', '30')),
+            encoding='utf-8',
+            decode_responses=True,
+            socket_timeout=5,
+            socket_connect_timeout=5,
+            retry_on_timeout=True,
+            health_check_interval=30
+        )
         
         # Cache configuration
         self.default_ttl = 300  # 5 minutes default
@@ -38,36 +99,57 @@ class RedisCache:
             'session_data': 3600,     # 1 hour for session data
         }
         
+        # Stale-while-revalidate: how long past its TTL an entry may still be served
+        self.max_stale = int(os.getenv('CACHE_MAX_STALE', '3600'))
+        self.refresh_lock_ttl = int(os.getenv('CACHE_REFRESH_LOCK_TTL', '60'))
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.swr_stats = {'fresh_hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_failures': 0}
+        
+        # Stampede protection: XFetch eagerness (0 disables early refresh) and how long
+        # a miss waits for the worker holding the recompute lock before fetching itself
+        self.xfetch_beta = float(os.getenv('CACHE_XFETCH_BETA', '1.0'))
+        self.lock_wait = float(os.getenv('CACHE_LOCK_WAIT', '2.0'))
+        self.lock_poll_interval = 0.05
+        self._misses = SingleFlight("cache_miss")
+        self.stampede_stats = {'early_refreshes': 0, 'lock_waits': 0, 'served_after_wait': 0, 'lock_timeouts': 0}
+        
+        # In-process L1 in front of Redis
+        self.local = LocalCache(
+            max_entries=int(os.getenv('CACHE_L1_MAX_ENTRIES', '1000')),
+            max_bytes=int(os.getenv('CACHE_L1_MAX_BYTES', str(64 * 1024 * 1024)))
+        )
+        self.l2_stats = {'hits': 0, 'misses': 0, 'write_failures': 0}
+        
+        # Redis entry encoding, with bytes written per cache type
+        self.codec = codec or CacheCodec.from_env()
+        self.encoding_stats: Dict[str, Dict[str, int]] = {}
+        self.invalidator = CacheInvalidator(self)
+        
+        # Tag index lifetime; refreshed on every write and at least as long as the entry
+        self.tag_ttl = int(os.getenv('CACHE_TAG_TTL', '86400'))
+        self.scan_count = int(os.getenv('CACHE_SCAN_COUNT', '500'))
+        self._derived: List[Tuple[str, Callable[[Callable[[str], bool]], Any]]] = []
+        
+    @property
+    def connected(self) -> bool:
+        """Latest known Redis state (updated on failures and background reconnects)"""
+        return self.manager.connected
+    
     async def connect(self):
         """Initialize Redis connection with fallback handling"""
-        try:
-            self.redis = redis.from_url(
-                self.redis_url,
-                encoding='utf-8',
-                decode_responses=True,
-                socket_timeout=5,
-                socket_connect_timeout=5,
-                retry_on_timeout=True,
-                health_check_interval=30
-            )
-            
-            # Test connection
-            await self.redis.ping()
-            self.connected = True
+        if await self.manager.connect():
             logger.info("✅ Redis cache connected successfully")
-            
-        except Exception as e:
-            logger.warning(f"⚠️ Redis connection failed: {e}")
-            logger.info("📄 Falling back to in-memory cache")
-            self.connected = False
-            self.redis = None
+        else:
+            logger.warning(f"⚠️ Redis connection failed: {self.manager.last_error}")
+            logger.info("📄 Serving from the in-process cache until Redis reconnects (retrying in background)")
+        # Subscribes once Redis is reachable
+        await self.invalidator.start()
             
     async def disconnect(self):
         """Close Redis connection"""
-        if self.redis:
-            await self.redis.close()
-            self.connected = False
-            logger.info("Redis connection closed")
+        await self.invalidator.stop()
+        await self.manager.disconnect()
+        logger.info("Redis connection closed")
     
     def _generate_cache_key(self, prefix: str, identifier: str, params: Optional[Dict] = None) -> str:
         """Generate consistent cache key with optional parameters"""
@@ -81,12 +163,38 @@ class RedisCache:
             
         return ":".join(key_parts)
     
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return f"tag:{tag}"
+    
+    def add_derived(self, prefix: str, evict: Callable[[Callable[[str], bool]], Any]):
+        """
+        Register data derived from entries, kept in Redis as '<prefix><endpoint>'
+        for the entry 'api:<endpoint>' (e.g. its encoded HTTP response)
+        
+        Invalidation unlinks the derived keys along with the entries, and
+        evict is called with a predicate on entry keys so the owner drops its
+        in-process copies, on this worker and (via pub/sub) on the others.
+        """
+        self._derived.append((prefix, evict))
+    
+    def _derived_keys(self, keys: Iterable[str]) -> List[str]:
+        return [prefix + key[len('api:'):] for key in keys if key.startswith('api:') for prefix, _ in self._derived]
+    
+    def evict_derived(self, matches: Callable[[str], bool]):
+        """Drop in-process derived data for the entry keys satisfying matches"""
+        for _, evict in self._derived:
+            evict(matches)
+    
     async def cache_api_response(self, 
                                endpoint: str, 
                                data: Union[Dict, str], 
                                cache_type: str = 'api_response',
                                custom_ttl: Optional[int] = None,
-                               params: Optional[Dict] = None) -> bool:
+                               params: Optional[Dict] = None,
+                               max_stale: int = 0,
+                               tags: Iterable[str] = (),
+                               compute_time: float = 0.0) -> bool:
         """
         Cache API response with intelligent TTL
         
@@ -96,71 +204,341 @@ class RedisCache:
             cache_type: Type of cache for TTL lookup
             custom_ttl: Override TTL in seconds
             params: Additional parameters for cache key generation
-        """
-        if not self.connected:
-            return False
+            max_stale: Keep the entry this long past its TTL for stale-while-revalidate
+            tags: Invalidation tags (e.g. 'cleanroom:<id>'); 'type:<cache_type>' is always added
+            compute_time: Seconds it took to produce data (drives early recomputation)
             
+        Returns:
+            True once the entry is cached, in process at least (Redis write
+            failures are counted in l2 'write_failures'); False if the data
+            can't be serialized
+        """
+        cache_key = self._generate_cache_key('api', endpoint, params)
+        ttl = custom_ttl or self.ttl_config.get(cache_type, self.default_ttl)
+        tags = sorted({*tags, f"type:{cache_type}"})
+        
+        # Prepare cache entry with metadata (Redis assigns the version on write)
+        cache_entry = {
+            'data': data,
+            'cached_at': datetime.utcnow().isoformat(),
+            'cache_type': cache_type,
+            'ttl': ttl,
+            'expires_at': time.time() + ttl,
+            'stale_until': time.time() + ttl + max_stale,
+            'version': 0,
+            'tags': tags,
+            'compute_time': round(compute_time, 3)
+        }
         try:
-            cache_key = self._generate_cache_key('api', endpoint, params)
-            ttl = custom_ttl or self.ttl_config.get(cache_type, self.default_ttl)
-            
-            # Prepare cache entry with metadata
-            cache_entry = {
-                'data': data,
-                'cached_at': datetime.utcnow().isoformat(),
-                'cache_type': cache_type,
-                'ttl': ttl
-            }
-            
-            # Store in Redis
-            await self.redis.setex(
-                cache_key,
-                ttl,
-                json.dumps(cache_entry, default=str)
-            )
-            
-            logger.info(f"✅ Cached {cache_type} for {endpoint} (TTL: {ttl}s)")
-            return True
-            
-        except Exception as e:
+            serialized, raw_size = self.codec.encode(cache_entry)
+        except (TypeError, ValueError, OverflowError) as e:
             logger.error(f"❌ Cache write failed for {endpoint}: {e}")
             return False
+        
+        # Entries are binary (see CacheCodec), so they go through the bytes-reply client
+        redis_client = await self.manager.get_binary_client()
+        written = False
+        if redis_client is not None:
+            try:
+                # Kept in Redis for max_stale beyond the logical TTL
+                message_head, message_tail = self.invalidator.message_parts(op='key', key=cache_key)
+                cache_entry['version'] = int(await WRITE_ENTRY_SCRIPT(
+                    keys=[VERSION_KEY, cache_key, *(self._tag_key(tag) for tag in tags)],
+                    args=[serialized, VERSION_OFFSET, max(1, int((ttl + max_stale) * 1000)), time.time(),
+                          cache_entry['stale_until'], math.ceil(max(self.tag_ttl, ttl + max_stale)),
+                          self.invalidator.channel, message_head, message_tail],
+                    client=redis_client
+                ))
+                self.invalidator.stats_counters['published'] += 1
+                self._count_encoded(cache_type, raw_size, len(serialized))
+                written = True
+            except Exception as e:
+                self.manager.report_failure(e)
+                self.l2_stats['write_failures'] += 1
+                logger.warning(f"⚠️ Redis write failed for {endpoint}, cached in process only: {e}")
+        
+        # L1 keeps the decoded entry for as long as Redis keeps the serialized one, unless
+        # a newer write elsewhere was announced while this one was in flight
+        if not written or self.invalidator.accepts(cache_key, cache_entry['version']):
+            self.local.set(cache_key, cache_entry, ttl + max_stale, raw_size)
+        if written:
+            logger.info(f"✅ Cached {cache_type} for {endpoint} (TTL: {ttl}s)")
+        elif redis_client is None:
+            logger.info(f"✅ Cached {cache_type} for {endpoint} in process (TTL: {ttl}s, Redis unavailable)")
+        return True
     
     async def get_cached_response(self, 
                                 endpoint: str, 
-                                params: Optional[Dict] = None) -> Optional[Dict]:
+                                params: Optional[Dict] = None,
+                                allow_stale: bool = False) -> Optional[Dict]:
         """
         Retrieve cached API response with metadata
         
         Args:
             endpoint: API endpoint identifier
             params: Additional parameters for cache key generation
+            allow_stale: Also return entries past their TTL (marked 'stale')
             
         Returns:
             Cached data with metadata or None if not found/expired
         """
-        if not self.connected:
+        cache_key = self._generate_cache_key('api', endpoint, params)
+        cache_entry = self.local.get(cache_key)
+        tier = 'l1'
+        
+        if cache_entry is None:
+            cache_entry = await self._read_l2(cache_key, endpoint)
+            tier = 'l2'
+        if cache_entry is None:
+            return None
+        
+        # Per-call copy of the envelope; 'data' itself is shared and must not be mutated
+        cache_entry = dict(cache_entry)
+        
+        # Entries written before expires_at existed are fresh until Redis drops them
+        cache_entry['stale'] = time.time() >= cache_entry.get('expires_at', float('inf'))
+        if cache_entry['stale'] and not allow_stale:
+            return None
+        
+        # Add cache hit metadata
+        cache_entry['cache_hit'] = True
+        cache_entry['cache_tier'] = tier
+        cache_entry['retrieved_at'] = datetime.utcnow().isoformat()
+        
+        logger.info(f"✅ Cache hit for {endpoint} ({tier.upper()})")
+        return cache_entry
+    
+    async def _read_l2(self, cache_key: str, endpoint: str) -> Optional[Dict]:
+        """Entry from Redis, decoded once and kept in L1 for its remaining lifetime"""
+        redis_client = await self.manager.get_binary_client()
+        if redis_client is None:
             return None
             
         try:
-            cache_key = self._generate_cache_key('api', endpoint, params)
-            cached_data = await self.redis.get(cache_key)
-            
-            if cached_data:
-                cache_entry = json.loads(cached_data)
-                
-                # Add cache hit metadata
-                cache_entry['cache_hit'] = True
-                cache_entry['retrieved_at'] = datetime.utcnow().isoformat()
-                
-                logger.info(f"✅ Cache hit for {endpoint}")
-                return cache_entry
-                
+            cached_data = await redis_client.get(cache_key)
         except Exception as e:
+            self.manager.report_failure(e)
             logger.error(f"❌ Cache read failed for {endpoint}: {e}")
+            return None
+        
+        if not cached_data:
+            self.l2_stats['misses'] += 1
+            return None
+        self.l2_stats['hits'] += 1
+        
+        try:
+            cache_entry, raw_size = self.codec.decode_sized(cached_data)
+        except Exception as e:
+            # Corrupt, or written with a serializer/compressor this worker lacks
+            logger.error(f"❌ Unreadable cache entry for {endpoint}, treating as a miss: {e}")
+            return None
+        # Same lifetime as in Redis; entries without stale_until live for their TTL.
+        # Skipped if an invalidation for a newer version arrived while this read was in flight.
+        if self.invalidator.accepts(cache_key, cache_entry.get('version', 0)):
+            stale_until = cache_entry.get('stale_until', cache_entry.get('expires_at', time.time() + self.default_ttl))
+            self.local.set(cache_key, cache_entry, stale_until - time.time(), raw_size)
+        return cache_entry
+    
+    def _count_encoded(self, cache_type: str, raw_size: int, stored_size: int):
+        counts = self.encoding_stats.setdefault(cache_type, {'entries': 0, 'raw_bytes': 0, 'stored_bytes': 0})
+        counts['entries'] += 1
+        counts['raw_bytes'] += raw_size
+        counts['stored_bytes'] += stored_size
+    
+    def encoding_report(self) -> Dict[str, Any]:
+        """Bytes this worker wrote to Redis per cache type, before and after compression"""
+        return {
+            **self.codec.describe(),
+            'types': {
+                cache_type: {
+                    **counts,
+                    'avg_stored_bytes': counts['stored_bytes'] // counts['entries'],
+                    'compression_ratio': round(counts['raw_bytes'] / counts['stored_bytes'], 2) if counts['stored_bytes'] else 0.0
+                }
+                for cache_type, counts in self.encoding_stats.items()
+            }
+        }
+    
+    async def get_or_refresh(self,
+                             endpoint: str,
+                             fetch: Callable[[], Awaitable[Any]],
+                             cache_type: str = 'api_response',
+                             custom_ttl: Optional[int] = None,
+                             params: Optional[Dict] = None,
+                             max_stale: Optional[int] = None,
+                             should_cache: Optional[Callable[[Any], bool]] = None,
+                             tags: Iterable[str] = ()) -> Dict:
+        """
+        Stale-while-revalidate read
+        
+        A fresh entry is returned as is, occasionally triggering an early
+        background refresh as it nears expiry. An entry past its TTL but within
+        max_stale is returned immediately while one background task (per key,
+        across workers) refetches it. Only a missing or too-stale entry makes the
+        caller wait: for its own fetch() if it wins the recompute lock, otherwise
+        for the entry the lock holder writes.
+        
+        Args:
+            endpoint: API endpoint identifier
+            fetch: Coroutine function producing fresh data
+            cache_type: Type of cache for TTL lookup
+            custom_ttl: Override TTL in seconds
+            params: Additional parameters for cache key generation
+            max_stale: Seconds past the TTL an entry may be served (default CACHE_MAX_STALE)
+            should_cache: Predicate on fresh data; rejected data (e.g. an error
+                envelope) is returned but never replaces the cached entry
+            tags: Invalidation tags for the cached entry
             
+        Returns:
+            Cache entry dict with 'data', 'cached_at', 'cache_hit' and 'stale'
+        """
+        max_stale = self.max_stale if max_stale is None else max_stale
+        cached_entry = await self.get_cached_response(endpoint, params, allow_stale=max_stale > 0)
+        
+        # Hard limit, also for entries written with a longer max_stale
+        if cached_entry is not None and time.time() - cached_entry.get('expires_at', float('inf')) > max_stale:
+            cached_entry = None
+        
+        if cached_entry is not None:
+            if cached_entry['stale']:
+                self.swr_stats['stale_hits'] += 1
+                self._schedule_refresh(endpoint, fetch, cache_type, custom_ttl, params, max_stale, should_cache, tags)
+            else:
+                self.swr_stats['fresh_hits'] += 1
+                if self._expires_early(cached_entry):
+                    self.stampede_stats['early_refreshes'] += 1
+                    self._schedule_refresh(endpoint, fetch, cache_type, custom_ttl, params, max_stale, should_cache, tags)
+            return cached_entry
+        
+        self.swr_stats['misses'] += 1
+        # Concurrent misses in this worker share one lock attempt and one fetch
+        cache_key = self._generate_cache_key('api', endpoint, params)
+        return await self._misses.do(cache_key, lambda: self._fill(
+            cache_key, endpoint, fetch, cache_type, custom_ttl, params, max_stale, should_cache, tags
+        ))
+    
+    def _expires_early(self, cache_entry: Dict) -> bool:
+        """
+        XFetch: treat the entry as expired with a probability that grows as
+        expires_at nears, sooner for entries that took longer to compute
+        """
+        compute_time = cache_entry.get('compute_time', 0)
+        if compute_time <= 0 or self.xfetch_beta <= 0:
+            return False
+        # 1 - random() is in (0, 1], so the log is finite and <= 0
+        return time.time() - compute_time * self.xfetch_beta * math.log(1.0 - random.random()) >= cache_entry['expires_at']
+    
+    async def _acquire_lock(self, redis_client, lock_key: str) -> Optional[str]:
+        """Token for the recompute lock, or None if another worker holds it"""
+        token = uuid.uuid4().hex
+        if await redis_client.set(lock_key, token, nx=True, px=self.refresh_lock_ttl * 1000):
+            return token
         return None
     
+    async def _release_lock(self, redis_client, lock_key: str, token: str):
+        """Release the lock unless it expired and another worker took it over"""
+        try:
+            if await redis_client.get(lock_key) == token:
+                await redis_client.delete(lock_key)
+        except Exception as e:
+            self.manager.report_failure(e)
+    
+    async def _fill(self, cache_key, endpoint, fetch, cache_type, custom_ttl, params, max_stale, should_cache, tags) -> Dict:
+        """Fetch and cache a missing entry, unless another worker is already doing it"""
+        lock_key = f"refresh:{cache_key}"
+        redis_client = await self.manager.get_client()
+        token = None
+        if redis_client is not None:
+            try:
+                token = await self._acquire_lock(redis_client, lock_key)
+            except Exception as e:
+                self.manager.report_failure(e)
+                redis_client = None
+            if redis_client is not None and token is None:
+                cached_entry = await self._wait_for_entry(endpoint, params, max_stale)
+                if cached_entry is not None:
+                    return cached_entry
+        
+        try:
+            started = time.monotonic()
+            data = await fetch()
+            if should_cache is None or should_cache(data):
+                await self.cache_api_response(endpoint, data, cache_type, custom_ttl, params, max_stale, tags,
+                                              compute_time=time.monotonic() - started)
+        finally:
+            if token is not None:
+                await self._release_lock(redis_client, lock_key, token)
+        return {
+            'data': data,
+            'cached_at': datetime.utcnow().isoformat(),
+            'cache_type': cache_type,
+            'cache_hit': False,
+            'stale': False
+        }
+    
+    async def _wait_for_entry(self, endpoint, params, max_stale) -> Optional[Dict]:
+        """Poll for the entry the lock holder is computing; None if it doesn't show up in time"""
+        self.stampede_stats['lock_waits'] += 1
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.lock_poll_interval)
+            cached_entry = await self.get_cached_response(endpoint, params, allow_stale=max_stale > 0)
+            if cached_entry is not None and time.time() - cached_entry.get('expires_at', float('inf')) <= max_stale:
+                self.stampede_stats['served_after_wait'] += 1
+                return cached_entry
+        # The holder is slow or died; fetch rather than fail
+        self.stampede_stats['lock_timeouts'] += 1
+        logger.warning(f"Timed out waiting for another worker to fill {endpoint}, fetching directly")
+        return None
+    
+    def _schedule_refresh(self, endpoint, fetch, cache_type, custom_ttl, params, max_stale, should_cache, tags):
+        """Start a background refresh for this key unless one is already running here"""
+        cache_key = self._generate_cache_key('api', endpoint, params)
+        task = self._refreshing.get(cache_key)
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            return
+        self._refreshing[cache_key] = asyncio.ensure_future(
+            self._refresh(cache_key, endpoint, fetch, cache_type, custom_ttl, params, max_stale, should_cache, tags)
+        )
+    
+    async def _refresh(self, cache_key, endpoint, fetch, cache_type, custom_ttl, params, max_stale, should_cache, tags):
+        """
+        Refetch a stale (or soon to expire) entry, holding a short Redis lock so
+        only one worker does it; the fetch runs at background priority
+        """
+        lock_key = f"refresh:{cache_key}"
+        try:
+            redis_client = await self.manager.get_client()
+            # Without Redis there is no other worker to coordinate with; _refreshing dedupes locally
+            token = None
+            if redis_client is not None:
+                token = await self._acquire_lock(redis_client, lock_key)
+                if token is None:
+                    return
+            try:
+                started = time.monotonic()
+                # Nobody is waiting on it, so it mustn't use the interactive rate-limit reserve
+                with request_priority("background"):
+                    data = await fetch()
+                if should_cache is None or should_cache(data):
+                    await self.cache_api_response(endpoint, data, cache_type, custom_ttl, params, max_stale, tags,
+                                                  compute_time=time.monotonic() - started)
+                    self.swr_stats['refreshes'] += 1
+                    logger.info(f"🔄 Refreshed stale cache entry for {endpoint}")
+                else:
+                    self.swr_stats['refresh_failures'] += 1
+                    logger.warning(f"Background refresh for {endpoint} returned uncacheable data, keeping stale entry")
+            finally:
+                if token is not None:
+                    await self._release_lock(redis_client, lock_key, token)
+        except Exception as e:
+            self.swr_stats['refresh_failures'] += 1
+            self.manager.report_failure(e)
+            logger.warning(f"Background refresh failed for {endpoint}, keeping stale entry: {e}")
+        finally:
+            if self._refreshing.get(cache_key) is asyncio.current_task():
+                del self._refreshing[cache_key]
+    
     async def cache_chat_context(self, 
                                session_id: str, 
                                context: Dict,
@@ -170,7 +548,8 @@ class RedisCache:
             endpoint=f"chat_context_{session_id}",
             data=context,
             cache_type='chat_context',
-            custom_ttl=custom_ttl
+            custom_ttl=custom_ttl,
+            tags=[f"session:{session_id}"]
         )
     
     async def get_chat_context(self, session_id: str) -> Optional[Dict]:
@@ -187,7 +566,8 @@ class RedisCache:
             endpoint=f"template_{template_id}",
             data=enhanced_data,
             cache_type='template_data',
-            custom_ttl=custom_ttl
+            custom_ttl=custom_ttl,
+            tags=['template']
         )
     
     async def get_template_data(self, template_id: str) -> Optional[Dict]:
@@ -204,7 +584,8 @@ class RedisCache:
             endpoint=f"partners_{org_id}",
             data=partners,
             cache_type='partner_data',
-            custom_ttl=custom_ttl
+            custom_ttl=custom_ttl,
+            tags=['partner']
         )
     
     async def get_partner_list(self, org_id: str) -> Optional[Dict]:
@@ -212,47 +593,128 @@ class RedisCache:
         result = await self.get_cached_response(f"partners_{org_id}")
         return result['data'] if result else None
     
+    async def invalidate_tags(self, *tags: str) -> int:
+        """
+        Invalidate every entry carrying any of the given tags
+        
+        Reads the tag indexes and unlinks their entries (and derived keys) in
+        two pipelined round trips, so the cost is proportional to the number
+        of tagged entries.
+        
+        Args:
+            tags: Tags given at write time (e.g. 'cleanroom:abc', 'partner')
+            
+        Returns:
+            Number of keys deleted
+        """
+        tags = set(tags)
+        local_keys = self.local.delete_where(lambda entry: not tags.isdisjoint(entry.get('tags', ())))
+        redis_client = await self.manager.get_client()
+        if redis_client is None or not tags:
+            self.evict_derived(set(local_keys).__contains__)
+            return len(local_keys)
+        
+        tag_keys = [self._tag_key(tag) for tag in sorted(tags)]
+        keys: List[str] = []
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for tag_key in tag_keys:
+                    pipe.zrange(tag_key, 0, -1)
+                members = await pipe.execute()
+            keys = sorted({key for tagged in members for key in tagged})
+            
+            derived_keys = self._derived_keys(keys)
+            async with redis_client.pipeline(transaction=False) as pipe:
+                if keys:
+                    pipe.unlink(*keys)
+                if derived_keys:
+                    pipe.unlink(*derived_keys)
+                pipe.unlink(*tag_keys)
+                results = await pipe.execute()
+            deleted = results[0] if keys else 0
+            # After the unlink, so other workers can't refill from the old entries
+            await self.invalidator.publish_keys(redis_client, keys)
+            logger.info(f"🗑️ Invalidated {deleted} cache entries tagged {', '.join(sorted(tags))}")
+            return deleted or len(local_keys)
+        except Exception as e:
+            self.manager.report_failure(e)
+            logger.error(f"❌ Cache invalidation failed for tags {', '.join(sorted(tags))}: {e}")
+            return len(local_keys)
+        finally:
+            self.evict_derived(set(local_keys).union(keys).__contains__)
+    
+    async def invalidate_cleanroom(self, cleanroom_id: str) -> int:
+        """Invalidate everything cached for one cleanroom"""
+        return await self.invalidate_tags(f"cleanroom:{cleanroom_id}")
+    
+    async def scan_keys(self, redis_client, pattern: str) -> List[str]:
+        """Keys matching pattern via cursor-based SCAN (never blocks Redis like KEYS)"""
+        return [key async for key in redis_client.scan_iter(match=pattern, count=self.scan_count)]
+    
     async def invalidate_cache(self, pattern: str) -> int:
         """
         Invalidate cache entries matching pattern
         
+        Walks the keyspace with SCAN; prefer invalidate_tags where a tag fits.
+        
         Args:
             pattern: Redis key pattern (e.g., 'api:partners_*')
             
         Returns:
             Number of keys deleted
         """
-        if not self.connected:
-            return 0
+        local_deleted = self.local.delete_matching(pattern)
+        matches = lambda key: fnmatch.fnmatchcase(key, pattern)
+        redis_client = await self.manager.get_client()
+        if redis_client is None:
+            self.evict_derived(matches)
+            return local_deleted
             
         try:
-            keys = await self.redis.keys(pattern)
-            if keys:
-                deleted = await self.redis.delete(*keys)
+            keys = await self.scan_keys(redis_client, pattern)
+            deleted = 0
+            for i in range(0, len(keys), self.scan_count):
+                batch = keys[i:i + self.scan_count]
+                derived_keys = self._derived_keys(batch)
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    pipe.unlink(*batch)
+                    if derived_keys:
+                        pipe.unlink(*derived_keys)
+                    deleted += (await pipe.execute())[0]
+            # After the unlink, so other workers can't refill from the old entries
+            await self.invalidator.publish_pattern(redis_client, pattern)
+            if deleted:
                 logger.info(f"🗑️ Invalidated {deleted} cache entries matching {pattern}")
                 return deleted
         except Exception as e:
+            self.manager.report_failure(e)
             logger.error(f"❌ Cache invalidation failed for {pattern}: {e}")
+        finally:
+            self.evict_derived(matches)
             
-        return 0
+        return local_deleted
     
     async def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics and health info"""
-        if not self.connected:
+        redis_client = await self.manager.get_client()
+        if redis_client is None:
             return {
                 'connected': False,
-                'error': 'Redis not connected'
+                'error': 'Redis not connected',
+                'tiers': self.tier_stats(),
+                'connection': self.manager.health()
             }
             
         try:
-            info = await self.redis.info()
+            info = await redis_client.info()
             
-            # Get key counts by pattern
-            key_counts = {}
-            for cache_type in self.ttl_config.keys():
-                pattern = f"api:*{cache_type}*"
-                keys = await self.redis.keys(pattern)
-                key_counts[cache_type] = len(keys)
+            # Live entries per cache type from the type tag indexes, in one round trip
+            cache_types = list(self.ttl_config.keys())
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for cache_type in cache_types:
+                    pipe.zcount(self._tag_key(f"type:{cache_type}"), time.time(), '+inf')
+                counts = await pipe.execute()
+            key_counts = dict(zip(cache_types, counts))
             
             return {
                 'connected': True,
@@ -267,14 +729,40 @@ class RedisCache:
                     info.get('keyspace_misses', 0)
                 ),
                 'cache_key_counts': key_counts,
-                'ttl_config': self.ttl_config
+                'ttl_config': self.ttl_config,
+                'max_stale': self.max_stale,
+                'stale_while_revalidate': {**self.swr_stats, 'refreshing': len(self._refreshing)},
+                'stampede_protection': {**self.stampede_stats, 'coalesced_misses': self._misses.coalesced},
+                'tiers': self.tier_stats(),
+                'encoding': self.encoding_report(),
+                'invalidation': self.invalidator.stats(),
+                'connection': self.manager.health()
             }
         except Exception as e:
+            self.manager.report_failure(e)
             return {
-                'connected': True,
-                'error': str(e)
+                'connected': self.connected,
+                'error': str(e),
+                'tiers': self.tier_stats(),
+                'connection': self.manager.health()
             }
     
+    def tier_stats(self) -> Dict[str, Any]:
+        """Hit ratios per tier for this worker (L2 is only consulted on an L1 miss)"""
+        l1 = self.local.stats()
+        l2_hits, l2_misses = self.l2_stats['hits'], self.l2_stats['misses']
+        lookups = l1['hits'] + l1['misses']
+        return {
+            'l1': l1,
+            'l2': {
+                'hits': l2_hits,
+                'misses': l2_misses,
+                'hit_rate': self._calculate_hit_rate(l2_hits, l2_misses),
+                'write_failures': self.l2_stats['write_failures']
+            },
+            'overall_hit_rate': self._calculate_hit_rate(l1['hits'] + l2_hits, lookups - l1['hits'] - l2_hits)
+        }
+    
     def _calculate_hit_rate(self, hits: int, misses: int) -> float:
         """Calculate cache hit rate percentage"""
         total = hits + misses
@@ -294,10 +782,20 @@ async def shutdown_cache():
     await cache.disconnect()
 
 # Decorator for automatic caching
-def cache_response(cache_type: str = 'api_response', ttl: Optional[int] = None):
+def is_cacheable_result(result: Any) -> bool:
+    """Default cache_response predicate: None and error envelopes ({'status': 'error'}) aren't stored"""
+    return result is not None and not (isinstance(result, dict) and result.get('status') == 'error')
+
+def cache_response(cache_type: str = 'api_response', ttl: Optional[int] = None, max_stale: int = 0,
+                   should_cache: Optional[Callable[[Any], bool]] = is_cacheable_result):
     """
     Decorator to automatically cache function responses
     
+    Reads go through get_or_refresh, so decorated functions get stampede
+    protection (early refresh and the recompute lock). Expired results are
+    not served unless max_stale opts in to stale-while-revalidate, and
+    results rejected by should_cache are returned without being stored.
+    
     Usage:
         @cache_response('partner_data', 900)
         async def get_partners(org_id: str):
@@ -309,15 +807,14 @@ def cache_response(cache_type: str = 'api_response', ttl: Optional[int] = None):
             # Generate cache key from function name and arguments
             cache_key = f"{func.__name__}_{hashlib.md5(str(args + tuple(kwargs.items())).encode()).hexdigest()[:8]}"
             
-            # Try to get from cache first
-            cached_result = await cache.get_cached_response(cache_key)
-            if cached_result:
-                return cached_result['data']
-            
-            # Execute function and cache result
-            result = await func(*args, **kwargs)
-            await cache.cache_api_response(cache_key, result, cache_type, ttl)
-            
-            return result
+            cached_result = await cache.get_or_refresh(
+                cache_key,
+                lambda: func(*args, **kwargs),
+                cache_type=cache_type,
+                custom_ttl=ttl,
+                max_stale=max_stale,
+                should_cache=should_cache
+            )
+            return cached_result['data']
         return wrapper
     return decorator
\ No newline at end of file
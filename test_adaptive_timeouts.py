@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test per-endpoint latency histograms and adaptive timeouts
+Runs against an in-process stand-in for the Habu API
+"""
+import asyncio
+import httpx
+from utils.latency_tracker import LatencyTracker, endpoint_template
+from utils.rate_limiter import TokenBucketLimiter
+from test_support import mock_habu_config
+
+
+def test_endpoint_templates():
+    """Id segments are collapsed so one histogram covers every query"""
+    assert endpoint_template("/queries/7f3c-11/results") == "/queries/{id}/results"
+    assert endpoint_template("/cleanrooms/cr-1/partners") == "/cleanrooms/{id}/partners"
+    assert endpoint_template("/cleanrooms") == "/cleanrooms"
+    assert endpoint_template("/queries/abc") == "/queries/{id}"
+
+
+def test_timeout_follows_p99_within_floor_and_ceiling():
+    """Defaults apply while warming up, then p99 * multiplier + margin, clamped"""
+    tracker = LatencyTracker(min_samples=10, multiplier=1.5, margin=1.0, floor=2.0, ceiling=20.0)
+    assert tracker.read_timeout("GET", "/queries/q1", 30.0) == 30.0
+
+    for _ in range(10):
+        tracker.observe("GET", "/queries/q1", 0.05)
+    assert tracker.read_timeout("GET", "/queries/q2", 30.0) == 2.0
+
+    for _ in range(10):
+        tracker.observe("GET", "/cleanrooms/cr-1/cleanroom-questions", 8.0)
+    slow = tracker.read_timeout("GET", "/cleanrooms/cr-2/cleanroom-questions", 30.0)
+    assert 13.0 <= slow <= 17.0
+
+    for _ in range(10):
+        tracker.observe("GET", "/queries/q1/results", 40.0)
+    assert tracker.read_timeout("GET", "/queries/q1/results", 30.0) == 20.0
+
+    snapshot = tracker.snapshot()["endpoints"]
+    assert sum(snapshot["GET /queries/{id}"]["histogram"].values()) == 10
+
+
+def test_timeouts_never_raise_the_budget():
+    """A dead endpoint keeps its timeout; timeouts show up as a rate instead"""
+    tracker = LatencyTracker(min_samples=10, multiplier=1.5, margin=1.0, floor=2.0)
+    for _ in range(20):
+        tracker.observe("GET", "/queries/q1", 1.0)
+    budget = tracker.read_timeout("GET", "/queries/q1", 30.0)
+    for _ in range(25):
+        tracker.observe("GET", "/queries/q1", budget, timed_out=True)
+    assert tracker.read_timeout("GET", "/queries/q1", 30.0) == budget < 30.0
+
+    # Timeouts alone don't end the warm-up either
+    for _ in range(25):
+        tracker.observe("GET", "/exports/e1", 30.0, timed_out=True)
+    assert tracker.read_timeout("GET", "/exports/e1", 30.0) == 30.0
+
+    snapshot = tracker.snapshot()["endpoints"]["GET /queries/{id}"]
+    assert snapshot["timeouts"] == 25 and snapshot["window_count"] == 20
+    assert snapshot["timeout_rate"] == round(25 / 45 * 100, 2)
+    assert tracker.snapshot()["timeout_ceiling_s"] == 60.0
+
+
+def test_client_applies_adaptive_timeout():
+    """HabuConfig records latencies and sends the derived timeout"""
+    async def run():
+        seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.endswith("/oauth/token"):
+                return httpx.Response(200, json={"accessToken": "token", "expiresIn": 3600})
+            seen.append(request.extensions["timeout"])
+            return httpx.Response(200, json={"status": "COMPLETED"})
+
+        config = mock_habu_config(handler,
+                                  rate_limiter=TokenBucketLimiter("test", rate=1000, burst=1000))
+        config.latency.min_samples = 5
+        for i in range(6):
+            await config.request("GET", f"/queries/q-{i}", timeout=30.0)
+        stats = config.get_stats()["latency"]["endpoints"]["GET /queries/{id}"]
+        await config.aclose()
+        return seen, stats
+
+    seen, stats = asyncio.run(run())
+    assert seen[0]["read"] == 30.0
+    assert seen[-1]["read"] == 2.0
+    assert seen[-1]["connect"] == 2.0
+    assert stats["window_count"] == 6
+    assert stats["adaptive_timeout_s"] == 2.0
+
+
+if __name__ == "__main__":
+    print("🧪 Testing adaptive timeouts")
+    test_endpoint_templates()
+    test_timeout_follows_p99_within_floor_and_ceiling()
+    test_timeouts_never_raise_the_budget()
+    test_client_applies_adaptive_timeout()
+    print("✅ All adaptive timeout tests passed")
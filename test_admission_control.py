@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Test admission control for /api/enhanced-chat: bounded queue, queue-time SLO,
+503 + Retry-After shedding, and cheap endpoints staying responsive meanwhile
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+import httpx
+import api_handlers
+import asgi_api
+from redis_cache import cache
+from utils.admission import AdmissionController, admission_controllers
+from utils.error_handling import OverloadedError
+from utils.tool_result import ToolResult
+from test_support import StubManager
+
+
+class BlockingAgent:
+    """Chat agent whose requests run until released"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.started = 0
+
+    def downstream(self):
+        return "habu"
+
+    def context_fingerprint(self):
+        return "New conversation"
+
+    async def process_request(self, user_input):
+        self.started += 1
+        await self.release.wait()
+        return f"echo: {user_input}"
+
+
+async def stub_list_partners():
+    return ToolResult({"status": "success", "count": 1, "partners": [{"id": "p-1"}]})
+
+
+@contextmanager
+def overloaded_chat(controller, agent):
+    originals = (admission_controllers["habu"], api_handlers.enhanced_habu_agent,
+                 api_handlers.habu_list_partners_result, cache.manager)
+    admission_controllers["habu"] = controller
+    api_handlers.enhanced_habu_agent = agent
+    api_handlers.habu_list_partners_result = stub_list_partners
+    cache.manager = StubManager(None)
+    try:
+        yield
+    finally:
+        (admission_controllers["habu"], api_handlers.enhanced_habu_agent,
+         api_handlers.habu_list_partners_result, cache.manager) = originals
+
+
+async def hold(controller, release):
+    async with controller.admit():
+        await release.wait()
+
+
+def test_queue_full_is_shed_immediately():
+    async def scenario():
+        controller = AdmissionController("test", max_concurrency=1, max_queue=1, max_queue_wait=10)
+        release = asyncio.Event()
+        running = asyncio.create_task(hold(controller, release))
+        queued = asyncio.create_task(hold(controller, release))
+        await asyncio.sleep(0.01)
+        assert controller.in_flight == 1 and controller.queue_depth == 1
+
+        started = time.monotonic()
+        try:
+            await controller.acquire()
+            raise AssertionError("third request should be shed")
+        except OverloadedError as e:
+            assert e.status_code == 503
+            assert e.retry_after >= 1
+        assert time.monotonic() - started < 0.1
+
+        release.set()
+        await asyncio.gather(running, queued)
+        stats = controller.stats()
+        assert stats["admitted"] == 2 and stats["shed_queue_full"] == 1
+        assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+        assert stats["peak_queue_depth"] == 1
+    asyncio.run(scenario())
+
+
+def test_queue_wait_slo_sheds_waiters():
+    async def scenario():
+        controller = AdmissionController("test", max_concurrency=1, max_queue=5, max_queue_wait=0.05)
+        release = asyncio.Event()
+        running = asyncio.create_task(hold(controller, release))
+        await asyncio.sleep(0)
+        try:
+            await controller.acquire()
+            raise AssertionError("waiter should time out")
+        except OverloadedError:
+            pass
+        assert controller.queue_depth == 0
+        release.set()
+        await running
+        stats = controller.stats()
+        assert stats["shed_timeout"] == 1
+        assert stats["queue_wait_ms"]["p99"] >= 50
+    asyncio.run(scenario())
+
+
+def test_slots_are_handed_over_in_order():
+    async def scenario():
+        controller = AdmissionController("test", max_concurrency=1, max_queue=5, max_queue_wait=1)
+        order = []
+
+        async def request(n):
+            async with controller.admit():
+                order.append(n)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(request(n) for n in range(4)))
+        assert order == [0, 1, 2, 3]
+        assert controller.in_flight == 0 and controller.stats()["queued"] == 3
+    asyncio.run(scenario())
+
+
+def test_overloaded_chat_returns_503_while_health_stays_up():
+    async def scenario():
+        agent = BlockingAgent()
+        controller = AdmissionController("habu", max_concurrency=1, max_queue=1, max_queue_wait=10)
+        with overloaded_chat(controller, agent):
+            transport = httpx.ASGITransport(app=asgi_api.create_app())
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                chats = [asyncio.create_task(client.post("/api/enhanced-chat", json={"user_input": f"hello {n}"}))
+                         for n in range(2)]
+                while controller.in_flight < 1 or controller.queue_depth < 1:
+                    await asyncio.sleep(0.01)
+
+                shed = await client.post("/api/enhanced-chat", json={"user_input": "one more"})
+                assert shed.status_code == 503
+                assert shed.json()["error"] == "Service overloaded"
+                assert int(shed.headers["retry-after"]) >= 1
+
+                started = time.monotonic()
+                health = await client.get("/api/health")
+                partners = await client.get("/api/mcp/habu_list_partners")
+                assert health.status_code == 200 and partners.status_code == 200
+                assert time.monotonic() - started < 1
+
+                stats = (await client.get("/api/habu-client-stats")).json()["admission"]["habu"]
+                assert stats["in_flight"] == 1 and stats["queue_depth"] == 1
+                assert stats["shed_queue_full"] == 1
+
+                agent.release.set()
+                responses = await asyncio.gather(*chats)
+                assert [r.status_code for r in responses] == [200, 200]
+                assert agent.started == 2
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    print("🧪 Testing admission control for /api/enhanced-chat")
+    test_queue_full_is_shed_immediately()
+    test_queue_wait_slo_sheds_waiters()
+    test_slots_are_handed_over_in_order()
+    test_overloaded_chat_returns_503_while_health_stays_up()
+    print("✅ All admission control tests passed")
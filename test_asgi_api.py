@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test that the ASGI app (asgi_api.py) and the Flask bridge (demo_api.py)
+serve the same /api/* JSON contract. Tools and the chat agent are stubbed.
+"""
+from contextlib import contextmanager
+from starlette.testclient import TestClient
+import api_handlers
+import asgi_api
+import demo_api
+from redis_cache import cache
+from utils.tool_result import ToolResult
+
+
+class StubAgent:
+    def downstream(self):
+        return "habu"
+
+    def context_fingerprint(self):
+        return "New conversation"
+
+    async def process_request(self, user_input):
+        return f"echo: {user_input}"
+
+
+async def stub_check_status(query_id):
+    return ToolResult({"status": "success", "query_id": query_id, "query_status": "COMPLETED"})
+
+
+async def stub_list_partners():
+    return ToolResult({"status": "success", "count": 1, "partners": [{"id": "p-1"}]})
+
+
+@contextmanager
+def stubbed_handlers():
+    originals = (api_handlers.enhanced_habu_agent, api_handlers.habu_check_status_result,
+                 api_handlers.habu_list_partners_result)
+    api_handlers.enhanced_habu_agent = StubAgent()
+    api_handlers.habu_check_status_result = stub_check_status
+    api_handlers.habu_list_partners_result = stub_list_partners
+    try:
+        yield
+    finally:
+        (api_handlers.enhanced_habu_agent, api_handlers.habu_check_status_result,
+         api_handlers.habu_list_partners_result) = originals
+
+
+REQUESTS = [
+    ("GET", "/", None),
+    ("GET", "/api/health", None),
+    ("GET", "/api/support-context", None),
+    ("GET", "/api/technical-context", None),
+    ("POST", "/api/customer-support/quick-assess", {"query": "Can we do lookalike modeling?"}),
+    ("POST", "/api/customer-support/quick-assess", {}),
+    ("POST", "/api/enhanced-chat", {"user_input": "show partners"}),
+    ("POST", "/api/enhanced-chat", {"user_input": ""}),
+    ("GET", "/api/mcp/habu_check_status?query_id=q-1", None),
+    ("GET", "/api/mcp/habu_check_status", None),
+    ("GET", "/api/mcp/habu_list_partners", None),
+]
+
+
+def test_asgi_matches_flask_contract():
+    """Every route returns the same status code and JSON body from both apps"""
+    flask_client = demo_api.app.test_client()
+    with stubbed_handlers(), TestClient(asgi_api.create_app()) as asgi_client:
+        for method, path, body in REQUESTS:
+            # Both apps share this process's cache; compare them on the same (cold) path
+            cache.local.clear()
+            flask_response = flask_client.open(path, method=method, json=body)
+            cache.local.clear()
+            asgi_response = asgi_client.request(method, path, json=body)
+            assert asgi_response.status_code == flask_response.status_code, path
+            assert asgi_response.json() == flask_response.get_json(), path
+
+
+def test_responses_are_compact_unless_pretty():
+    """Both apps serialize once, compactly; ?pretty=true indents"""
+    flask_client = demo_api.app.test_client()
+    with stubbed_handlers(), TestClient(asgi_api.create_app()) as asgi_client:
+        for get in (flask_client.get, asgi_client.get):
+            compact = get("/api/mcp/habu_check_status?query_id=q-1")
+            pretty = get("/api/mcp/habu_check_status?query_id=q-1&pretty=true")
+            compact_body = compact.data if hasattr(compact, "data") else compact.content
+            pretty_body = pretty.data if hasattr(pretty, "data") else pretty.content
+            assert b'"status":"success"' in compact_body
+            assert b'\n  "status": "success"' in pretty_body
+
+
+def test_chat_response_contract():
+    """The React app reads response/cached from the chat endpoint"""
+    with stubbed_handlers(), TestClient(asgi_api.create_app()) as client:
+        response = client.post("/api/enhanced-chat", json={"user_input": "hello"})
+    assert response.status_code == 200
+    assert response.json() == {"response": "echo: hello", "cached": False}
+
+
+if __name__ == "__main__":
+    print("🧪 Testing ASGI demo API contract")
+    test_asgi_matches_flask_contract()
+    test_responses_are_compact_unless_pretty()
+    test_chat_response_contract()
+    print("✅ All ASGI demo API tests passed")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Test the persistent background event loop used by the Flask bridge
+"""
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+from utils.async_bridge import BackgroundLoop
+from utils.rate_limiter import TokenBucketLimiter
+from test_support import stand_in_config, start_server
+
+
+class StandInHabuHandler(BaseHTTPRequestHandler):
+    """Token endpoint plus one small JSON resource over keep-alive HTTP/1.1"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = set()
+
+    def do_POST(self):
+        self._reply(json.dumps({"accessToken": "token", "expiresIn": 3600}).encode())
+
+    def do_GET(self):
+        self._reply(json.dumps([{"id": "cr-1"}]).encode())
+
+    def _reply(self, body):
+        StandInHabuHandler.connections.add(self.client_address)
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_config(server):
+    return stand_in_config(server, rate_limiter=TokenBucketLimiter("test", rate=10000, burst=10000))
+
+
+def test_loop_is_reused_across_calls():
+    """Every call runs on the same loop and thread"""
+    bridge = BackgroundLoop("test-bridge")
+
+    async def where():
+        return asyncio.get_running_loop(), threading.current_thread().name
+
+    try:
+        first = bridge.run(where())
+        second = bridge.run(where())
+        assert first == second
+        assert first[1] == "test-bridge"
+        assert bridge.stats()["completed"] == 2
+    finally:
+        bridge.stop()
+    assert not bridge.stats()["running"]
+
+
+def test_concurrent_handlers_share_one_connection_pool():
+    """Requests from many threads reuse the client and its keep-alive connections"""
+    server = start_server(StandInHabuHandler)
+    bridge = BackgroundLoop("test-bridge")
+    config = make_config(server)
+    StandInHabuHandler.connections = set()
+
+    async def fetch():
+        return await config.get_json("/cleanrooms", params={"n": time.perf_counter_ns()}), config.get_client()
+
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: bridge.run(fetch()), range(40)))
+        clients = {id(client) for _, client in results}
+        assert all(payload == [{"id": "cr-1"}] for payload, _ in results)
+        assert len(clients) == 1
+        assert len(StandInHabuHandler.connections) <= config.max_connections
+        bridge.run(config.aclose())
+    finally:
+        bridge.stop()
+        server.shutdown()
+
+
+def test_errors_propagate_to_caller():
+    """Exceptions raised on the loop are re-raised in the calling thread"""
+    bridge = BackgroundLoop("test-bridge")
+
+    async def boom():
+        raise ValueError("bad input")
+
+    try:
+        try:
+            bridge.run(boom())
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+        assert bridge.stats()["failed"] == 1
+    finally:
+        bridge.stop()
+
+
+def measure_throughput(requests=200):
+    """Compare a loop per request (old bridge) with the persistent loop"""
+    server = start_server(StandInHabuHandler)
+    try:
+        per_request_config = make_config(server)
+        started = time.perf_counter()
+        for i in range(requests):
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(per_request_config.get_json("/cleanrooms", params={"i": i}))
+                loop.run_until_complete(per_request_config.aclose())
+            finally:
+                loop.close()
+        per_request = time.perf_counter() - started
+
+        bridge = BackgroundLoop("bench-bridge")
+        persistent_config = make_config(server)
+        started = time.perf_counter()
+        for i in range(requests):
+            bridge.run(persistent_config.get_json("/cleanrooms", params={"i": i}))
+        persistent = time.perf_counter() - started
+        bridge.run(persistent_config.aclose())
+        bridge.stop()
+        return per_request, persistent
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    print("🧪 Testing persistent async bridge")
+    test_loop_is_reused_across_calls()
+    test_concurrent_handlers_share_one_connection_pool()
+    test_errors_propagate_to_caller()
+    print("✅ All async bridge tests passed")
+
+    per_request, persistent = measure_throughput()
+    print(f"\n📊 200 sequential requests")
+    print(f"   Loop per request: {per_request:.2f}s ({200 / per_request:.0f} req/s)")
+    print(f"   Persistent loop:  {persistent:.2f}s ({200 / persistent:.0f} req/s)")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Test POST /api/batch: concurrent sub-requests, per-item errors and timeouts,
+same result from the Flask bridge and the ASGI app
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from starlette.testclient import TestClient
+import api_handlers
+import asgi_api
+import demo_api
+from redis_cache import cache
+from utils.tool_result import ToolResult
+from test_support import StubManager
+
+
+async def slow_partners():
+    await asyncio.sleep(0.3)
+    return ToolResult({"status": "success", "count": 1, "partners": [{"id": "p-1"}]})
+
+
+async def slow_templates():
+    await asyncio.sleep(0.3)
+    return ToolResult({"status": "success", "count": 1, "templates": [{"id": "t-1"}]})
+
+
+async def slow_exports(status_filter=None):
+    await asyncio.sleep(0.3)
+    return ToolResult({"status": "success", "filter": status_filter, "exports": []})
+
+
+async def stuck_status(query_id):
+    await asyncio.sleep(5)
+    return ToolResult({"status": "success", "query_id": query_id})
+
+
+async def broken_results(query_id):
+    raise RuntimeError("boom")
+
+
+@contextmanager
+def stubbed_tools():
+    names = ("habu_list_partners_result", "habu_list_templates_result", "habu_list_exports_result",
+             "habu_check_status_result", "habu_get_results_result")
+    originals = {name: getattr(api_handlers, name) for name in names}
+    original_manager = cache.manager
+    api_handlers.habu_list_partners_result = slow_partners
+    api_handlers.habu_list_templates_result = slow_templates
+    api_handlers.habu_list_exports_result = slow_exports
+    api_handlers.habu_check_status_result = stuck_status
+    api_handlers.habu_get_results_result = broken_results
+    cache.manager = StubManager(None)
+    try:
+        yield
+    finally:
+        for name, original in originals.items():
+            setattr(api_handlers, name, original)
+        cache.manager = original_manager
+
+
+DASHBOARD_BATCH = {"requests": [
+    {"id": "templates", "path": "/api/mcp/habu_list_templates"},
+    {"id": "partners", "path": "/api/mcp/habu_list_partners"},
+    {"id": "exports", "path": "/api/mcp/habu_list_exports?status=COMPLETED"},
+    {"id": "health", "path": "/api/health"},
+    {"id": "support", "path": "/api/support-context"},
+    {"id": "technical", "path": "/api/technical-context"},
+]}
+
+
+def test_batch_runs_items_concurrently():
+    with stubbed_tools():
+        started = time.monotonic()
+        payload, status = asyncio.run(api_handlers.batch(DASHBOARD_BATCH))
+        elapsed = time.monotonic() - started
+    assert status == 200
+    assert payload["count"] == 6 and payload["failed"] == 0
+    by_id = {r["id"]: r for r in payload["responses"]}
+    assert [r["id"] for r in payload["responses"]] == [r["id"] for r in DASHBOARD_BATCH["requests"]]
+    assert by_id["partners"]["body"]["partners"] == [{"id": "p-1"}]
+    assert by_id["exports"]["body"]["filter"] == "COMPLETED"
+    assert by_id["health"]["body"]["status"] == "healthy"
+    assert "etag" in by_id["templates"]
+    # Three 0.3s tools run side by side: about as long as the slowest item
+    assert elapsed < 0.8, elapsed
+
+
+def test_per_item_errors_and_timeouts():
+    batch = {"requests": [
+        {"id": "stuck", "path": "/api/mcp/habu_check_status", "params": {"query_id": "q-1"}, "timeout": 0.1},
+        {"id": "broken", "path": "/api/mcp/habu_get_results?query_id=q-1"},
+        {"id": "missing-arg", "path": "/api/mcp/habu_check_status"},
+        {"id": "unknown", "path": "/api/nope"},
+        {"id": "nested", "method": "POST", "path": "/api/batch"},
+        {"id": "no-path"},
+        "not an object",
+        {"id": "ok", "path": "/api/support-context"},
+    ]}
+    with stubbed_tools():
+        payload, status = asyncio.run(api_handlers.batch(batch))
+    assert status == 200
+    statuses = {r["id"]: r["status"] for r in payload["responses"]}
+    assert statuses == {"stuck": 504, "broken": 500, "missing-arg": 400, "unknown": 404,
+                        "nested": 404, "no-path": 400, 6: 400, "ok": 200}
+    assert payload["failed"] == 7
+    assert all("elapsed_ms" in r for r in payload["responses"])
+
+
+def test_item_timeouts_are_validated_and_capped():
+    timeouts = {"zero": 0, "negative": -1, "nan": "nan", "infinite": "inf", "text": "soon", "list": [1],
+                "capped": 1e9, "ok": 0.5}
+    batch = {"requests": [{"id": item_id, "path": "/api/support-context", "timeout": timeout}
+                          for item_id, timeout in timeouts.items()]}
+    with stubbed_tools():
+        payload, status = asyncio.run(api_handlers.batch(batch))
+    statuses = {r["id"]: r["status"] for r in payload["responses"]}
+    assert statuses == {"zero": 400, "negative": 400, "nan": 400, "infinite": 400, "text": 400, "list": 400,
+                        "capped": 200, "ok": 200}
+    assert "positive number" in payload["responses"][0]["body"]["error"]
+
+
+def test_invalid_batches():
+    assert asyncio.run(api_handlers.batch(None))[1] == 400
+    assert asyncio.run(api_handlers.batch({"requests": []}))[1] == 400
+    too_many = {"requests": [{"path": "/api/health"}] * (api_handlers.BATCH_MAX_ITEMS + 1)}
+    assert asyncio.run(api_handlers.batch(too_many))[1] == 400
+
+
+def test_flask_and_asgi_batch_match():
+    batch = {"requests": [r for r in DASHBOARD_BATCH["requests"] if r["id"] in ("support", "technical")]}
+    flask_client = demo_api.app.test_client()
+    with stubbed_tools(), TestClient(asgi_api.create_app()) as asgi_client:
+        flask_response = flask_client.post("/api/batch", json=batch)
+        asgi_response = asgi_client.post("/api/batch", json=batch)
+    assert flask_response.status_code == asgi_response.status_code == 200
+    strip = lambda body: [{k: v for k, v in r.items() if k != "elapsed_ms"} for r in body["responses"]]
+    assert strip(flask_response.get_json()) == strip(asgi_response.json())
+
+
+if __name__ == "__main__":
+    print("🧪 Testing POST /api/batch")
+    test_batch_runs_items_concurrently()
+    test_per_item_errors_and_timeouts()
+    test_item_timeouts_are_validated_and_capped()
+    test_invalid_batches()
+    test_flask_and_asgi_batch_match()
+    print("✅ All batch API tests passed")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test the compact binary encoding of Redis cache entries
+"""
+import asyncio
+import json
+import time
+from datetime import datetime
+from redis_cache import RedisCache
+from utils.cache_codec import CacheCodec, FORMAT_VERSION, HEADER
+from test_support import InMemoryRedis, StubManager
+
+
+def template_document(count=200):
+    """A large, repetitive document like the enhanced template listings"""
+    return {
+        "status": "success",
+        "templates": [
+            {"id": f"tpl-{i}", "name": f"Audience Overlap {i}", "category": "Sentiment Analysis",
+             "description": "Measures overlap between first-party audiences and partner data " * 3,
+             "parameters": {"lookback_days": 30, "min_overlap": 0.05}}
+            for i in range(count)
+        ]
+    }
+
+
+def make_entry(data, cache_type='template_data'):
+    now = time.time()
+    return {
+        'data': data,
+        'cached_at': datetime.utcnow().isoformat(),
+        'cache_type': cache_type,
+        'ttl': 1800,
+        'expires_at': now + 1800,
+        'stale_until': now + 5400,
+        'version': 42,
+        'tags': ['template', 'type:template_data'],
+        'compute_time': 0.25
+    }
+
+
+def test_round_trip_for_every_codec():
+    entry = make_entry(template_document())
+    for serializer in ("msgpack", "json"):
+        for compressor in ("zstd", "zlib", "none"):
+            codec = CacheCodec(serializer, compressor)
+            stored, raw_size = codec.encode(entry)
+            assert isinstance(stored, bytes) and stored[0] == FORMAT_VERSION
+            assert codec.decode_sized(stored) == (entry, raw_size), (serializer, compressor)
+            # Any worker reads entries written with other settings
+            assert CacheCodec("json", "none").decode(stored) == entry
+
+
+def test_large_entries_compressed_small_entries_not():
+    codec = CacheCodec(compressor="zstd", compress_min_bytes=1024)
+    large = make_entry(template_document())
+    stored, raw_size = codec.encode(large)
+    legacy = json.dumps(large, default=str)
+    assert len(stored) * 10 < len(legacy)
+
+    small = make_entry({"state": "RUNNING"}, 'status_data')
+    stored, raw_size = codec.encode(small)
+    assert codec.decode(stored) == small
+    # Uncompressed: the stored form is just the header and body
+    assert len(stored) == raw_size
+
+
+def test_custom_cache_type_and_legacy_entries():
+    codec = CacheCodec()
+    custom = make_entry([1, 2, 3], 'export_data')
+    assert codec.decode(codec.encode(custom)[0])['cache_type'] == 'export_data'
+
+    legacy = {'data': {"partners": []}, 'cached_at': '2024-01-01T00:00:00', 'cache_type': 'partner_data',
+              'ttl': 900, 'expires_at': time.time() + 900}
+    assert codec.decode(json.dumps(legacy)) == legacy
+    assert codec.decode(json.dumps(legacy).encode()) == legacy
+
+
+def test_cache_reads_old_json_entries_and_reports_ratio():
+    redis = InMemoryRedis()
+    cache = RedisCache(codec=CacheCodec(compress_min_bytes=1024))
+    cache.manager = StubManager(redis)
+    redis.values['api:partners_old'] = json.dumps({
+        'data': {"partners": ["a"]}, 'cached_at': datetime.utcnow().isoformat(),
+        'cache_type': 'partner_data', 'ttl': 900, 'expires_at': time.time() + 900
+    })
+    redis.values['api:broken'] = b"not an entry"
+    redis.values['api:truncated'] = bytes([FORMAT_VERSION]) + b"\x00" * (HEADER.size - 2)
+
+    async def scenario():
+        await cache.cache_api_response('enhanced_templates_default', template_document(), 'template_data')
+        await cache.cache_api_response('status_q1', {"state": "RUNNING"}, 'status_data')
+        written = cache.local.stats()['bytes']
+        cache.local.clear()
+        return written, (await cache.get_cached_response('enhanced_templates_default'),
+                await cache.get_cached_response('partners_old'),
+                await cache.get_cached_response('broken'),
+                await cache.get_cached_response('truncated'),
+                await cache.get_cached_response('status_q1'))
+
+    written, (templates, old, broken, truncated, status) = asyncio.run(scenario())
+    assert templates['data'] == template_document() and templates['cache_tier'] == 'l2'
+    assert status['cache_tier'] == 'l2'
+    # L1 counts an entry at the same size whether it was written here or read from Redis
+    assert cache.local.stats()['bytes'] - len(redis.values['api:partners_old']) == written
+    assert old['data'] == {"partners": ["a"]}
+    assert broken is None and truncated is None
+    report = cache.encoding_report()
+    assert report['compressor'] == 'zstd'
+    assert report['types']['template_data']['compression_ratio'] > 10
+    assert report['types']['status_data']['entries'] == 1
+    # Below compress_min_bytes: stored as is
+    assert report['types']['status_data']['compression_ratio'] == 1.0
+
+
+if __name__ == "__main__":
+    print("🧪 Testing cache entry encoding")
+    test_round_trip_for_every_codec()
+    test_large_entries_compressed_small_entries_not()
+    test_custom_cache_type_and_legacy_entries()
+    test_cache_reads_old_json_entries_and_reports_ratio()
+    print("✅ All cache encoding tests passed")
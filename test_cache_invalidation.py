@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Test cross-worker L1 invalidation over Redis pub/sub (two RedisCache
+instances sharing one in-memory Redis stand in for two workers)
+"""
+import asyncio
+import json
+from test_support import InMemoryRedis, make_redis_cache
+
+
+def make_workers(count=2):
+    redis = InMemoryRedis()
+    return redis, [make_redis_cache(redis) for _ in range(count)]
+
+
+async def settle():
+    """Let subscriber tasks drain the bus"""
+    await asyncio.sleep(0.05)
+
+
+def test_write_in_one_worker_evicts_the_others():
+    redis, (a, b) = make_workers()
+
+    async def scenario():
+        await a.invalidator.start()
+        await b.invalidator.start()
+        await settle()
+        try:
+            await a.cache_api_response('partners_list', {"partners": ["old"]}, 'partner_data')
+            await settle()
+            old = await b.get_cached_response('partners_list')
+
+            await a.cache_api_response('partners_list', {"partners": ["new"]}, 'partner_data')
+            await settle()
+            new = await b.get_cached_response('partners_list')
+        finally:
+            await a.invalidator.stop()
+            await b.invalidator.stop()
+        return old, new
+
+    old, new = asyncio.run(scenario())
+    assert old['data'] == {"partners": ["old"]}
+    assert new['data'] == {"partners": ["new"]} and new['cache_tier'] == 'l2'
+    assert b.invalidator.stats()["evicted"] >= 1
+    assert a.invalidator.stats()["ignored_own"] >= 2
+
+
+def test_newer_local_entry_is_kept():
+    redis, (a, b) = make_workers()
+
+    async def scenario():
+        await b.cache_api_response('templates_list', {"templates": [2]}, 'template_data')
+        # An older write's message arrives late
+        b.invalidator.apply(a.invalidator.message(op='key', key='api:templates_list', version=0))
+        return await b.get_cached_response('templates_list')
+
+    entry = asyncio.run(scenario())
+    assert entry['cache_tier'] == 'l1' and entry['data'] == {"templates": [2]}
+    assert b.invalidator.stats()["kept_newer"] == 1
+
+
+def test_read_racing_an_invalidation_does_not_refill_l1():
+    redis, (a, b) = make_workers()
+
+    async def scenario():
+        await a.cache_api_response('partners_list', {"partners": ["v1"]}, 'partner_data')
+        v1_entry = redis.values['api:partners_list']
+        await a.cache_api_response('partners_list', {"partners": ["v2"]}, 'partner_data')
+        b.invalidator.apply(a.invalidator.message(op='key', key='api:partners_list', version=2))
+        # b's GET was issued before the v2 write landed
+        redis.values['api:partners_list'] = v1_entry
+        raced = await b.get_cached_response('partners_list')
+        return raced
+
+    raced = asyncio.run(scenario())
+    assert raced['data'] == {"partners": ["v1"]}
+    assert 'api:partners_list' not in b.local
+    assert b.invalidator.stats()["rejected_fills"] == 1
+
+
+def test_pattern_invalidation_reaches_every_worker():
+    redis, (a, b) = make_workers()
+
+    async def scenario():
+        await b.invalidator.start()
+        await settle()
+        try:
+            for endpoint in ('partners_org1', 'partners_org2', 'templates_list'):
+                await a.cache_api_response(endpoint, {"endpoint": endpoint})
+                await b.get_cached_response(endpoint)
+            assert len(b.local) == 3
+            await a.invalidate_cache('api:partners_*')
+            await settle()
+        finally:
+            await b.invalidator.stop()
+
+    asyncio.run(scenario())
+    assert 'api:templates_list' in b.local
+    assert 'api:partners_org1' not in b.local and 'api:partners_org2' not in b.local
+
+
+def test_write_takes_one_round_trip():
+    redis, (a,) = make_workers(1)
+
+    class RecordingClient:
+        def __init__(self, client):
+            self.client = client
+            self.calls = []
+
+        def __getattr__(self, name):
+            self.calls.append(name)
+            return getattr(self.client, name)
+
+    a.manager.client = recorder = RecordingClient(redis)
+
+    async def scenario():
+        await a.cache_api_response('partners_list', {"partners": ["v1"]}, 'partner_data')
+        recorder.calls.clear()
+        await a.cache_api_response('partners_list', {"partners": ["v2"]}, 'partner_data')
+
+    asyncio.run(scenario())
+    # Version, entry, tag index and invalidation all in one script call
+    assert recorder.calls == ['evalsha']
+    stored = a.codec.decode(redis.values['api:partners_list'])
+    assert stored['version'] == 2 and stored['data'] == {"partners": ["v2"]}
+    assert a.local.peek('api:partners_list')['version'] == 2
+    assert json.loads(redis.published[-1]) == {"origin": a.invalidator.instance_id, "op": "key",
+                                                "key": "api:partners_list", "version": 2}
+
+
+def test_failed_redis_write_is_counted_not_hidden():
+    class BrokenRedis(InMemoryRedis):
+        async def evalsha(self, sha, numkeys, *keys_and_args):
+            raise ConnectionError("reset by peer")
+
+    redis = BrokenRedis()
+    cache = make_redis_cache(redis)
+
+    async def scenario():
+        stored = await cache.cache_api_response('partners_list', {"partners": ["a"]}, 'partner_data')
+        return stored, await cache.get_cached_response('partners_list')
+
+    stored, entry = asyncio.run(scenario())
+    assert stored is True and entry['cache_tier'] == 'l1' and entry['version'] == 0
+    assert 'api:partners_list' not in redis.values
+    assert cache.tier_stats()['l2']['write_failures'] == 1
+    assert len(cache.manager.failures) == 1
+
+
+def test_resubscribe_drops_local_tier():
+    redis, (a,) = make_workers(1)
+
+    async def scenario():
+        a.local.set('api:anything', {"data": 1}, ttl=60)
+        await a.invalidator.start()
+        await settle()
+        subscribed = a.invalidator.subscribed
+        await a.invalidator.stop()
+        return subscribed
+
+    assert asyncio.run(scenario()) is True
+    assert 'api:anything' not in a.local
+    assert a.invalidator.stats()["resyncs"] == 1
+    assert json.loads(a.invalidator.message(op='key', key='k', version=1))["origin"] == a.invalidator.instance_id
+
+
+if __name__ == "__main__":
+    print("🧪 Testing cross-worker cache invalidation")
+    test_write_in_one_worker_evicts_the_others()
+    test_newer_local_entry_is_kept()
+    test_read_racing_an_invalidation_does_not_refill_l1()
+    test_pattern_invalidation_reaches_every_worker()
+    test_write_takes_one_round_trip()
+    test_failed_redis_write_is_counted_not_hidden()
+    test_resubscribe_drops_local_tier()
+    print("✅ All cache invalidation tests passed")
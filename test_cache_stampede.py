@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Test cache stampede protection: one recompute per key across workers and
+probabilistic early refresh (XFetch)
+"""
+import asyncio
+import time
+from redis_cache import cache_response
+import redis_cache
+from test_support import InMemoryRedis, make_redis_cache
+
+
+class SlowFetch:
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {"status": "success", "version": self.calls}
+
+
+def make_workers(count, redis=None):
+    redis = redis or InMemoryRedis()
+    workers = []
+    for _ in range(count):
+        worker = make_redis_cache(redis)
+        worker.lock_poll_interval = 0.01
+        workers.append(worker)
+    return redis, workers
+
+
+def test_one_fetch_for_a_cold_key_across_workers():
+    redis, workers = make_workers(3)
+    fetch = SlowFetch()
+
+    async def scenario():
+        return await asyncio.gather(*[
+            worker.get_or_refresh('partners_list', fetch, 'partner_data', max_stale=60)
+            for worker in workers for _ in range(10)
+        ])
+
+    results = asyncio.run(scenario())
+    assert fetch.calls == 1
+    assert all(r['data']['version'] == 1 for r in results)
+    # The lock is released once the entry is written
+    assert 'refresh:api:partners_list' not in redis.values
+    followers = workers[1:]
+    assert all(w.stampede_stats['served_after_wait'] == 1 for w in followers)
+    assert all(w._misses.coalesced == 9 for w in workers)
+    assert workers[0].codec.decode(redis.values['api:partners_list'])['compute_time'] >= fetch.delay
+
+
+def test_dead_lock_holder_does_not_block_forever():
+    redis, (worker,) = make_workers(1)
+    worker.lock_wait = 0.05
+    redis.values['refresh:api:templates_list'] = "someone-else"
+    fetch = SlowFetch(delay=0)
+
+    async def scenario():
+        return await worker.get_or_refresh('templates_list', fetch, 'template_data')
+
+    result = asyncio.run(scenario())
+    assert result['cache_hit'] is False and fetch.calls == 1
+    assert worker.stampede_stats['lock_timeouts'] == 1
+    # Not ours to release
+    assert redis.values['refresh:api:templates_list'] == "someone-else"
+
+
+def test_entry_near_expiry_is_refreshed_early():
+    redis, (worker,) = make_workers(1)
+    fetch = SlowFetch(delay=0)
+
+    async def scenario():
+        await worker.cache_api_response('enhanced_templates_default', {"version": 0}, 'template_data',
+                                        custom_ttl=1, compute_time=1.0)
+        worker.xfetch_beta = 1e6
+        entry = await worker.get_or_refresh('enhanced_templates_default', fetch, 'template_data', custom_ttl=1)
+        await asyncio.gather(*worker._refreshing.values())
+        return entry, await worker.get_cached_response('enhanced_templates_default')
+
+    served, refreshed = asyncio.run(scenario())
+    assert served['cache_hit'] is True and served['data'] == {"version": 0}
+    assert refreshed['data']['version'] == 1
+    assert worker.stampede_stats['early_refreshes'] == 1
+
+
+def test_early_refresh_is_rare_far_from_expiry():
+    _, (worker,) = make_workers(1)
+    now = time.time()
+    assert not any(worker._expires_early({'expires_at': now + 300, 'compute_time': 0.01}) for _ in range(1000))
+    assert not worker._expires_early({'expires_at': now + 0.001})
+    worker.xfetch_beta = 0
+    assert not worker._expires_early({'expires_at': now, 'compute_time': 10})
+
+
+def test_decorator_is_protected():
+    redis, (worker,) = make_workers(1)
+    original = redis_cache.cache
+    redis_cache.cache = worker
+    calls = []
+
+    @cache_response('partner_data', 900)
+    async def partners(org_id):
+        calls.append(org_id)
+        await asyncio.sleep(0.05)
+        return {"org": org_id}
+
+    async def scenario():
+        return await asyncio.gather(*[partners("org1") for _ in range(10)])
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        redis_cache.cache = original
+    assert calls == ["org1"] and all(r == {"org": "org1"} for r in results)
+
+
+def test_decorator_skips_errors_and_expired_results():
+    redis, (worker,) = make_workers(1)
+    original = redis_cache.cache
+    redis_cache.cache = worker
+    calls = []
+
+    @cache_response('status_data', 1)
+    async def status(query_id):
+        calls.append(query_id)
+        if len(calls) == 1:
+            return {"status": "error", "error": "upstream timeout"}
+        return {"status": "success", "state": f"RUNNING-{len(calls)}"}
+
+    async def scenario():
+        failed = await status("q1")
+        first = await status("q1")
+        cached = await status("q1")
+        # Past its TTL: no stale copy is served, the caller gets a fresh result
+        key = next(key for key in redis.values if key.startswith('api:status_'))
+        entry = worker.codec.decode(redis.values[key])
+        entry['expires_at'] = time.time() - 1
+        redis.values[key] = worker.codec.encode(entry)[0]
+        worker.local.clear()
+        return failed, first, cached, await status("q1")
+
+    try:
+        failed, first, cached, refreshed = asyncio.run(scenario())
+    finally:
+        redis_cache.cache = original
+    assert failed["status"] == "error"
+    assert first == cached == {"status": "success", "state": "RUNNING-2"}
+    assert refreshed == {"status": "success", "state": "RUNNING-3"}
+    assert len(calls) == 3 and worker.swr_stats['stale_hits'] == 0
+
+
+if __name__ == "__main__":
+    print("🧪 Testing cache stampede protection")
+    test_one_fetch_for_a_cold_key_across_workers()
+    test_dead_lock_holder_does_not_block_forever()
+    test_entry_near_expiry_is_refreshed_early()
+    test_early_refresh_is_rare_far_from_expiry()
+    test_decorator_is_protected()
+    test_decorator_skips_errors_and_expired_results()
+    print("✅ All stampede protection tests passed")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test tag-indexed cache invalidation and SCAN-based pattern operations
+"""
+import asyncio
+import json
+import time
+from test_support import InMemoryRedis, make_redis_cache
+
+
+def make_cache(client):
+    return make_redis_cache(client, raise_failures=True)
+
+
+async def fill(cache):
+    for cleanroom in ("cr1", "cr2"):
+        for n in range(3):
+            await cache.cache_api_response(f"enhanced_templates_{cleanroom}_{n}", {"n": n}, 'template_data',
+                                           tags=['template', f'cleanroom:{cleanroom}'])
+    await cache.cache_partner_list("org1", {"partners": []})
+    await cache.cache_chat_context("s1", {"turns": 1})
+
+
+def test_invalidating_a_cleanroom_touches_only_its_entries():
+    redis = InMemoryRedis()
+    cache = make_cache(redis)
+
+    async def scenario():
+        await fill(cache)
+        redis.commands.clear()
+        return await cache.invalidate_cleanroom("cr1")
+
+    deleted = asyncio.run(scenario())
+    assert deleted == 3
+    assert redis.commands == [
+        ("zrange", "tag:cleanroom:cr1"),
+        ("unlink", tuple(f"api:enhanced_templates_cr1_{n}" for n in range(3))),
+        ("unlink", ("tag:cleanroom:cr1",))
+    ]
+    assert not any(key.startswith("api:enhanced_templates_cr1") for key in redis.values)
+    assert not any(key.startswith("api:enhanced_templates_cr1") for key in cache.local._entries)
+    assert "api:enhanced_templates_cr2_0" in redis.values and "api:enhanced_templates_cr2_0" in cache.local
+    # Other workers are told exactly which keys to drop
+    message = json.loads(redis.published[-1])
+    assert message["op"] == "keys" and len(message["keys"]) == 3
+
+
+def test_shared_tags_and_helper_tags():
+    redis = InMemoryRedis()
+    cache = make_cache(redis)
+
+    async def scenario():
+        await fill(cache)
+        return await cache.invalidate_tags("template", "session:s1")
+
+    assert asyncio.run(scenario()) == 7
+    assert set(redis.values) == {"api:partners_org1", "cache:version"}
+    assert set(redis.zsets["tag:partner"]) == {"api:partners_org1"}
+    assert "tag:template" not in redis.zsets and "tag:session:s1" not in redis.zsets
+
+
+def test_other_worker_drops_tagged_keys():
+    redis = InMemoryRedis()
+    writer, other = make_cache(redis), make_cache(redis)
+
+    async def scenario():
+        await fill(writer)
+        assert (await other.get_cached_response("enhanced_templates_cr2_1"))["cache_tier"] == "l2"
+        await writer.invalidate_cleanroom("cr2")
+        other.invalidator.apply(redis.published[-1])
+        return await other.get_cached_response("enhanced_templates_cr2_1")
+
+    assert asyncio.run(scenario()) is None
+    assert other.invalidator.stats()["evicted"] == 1
+
+
+def test_tags_work_without_redis():
+    cache = make_cache(None)
+
+    async def scenario():
+        await fill(cache)
+        deleted = await cache.invalidate_cleanroom("cr2")
+        return deleted, await cache.get_cached_response("enhanced_templates_cr1_0")
+
+    deleted, kept = asyncio.run(scenario())
+    assert deleted == 3 and kept["data"] == {"n": 0}
+
+
+def test_stats_and_patterns_never_use_keys():
+    redis = InMemoryRedis()
+    cache = make_cache(redis)
+
+    async def scenario():
+        await fill(cache)
+        # An expired member lingers in the index until the next write trims it
+        redis.zsets["tag:type:partner_data"]["api:partners_gone"] = time.time() - 1
+        stats = await cache.get_cache_stats()
+        deleted = await cache.invalidate_cache("api:enhanced_templates_*")
+        return stats, deleted
+
+    stats, deleted = asyncio.run(scenario())
+    assert stats["cache_key_counts"]["template_data"] == 6
+    assert stats["cache_key_counts"]["partner_data"] == 1
+    assert stats["cache_key_counts"]["chat_context"] == 1
+    assert stats["cache_key_counts"]["status_data"] == 0
+    assert deleted == 6
+    assert ("scan", "api:enhanced_templates_*") in redis.commands
+
+
+if __name__ == "__main__":
+    print("🧪 Testing tag-based cache invalidation")
+    test_invalidating_a_cleanroom_touches_only_its_entries()
+    test_shared_tags_and_helper_tags()
+    test_other_worker_drops_tagged_keys()
+    test_tags_work_without_redis()
+    test_stats_and_patterns_never_use_keys()
+    print("✅ All cache tag tests passed")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test the chat response cache: stable keys, scopes, bypassed intents, LRU eviction
+"""
+import asyncio
+import os
+import subprocess
+import sys
+from utils.chat_cache import ChatResponseCache, classify_intent, scope_for
+from test_support import InMemoryRedis, StubManager
+
+
+class StubRedisCache:
+    def __init__(self, client):
+        self.manager = StubManager(client)
+
+
+def make_cache(client=None, **kwargs):
+    return ChatResponseCache(StubRedisCache(client or InMemoryRedis()), **kwargs)
+
+
+def test_keys_are_stable_across_processes():
+    """Different hash seeds produce the same key (Python's hash() did not)"""
+    script = ("from utils.chat_cache import ChatResponseCache;"
+              "print(ChatResponseCache(None).cache_key('Show me templates', 'ctx', 'global'))")
+    keys = set()
+    for seed in ("1", "2"):
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        output = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+        keys.add(output.stdout.strip().splitlines()[-1])
+    assert len(keys) == 1
+    assert keys.pop() == make_cache().cache_key("  show me TEMPLATES? ", "ctx", "global")
+
+
+def test_distinct_prompts_and_sessions_get_distinct_keys():
+    cache = make_cache()
+    keys = {cache.cache_key(f"tell me about use case {i}", "ctx", "session", "s1") for i in range(20000)}
+    assert len(keys) == 20000
+    assert cache.cache_key("hello", "ctx", "session", "s1") != cache.cache_key("hello", "ctx", "session", "s2")
+    assert cache.cache_key("hello", "ctx", "global", "s1") == cache.cache_key("hello", "ctx", "global", "s2")
+    assert cache.cache_key("hello", "ctx-a", "global") != cache.cache_key("hello", "ctx-b", "global")
+
+
+def test_time_sensitive_intents_bypass_cache():
+    assert classify_intent("Check my query status") == "status"
+    assert classify_intent("Show me the results") == "results"
+    assert classify_intent("Run a sentiment analysis with partner X") == "submit"
+    assert classify_intent("What can I run?") == "templates"
+    assert scope_for("partners") == "global"
+    assert scope_for("general") == "session"
+
+    cache = make_cache()
+
+    async def scenario():
+        assert not await cache.set("Check my query status", "ctx", "RUNNING")
+        return await cache.get("Check my query status", "ctx")
+
+    assert asyncio.run(scenario()) is None
+    assert cache.stats()["by_intent"]["status"] == {"hits": 0, "misses": 0, "bypassed": 1, "hit_rate": 0.0}
+
+
+def test_scopes_and_hit_rates():
+    cache = make_cache()
+
+    async def scenario():
+        await cache.set("Show me my partners", "ctx", "Partners: none", session_id="s1")
+        await cache.set("Tell me about clean rooms", "ctx", "Clean rooms are...", session_id="s1")
+        return (
+            await cache.get("show me my partners", "ctx", session_id="s2"),
+            await cache.get("Tell me about clean rooms", "ctx", session_id="s2"),
+            await cache.get("Tell me about clean rooms", "ctx", session_id="s1")
+        )
+
+    shared, other_session, same_session = asyncio.run(scenario())
+    assert shared["response"] == "Partners: none" and shared["scope"] == "global"
+    assert other_session is None
+    assert same_session["response"] == "Clean rooms are..."
+    by_intent = cache.stats()["by_intent"]
+    assert by_intent["partners"]["hit_rate"] == 100.0
+    assert by_intent["general"]["hit_rate"] == 50.0
+
+
+def test_session_scope_evicts_least_recently_used():
+    client = InMemoryRedis()
+    cache = make_cache(client, max_session_entries=2)
+
+    async def scenario():
+        await cache.set("question one", "ctx", "1", session_id="s1")
+        await asyncio.sleep(0.01)
+        await cache.set("question two", "ctx", "2", session_id="s1")
+        await asyncio.sleep(0.01)
+        await cache.get("question one", "ctx", session_id="s1")  # now most recent
+        await asyncio.sleep(0.01)
+        await cache.set("question three", "ctx", "3", session_id="s1")
+        return [await cache.get(q, "ctx", session_id="s1") for q in ("question one", "question two", "question three")]
+
+    one, two, three = asyncio.run(scenario())
+    assert one is not None and two is None and three is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_redis_errors_are_misses():
+    class BrokenRedis(InMemoryRedis):
+        async def get(self, key):
+            raise ConnectionError("reset by peer")
+
+    cache = make_cache(BrokenRedis())
+    assert asyncio.run(cache.get("Show me my partners", "ctx")) is None
+    assert len(cache.redis_cache.manager.failures) == 1
+
+
+if __name__ == "__main__":
+    print("🧪 Testing chat response cache")
+    test_keys_are_stable_across_processes()
+    test_distinct_prompts_and_sessions_get_distinct_keys()
+    test_time_sensitive_intents_bypass_cache()
+    test_scopes_and_hit_rates()
+    test_session_scope_evicts_least_recently_used()
+    test_redis_errors_are_misses()
+    print("✅ All chat cache tests passed")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test conditional GET revalidation (ETag / Last-Modified) for Habu API reads
+Runs against a local stand-in HTTP server that honours If-None-Match
+"""
+import asyncio
+import hashlib
+import json
+import time
+from http.server import BaseHTTPRequestHandler
+from test_support import stand_in_config, start_server
+
+CATALOG = [
+    {"id": f"q-{i}", "name": f"Template {i}", "category": "Sentiment Analysis",
+     "description": "Stand-in clean room question " * 8, "status": "READY"}
+    for i in range(500)
+]
+
+
+class StandInHabuHandler(BaseHTTPRequestHandler):
+    """Minimal Habu API: token endpoint plus a large catalog with ETag support"""
+    body = json.dumps(CATALOG).encode()
+    etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+    counts = {"full": 0, "not_modified": 0}
+
+    def do_POST(self):
+        token = json.dumps({"accessToken": "token", "expiresIn": 3600}).encode()
+        self._reply(200, token, {"Content-Type": "application/json"})
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == self.etag:
+            self.counts["not_modified"] += 1
+            self._reply(304, b"", {"ETag": self.etag})
+            return
+        self.counts["full"] += 1
+        self._reply(200, self.body, {"Content-Type": "application/json", "ETag": self.etag})
+
+    def _reply(self, status, body, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def timed_fetches(config, rounds):
+    """Fetch the catalog repeatedly and return per-call latencies in ms"""
+    latencies, payloads = [], []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        payloads.append(await config.get_json("/cleanrooms/cr-1/cleanroom-questions"))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies, payloads
+
+
+def test_not_modified_reuses_parsed_payload():
+    """A 304 returns the stored payload and counts the bytes saved"""
+    server = start_server(StandInHabuHandler)
+    StandInHabuHandler.counts = {"full": 0, "not_modified": 0}
+
+    async def run():
+        config = stand_in_config(server)
+        _, payloads = await timed_fetches(config, 3)
+        stats = config.get_stats()["conditional_get"]
+        await config.aclose()
+        return payloads, stats
+
+    try:
+        payloads, stats = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    assert payloads[0] == CATALOG
+    assert payloads[1] is payloads[0] and payloads[2] is payloads[0]
+    assert StandInHabuHandler.counts == {"full": 1, "not_modified": 2}
+    assert stats["full_responses"] == 1
+    assert stats["not_modified_responses"] == 2
+    assert stats["bytes_saved"] == 2 * len(StandInHabuHandler.body)
+
+
+def test_changed_resource_is_downloaded_again():
+    """A new ETag replaces the stored payload"""
+    server = start_server(StandInHabuHandler)
+    original_body, original_etag = StandInHabuHandler.body, StandInHabuHandler.etag
+
+    async def run():
+        config = stand_in_config(server)
+        first = await config.get_json("/cleanrooms/cr-1/cleanroom-questions")
+        StandInHabuHandler.body = json.dumps(CATALOG[:1]).encode()
+        StandInHabuHandler.etag = '"changed"'
+        second = await config.get_json("/cleanrooms/cr-1/cleanroom-questions")
+        await config.aclose()
+        return first, second
+
+    try:
+        first, second = asyncio.run(run())
+    finally:
+        StandInHabuHandler.body, StandInHabuHandler.etag = original_body, original_etag
+        server.shutdown()
+
+    assert len(first) == len(CATALOG)
+    assert second == CATALOG[:1]
+
+
+def measure_savings(rounds=20):
+    """Compare unconditional and conditional fetches of the same catalog"""
+    server = start_server(StandInHabuHandler)
+
+    async def run():
+        baseline = stand_in_config(server)
+        baseline.validators.max_entries = 0
+        baseline_latencies, _ = await timed_fetches(baseline, rounds)
+        baseline_stats = baseline.get_stats()["conditional_get"]
+        await baseline.aclose()
+
+        conditional = stand_in_config(server)
+        conditional_latencies, _ = await timed_fetches(conditional, rounds)
+        conditional_stats = conditional.get_stats()["conditional_get"]
+        await conditional.aclose()
+        return baseline_latencies, baseline_stats, conditional_latencies, conditional_stats
+
+    try:
+        return asyncio.run(run())
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    print("🧪 Testing conditional GET revalidation")
+    test_not_modified_reuses_parsed_payload()
+    test_changed_resource_is_downloaded_again()
+    print("✅ All conditional GET tests passed")
+
+    baseline_latencies, baseline_stats, conditional_latencies, conditional_stats = measure_savings()
+    print(f"\n📊 {len(baseline_latencies)} fetches of a {len(StandInHabuHandler.body)} byte catalog")
+    print(f"   Unconditional: {baseline_stats['bytes_downloaded']} bytes, "
+          f"avg {sum(baseline_latencies) / len(baseline_latencies):.2f} ms")
+    print(f"   Conditional:   {conditional_stats['bytes_downloaded']} bytes "
+          f"({conditional_stats['bytes_saved']} saved), "
+          f"avg {sum(conditional_latencies) / len(conditional_latencies):.2f} ms")
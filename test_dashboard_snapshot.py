@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test the materialized dashboard snapshot: versioning, ETag/304, section
+failures, cross-worker sharing and the background refresher
+"""
+import asyncio
+import gzip
+import json
+from contextlib import contextmanager
+from starlette.testclient import TestClient
+import api_handlers
+import asgi_api
+from redis_cache import cache
+from utils.dashboard_snapshot import DashboardSnapshot
+from utils.tool_result import ToolResult
+from test_support import InMemoryRedis, StubManager
+
+
+class CountingSource:
+    def __init__(self, name, size=1):
+        self.name = name
+        self.size = size
+        self.calls = 0
+        self.fail = False
+
+    async def __call__(self):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError(f"{self.name} unavailable")
+        items = [{"id": f"{self.name}-{i}", "description": "x" * 40} for i in range(self.size)]
+        timings = [{"cleanroom_id": "cr1", "elapsed_ms": 10.0 + self.calls}]
+        return ToolResult({"status": "success", "count": self.size, self.name: items, "cleanroom_timings": timings})
+
+
+def make_snapshot(redis=None, interval=60.0):
+    sources = {name: CountingSource(name, 20) for name in ("partners", "templates", "exports")}
+    snapshot = DashboardSnapshot(
+        type("Cache", (), {"manager": StubManager(redis)})(),
+        sources=dict(sources),
+        interval=interval
+    )
+    return snapshot, sources
+
+
+def test_version_and_etag_follow_content():
+    async def scenario():
+        snapshot, sources = make_snapshot()
+        first = await snapshot.current()
+        body = json.loads(first.body)
+        assert body["version"] == 1 and body["errors"] == {}
+        assert len(body["partners"]["partners"]) == 20
+        assert gzip.decompress(first.gzip_body) == first.body
+
+        # Served from memory until it ages out
+        assert (await snapshot.current()) is first
+        assert sources["partners"].calls == 1
+
+        # A refresh with identical data (only the timings differ) keeps version and ETag
+        assert (await snapshot.refresh()).etag == first.etag
+        assert snapshot.stats()["unchanged"] == 1
+
+        sources["partners"].size = 21
+        changed = await snapshot.refresh()
+        assert json.loads(changed.body)["version"] == 2
+        assert changed.etag != first.etag
+    asyncio.run(scenario())
+
+
+def test_failed_section_keeps_previous_value():
+    async def scenario():
+        snapshot, sources = make_snapshot()
+        first = json.loads((await snapshot.current()).body)
+        sources["exports"].fail = True
+        second = json.loads((await snapshot.refresh()).body)
+        assert second["exports"] == first["exports"]
+        assert "exports unavailable" in second["errors"]["exports"]
+        assert snapshot.stats()["section_failures"] == 1
+    asyncio.run(scenario())
+
+
+def test_workers_share_one_fan_out():
+    async def scenario():
+        redis = InMemoryRedis()
+        leader, leader_sources = make_snapshot(redis)
+        follower, follower_sources = make_snapshot(redis)
+        built = await leader.current()
+        # The lease is held, so the follower adopts the published copy
+        adopted = await follower.current()
+        assert adopted.etag == built.etag and adopted.body == built.body
+        assert adopted.br_body == built.br_body
+        assert all(source.calls == 0 for source in follower_sources.values())
+        assert follower.stats()["adopted"] == 1 and follower.stats()["version"] == 1
+
+        # Once the lease lapses the follower builds itself; unchanged data keeps the shared version
+        del redis.values["dashboard:refresh"]
+        rebuilt = await follower.refresh()
+        assert rebuilt.etag == built.etag and follower.stats()["unchanged"] == 1
+        assert redis.values["dashboard:version"] == 1
+    asyncio.run(scenario())
+
+
+def test_background_refresher_picks_up_changes():
+    async def scenario():
+        snapshot, sources = make_snapshot(interval=0.05)
+        await snapshot.start()
+        try:
+            first = await snapshot.current()
+            sources["templates"].size = 5
+            await asyncio.sleep(0.2)
+            assert snapshot.stats()["version"] >= 2
+            assert (await snapshot.current()).etag != first.etag
+            assert snapshot.stats()["refresher_running"]
+        finally:
+            await snapshot.stop()
+        assert not snapshot.stats()["refresher_running"]
+    asyncio.run(scenario())
+
+
+@contextmanager
+def stubbed_dashboard():
+    snapshot, sources = make_snapshot()
+    original_snapshot, original_manager = api_handlers.dashboard_snapshot, cache.manager
+    api_handlers.dashboard_snapshot = snapshot
+    cache.manager = StubManager(None)
+    try:
+        yield snapshot, sources
+    finally:
+        api_handlers.dashboard_snapshot, cache.manager = original_snapshot, original_manager
+
+
+def test_endpoint_serves_304_to_pollers():
+    with stubbed_dashboard() as (snapshot, sources), TestClient(asgi_api.create_app()) as client:
+        first = client.get("/api/dashboard", headers={"Accept-Encoding": "gzip"})
+        assert first.status_code == 200
+        assert first.headers["content-encoding"] == "gzip"
+        assert first.json()["version"] == 1
+        for _ in range(5):
+            polled = client.get("/api/dashboard", headers={"If-None-Match": first.headers["etag"]})
+            assert polled.status_code == 304 and polled.content == b""
+        assert sources["partners"].calls == 1
+        assert snapshot.stats()["not_modified"] == 5
+
+
+if __name__ == "__main__":
+    print("🧪 Testing dashboard snapshot")
+    test_version_and_etag_follow_content()
+    test_failed_section_keeps_previous_value()
+    test_workers_share_one_fan_out()
+    test_background_refresher_picks_up_changes()
+    test_endpoint_serves_304_to_pollers()
+    print("✅ All dashboard snapshot tests passed")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test the shared pooled Habu HTTP client
+Runs against an in-process stand-in for api.habu.com (no credentials needed)
+"""
+import asyncio
+import importlib
+import json
+import httpx
+import config.habu_config as habu_config_module
+from test_support import mock_habu_config
+
+
+def make_stub_api(state):
+    """Build a mock Habu API handler that records every request"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        state.setdefault("requests", []).append(request)
+        path = request.url.path
+        if path.endswith("/oauth/token"):
+            state["token_calls"] = state.get("token_calls", 0) + 1
+            return httpx.Response(200, json={"accessToken": f"token-{state['token_calls']}", "tokenType": "Bearer"})
+        if state.get("expire_first") and request.headers.get("Authorization") == "Bearer token-1":
+            return httpx.Response(401, json={"error": "expired"})
+        if path.endswith("/cleanrooms"):
+            return httpx.Response(200, json=[{"id": "cr-1", "name": "Demo"}])
+        if path.endswith("/partners"):
+            return httpx.Response(200, json=[{"id": "p-1", "name": "Partner One"}])
+        return httpx.Response(404, json={"error": "not found"})
+    return handler
+
+
+def make_config(state):
+    return mock_habu_config(make_stub_api(state))
+
+
+def test_client_is_shared_across_calls():
+    """The same pooled client serves every request on a loop"""
+    async def run():
+        config = make_config({})
+        first = config.get_client()
+        await config.request("GET", "/cleanrooms")
+        await config.request("GET", "/cleanrooms")
+        assert config.get_client() is first
+        assert first.headers["Accept-Encoding"].startswith("gzip")
+        await config.aclose()
+        assert config._client is None
+
+    asyncio.run(run())
+
+
+def test_client_recreated_for_new_event_loop():
+    """A client bound to a closed loop is never reused"""
+    config = make_config({})
+
+    async def grab():
+        return config.get_client()
+
+    first = asyncio.run(grab())
+    second = asyncio.run(grab())
+    assert first is not second
+
+
+def test_request_refreshes_token_on_401():
+    """request() retries once with a fresh token after a 401"""
+    async def run():
+        state = {"expire_first": True}
+        config = make_config(state)
+        response = await config.request("GET", "/cleanrooms")
+        assert response.status_code == 200
+        assert state["token_calls"] == 2
+        await config.aclose()
+
+    asyncio.run(run())
+
+
+def test_list_partners_uses_shared_client():
+    """habu_list_partners goes through the shared config client"""
+    async def run():
+        partners_module = importlib.import_module("tools.habu_list_partners")
+        state = {}
+        config = make_config(state)
+        original = partners_module.habu_config
+        partners_module.habu_config = config
+        try:
+            result = json.loads(await partners_module.habu_list_partners())
+        finally:
+            partners_module.habu_config = original
+        assert result["status"] == "success"
+        assert result["count"] == 1
+        assert state["token_calls"] == 1
+        await config.aclose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    print("🧪 Testing shared Habu HTTP client")
+    print(f"HTTP/2 available: {habu_config_module.HTTP2_AVAILABLE}")
+    test_client_is_shared_across_calls()
+    test_client_recreated_for_new_event_loop()
+    test_request_refreshes_token_on_401()
+    test_list_partners_uses_shared_client()
+    print("✅ All shared client tests passed")
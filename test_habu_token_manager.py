@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test the proactive, single-flight OAuth token manager in HabuConfig
+Runs against an in-process stand-in for the Habu token endpoint
+"""
+import asyncio
+import base64
+import json
+import time
+import httpx
+from test_support import mock_habu_config
+
+
+def make_config(state, token_body=None):
+    """HabuConfig wired to a slow mock token endpoint"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/oauth/token"):
+            state["token_calls"] = state.get("token_calls", 0) + 1
+            await asyncio.sleep(0.05)
+            body = token_body or {"accessToken": f"token-{state['token_calls']}", "expiresIn": state.get("expires_in", 3600)}
+            return httpx.Response(200, json=body)
+        state["api_calls"] = state.get("api_calls", 0) + 1
+        return httpx.Response(200, json=[])
+
+    return mock_habu_config(handler)
+
+
+def test_concurrent_callers_share_one_refresh():
+    """N concurrent callers trigger exactly one POST to /oauth/token"""
+    async def run():
+        state = {}
+        config = make_config(state)
+        tokens = await asyncio.gather(*[config.get_access_token() for _ in range(10)])
+        assert set(tokens) == {"token-1"}
+        assert state["token_calls"] == 1
+        await config.aclose()
+
+    asyncio.run(run())
+
+
+def test_refreshes_in_background_before_expiry():
+    """Inside the refresh window the old token is served while a new one is fetched"""
+    async def run():
+        state = {"expires_in": 100}
+        config = make_config(state)
+        config.token_refresh_margin = 30
+        assert await config.get_access_token() == "token-1"
+
+        # Move into the refresh window without expiring the token
+        config._token_refresh_at = time.time() - 1
+        assert await config.get_access_token() == "token-1"
+        assert config.get_token_info()["refresh_in_flight"]
+
+        await config._token_refresh_task
+        assert await config.get_access_token() == "token-2"
+        assert state["token_calls"] == 2
+        await config.aclose()
+
+    asyncio.run(run())
+
+
+def test_no_401_round_trip_after_expiry():
+    """An expired token is replaced before the API call instead of after a 401"""
+    async def run():
+        state = {}
+        config = make_config(state)
+        await config.request("GET", "/cleanrooms")
+        config._token_expires_at = time.time() - 1
+        await config.request("GET", "/cleanrooms")
+        assert state["token_calls"] == 2
+        assert state["api_calls"] == 2
+        await config.aclose()
+
+    asyncio.run(run())
+
+
+def test_expiry_from_jwt_exp_claim():
+    """Without expiresIn the JWT exp claim drives the refresh schedule"""
+    exp = int(time.time()) + 600
+    claims = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip("=")
+    jwt = f"header.{claims}.signature"
+
+    async def run():
+        config = make_config({}, token_body={"accessToken": jwt})
+        await config.get_access_token()
+        assert config._token_expires_at == exp
+        assert config._token_refresh_at < exp
+        await config.aclose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Habu token manager")
+    test_concurrent_callers_share_one_refresh()
+    test_refreshes_in_background_before_expiry()
+    test_no_401_round_trip_after_expiry()
+    test_expiry_from_jwt_exp_claim()
+    print("✅ All token manager tests passed")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test hedged requests for idempotent Habu reads
+Runs against an in-process stand-in for the Habu API
+"""
+import asyncio
+import httpx
+from utils.error_handling import HedgeBudget, hedged_call, with_hedging
+from utils.rate_limiter import TokenBucketLimiter
+from test_support import mock_habu_config
+
+
+def test_hedge_wins_and_primary_is_cancelled():
+    """A slow primary is overtaken by the hedge and then cancelled"""
+    async def run():
+        budget = HedgeBudget(ratio=0.5, max_tokens=1)
+        attempts = []
+
+        async def attempt():
+            attempts.append(len(attempts))
+            index = attempts[-1]
+            try:
+                await asyncio.sleep(1.0 if index == 0 else 0.01)
+            except asyncio.CancelledError:
+                attempts.append("cancelled")
+                raise
+            return index
+
+        result = await hedged_call(attempt, delay=0.02, budget=budget)
+        await asyncio.sleep(0)
+        return result, attempts, budget.stats()
+
+    result, attempts, stats = asyncio.run(run())
+    assert result == 1
+    assert "cancelled" in attempts
+    assert stats["hedges_sent"] == 1
+    assert stats["hedges_won"] == 1
+
+
+def test_cancelled_caller_cancels_primary():
+    """Cancelling the caller before the hedge delay leaves no attempt running"""
+    async def run():
+        budget = HedgeBudget(ratio=0.5, max_tokens=1)
+        cancelled = []
+
+        async def attempt():
+            try:
+                await asyncio.sleep(1.0)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        caller = asyncio.ensure_future(hedged_call(attempt, delay=0.5, budget=budget))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        try:
+            await caller
+        except asyncio.CancelledError:
+            pass
+        await asyncio.sleep(0)
+        return cancelled, [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    cancelled, leftover = asyncio.run(run())
+    assert cancelled == [True]
+    assert leftover == []
+
+
+def test_budget_limits_hedges():
+    """Without hedge tokens the primary is simply awaited"""
+    async def run():
+        budget = HedgeBudget(ratio=0.0, max_tokens=1)
+        calls = []
+
+        async def attempt():
+            calls.append(1)
+            await asyncio.sleep(0.03)
+            return "ok"
+
+        results = [await hedged_call(attempt, delay=0.01, budget=budget) for _ in range(3)]
+        return results, calls, budget.stats()
+
+    results, calls, stats = asyncio.run(run())
+    assert results == ["ok", "ok", "ok"]
+    assert len(calls) == 4
+    assert stats["hedges_sent"] == 1
+    assert stats["hedges_denied"] == 2
+
+
+def test_client_hedges_only_opted_in_reads():
+    """get_json hedges after the endpoint p95 inside with_hedging, and not outside"""
+    async def run():
+        state = {"calls": 0}
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.endswith("/oauth/token"):
+                return httpx.Response(200, json={"accessToken": "token", "expiresIn": 3600})
+            state["calls"] += 1
+            if state.get("slow") and state["calls"] % 2 == 1:
+                await asyncio.sleep(1.0)
+            return httpx.Response(200, json={"status": "RUNNING"})
+
+        config = mock_habu_config(handler,
+                                  rate_limiter=TokenBucketLimiter("test", rate=1000, burst=1000))
+        config.latency.min_samples = 5
+        for i in range(5):
+            await config.get_json(f"/queries/q-{i}")
+
+        budget = HedgeBudget(ratio=0.5, max_tokens=2)
+
+        @with_hedging(budget)
+        async def check_status(query_id):
+            return await config.get_json(f"/queries/{query_id}")
+
+        state["slow"], state["calls"] = True, 0
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await check_status("q-slow")
+        hedged_elapsed = loop.time() - started
+
+        state["calls"] = 0
+        started = loop.time()
+        await config.get_json("/queries/q-plain")
+        plain_elapsed = loop.time() - started
+        await config.aclose()
+        return result, hedged_elapsed, plain_elapsed, budget.stats()
+
+    result, hedged_elapsed, plain_elapsed, stats = asyncio.run(run())
+    assert result == {"status": "RUNNING"}
+    assert hedged_elapsed < 0.5
+    assert plain_elapsed >= 0.9
+    assert stats["hedges_sent"] == 1 and stats["hedges_won"] == 1
+
+
+if __name__ == "__main__":
+    print("🧪 Testing hedged requests")
+    test_hedge_wins_and_primary_is_cancelled()
+    test_cancelled_caller_cancels_primary()
+    test_budget_limits_hedges()
+    test_client_hedges_only_opted_in_reads()
+    print("✅ All hedged request tests passed")
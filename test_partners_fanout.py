@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test concurrent cleanroom fan-out in habu_list_partners
+Runs against an in-process stand-in for the Habu API
+"""
+import asyncio
+import importlib
+import json
+import time
+import httpx
+from redis_cache import cache
+from utils.error_handling import RetryPolicy
+from test_support import mock_habu_config
+
+partners_module = importlib.import_module("tools.habu_list_partners")
+
+CLEANROOM_COUNT = 12
+PARTNER_DELAY = 0.05
+
+
+def make_config(state):
+    """HabuConfig wired to a mock API with slow partner endpoints"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path.endswith("/oauth/token"):
+            return httpx.Response(200, json={"accessToken": "token", "expiresIn": 3600})
+        if path.endswith("/cleanrooms"):
+            return httpx.Response(200, json=[{"id": f"cr-{i}", "name": f"Cleanroom {i}"} for i in range(CLEANROOM_COUNT)])
+        if path.endswith("/partners"):
+            state["in_flight"] = state.get("in_flight", 0) + 1
+            state["max_in_flight"] = max(state.get("max_in_flight", 0), state["in_flight"])
+            await asyncio.sleep(PARTNER_DELAY)
+            state["in_flight"] -= 1
+            cleanroom_id = path.split("/")[-2]
+            if cleanroom_id == "cr-3":
+                return httpx.Response(500, json={"error": "boom"})
+            return httpx.Response(200, json=[{"id": f"{cleanroom_id}-partner", "name": "Partner"}])
+        return httpx.Response(404)
+
+    config = mock_habu_config(handler)
+    # Failing cleanrooms fail once; retries are covered by test_retry_policy.py
+    config.retry_policy = RetryPolicy("test", max_attempts=1)
+    return config
+
+
+async def list_partners(config, **kwargs):
+    # Each test's stand-in API has its own cleanrooms; don't reuse another test's cached list
+    cache.local.clear()
+    original = partners_module.habu_config
+    partners_module.habu_config = config
+    try:
+        return json.loads(await partners_module.habu_list_partners(**kwargs))
+    finally:
+        partners_module.habu_config = original
+        await config.aclose()
+
+
+def test_fanout_is_concurrent_and_capped():
+    """Per-cleanroom fetches overlap but never exceed the concurrency cap"""
+    state = {}
+    started = time.perf_counter()
+    result = asyncio.run(list_partners(make_config(state), max_concurrency=4))
+    elapsed = time.perf_counter() - started
+
+    assert result["status"] == "success"
+    assert state["max_in_flight"] == 4
+    assert elapsed < CLEANROOM_COUNT * PARTNER_DELAY
+    print(f"12 cleanrooms in {elapsed * 1000:.0f}ms (serial would be ~{CLEANROOM_COUNT * PARTNER_DELAY * 1000:.0f}ms)")
+
+
+def test_failed_cleanroom_does_not_fail_listing():
+    """One failing cleanroom is reported while the others still return partners"""
+    result = asyncio.run(list_partners(make_config({})))
+
+    assert result["status"] == "success"
+    assert result["count"] == CLEANROOM_COUNT - 1
+    assert [f["cleanroom_id"] for f in result["failed_cleanrooms"]] == ["cr-3"]
+    assert len(result["cleanroom_timings"]) == CLEANROOM_COUNT
+    assert all("elapsed_ms" in t for t in result["cleanroom_timings"])
+
+
+if __name__ == "__main__":
+    print("🧪 Testing partner fan-out")
+    test_fanout_is_concurrent_and_capped()
+    test_failed_cleanroom_does_not_fail_listing()
+    print("✅ All partner fan-out tests passed")
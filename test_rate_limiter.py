@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test the outbound token-bucket rate limiter and its use by HabuConfig
+Uses the in-process bucket; Redis is not required
+"""
+import asyncio
+import time
+import httpx
+from utils.error_handling import RateLimitExceededError
+from utils.rate_limiter import TokenBucketLimiter, parse_retry_after, request_priority
+from test_support import mock_habu_config
+
+
+def test_burst_then_refill_rate():
+    """The burst is granted immediately, further calls wait for refill"""
+    async def run():
+        limiter = TokenBucketLimiter("test", rate=50, burst=5)
+        started = time.monotonic()
+        for _ in range(10):
+            await limiter.acquire()
+        return time.monotonic() - started, limiter.stats()
+
+    elapsed, stats = asyncio.run(run())
+    assert 0.08 <= elapsed < 0.5
+    assert stats["granted"]["interactive"] == 10
+    assert stats["backend"] == "local"
+
+
+def test_background_leaves_reserve_for_interactive():
+    """Background calls stop at the reserve while interactive calls still go through"""
+    async def run():
+        limiter = TokenBucketLimiter("test", rate=0.01, burst=4, max_wait=0.05)
+        with request_priority("background"):
+            await limiter.acquire()
+            await limiter.acquire()
+            try:
+                await limiter.acquire()
+                assert False, "background call should be throttled"
+            except RateLimitExceededError as e:
+                assert e.status_code == 429
+        await limiter.acquire()
+        await limiter.acquire()
+        return limiter.stats()
+
+    stats = asyncio.run(run())
+    assert stats["granted"] == {"interactive": 2, "background": 2}
+    assert stats["rejected"] == 1
+
+
+def test_retry_after_pauses_bucket_and_retries():
+    """A 429 with Retry-After blocks the bucket and the request is sent again"""
+    async def run():
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.endswith("/oauth/token"):
+                return httpx.Response(200, json={"accessToken": "token", "expiresIn": 3600})
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                return httpx.Response(429, headers={"Retry-After": "0.2"})
+            return httpx.Response(200, json=[])
+
+        limiter = TokenBucketLimiter("test", rate=100, burst=10)
+        config = mock_habu_config(handler, rate_limiter=limiter)
+        data = await config.get_json("/cleanrooms")
+        await config.aclose()
+        return data, calls, limiter.stats()
+
+    data, calls, stats = asyncio.run(run())
+    assert data == []
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.19
+    assert stats["retry_after_events"] == 1
+
+
+def test_redis_unavailable_falls_back_to_local_bucket():
+    """An unreachable Redis does not block outbound calls"""
+    async def run():
+        limiter = TokenBucketLimiter("test", rate=10, burst=2, redis_url="redis://127.0.0.1:1")
+        await limiter.acquire()
+        await limiter.acquire()
+        return limiter.stats()
+
+    stats = asyncio.run(run())
+    assert stats["backend"] == "local"
+    assert stats["granted"]["interactive"] == 2
+
+
+def test_parse_retry_after():
+    """Both delta-seconds and HTTP dates are understood"""
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("not a date") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+if __name__ == "__main__":
+    print("🧪 Testing outbound rate limiter")
+    test_burst_then_refill_rate()
+    test_background_leaves_reserve_for_interactive()
+    test_retry_after_pauses_bucket_and_retries()
+    test_redis_unavailable_falls_back_to_local_bucket()
+    test_parse_retry_after()
+    print("✅ All rate limiter tests passed")
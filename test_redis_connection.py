@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test the Redis connection lifecycle: fast failure, background reconnect, health, loop rebinding
+"""
+import asyncio
+from redis.exceptions import ConnectionError as RedisConnectionError, ResponseError
+from redis_cache import RedisCache
+from utils.redis_connection import RedisConnectionManager
+
+# Nothing listens on port 1
+UNREACHABLE_URL = "redis://:secret@127.0.0.1:1/0"
+
+
+def make_manager(**kwargs):
+    return RedisConnectionManager(UNREACHABLE_URL, min_backoff=0.01, max_backoff=0.02,
+                                  socket_connect_timeout=0.5, **kwargs)
+
+
+def test_unreachable_redis_reconnects_in_background():
+    """A failed connect returns quickly and leaves one reconnect task running"""
+    manager = make_manager()
+
+    async def scenario():
+        assert not await manager.connect()
+        assert await manager.get_client() is None
+        task = manager._reconnect_task
+        assert task is not None and not task.done()
+        await asyncio.sleep(0.2)
+        assert manager._reconnect_task is task
+        assert manager.reconnect_attempts >= 2
+        health = manager.health()
+        await manager.disconnect()
+        return health
+
+    health = asyncio.run(scenario())
+    assert health["connected"] is False
+    assert health["reconnecting"] is True
+    assert health["url"] == "redis://127.0.0.1:1/0"
+    assert "ConnectionError" in health["last_error"]
+    assert health["pool"]["max_connections"] == 20
+
+
+def test_only_connection_errors_mark_redis_down():
+    """Command errors (e.g. WRONGTYPE) don't trigger a reconnect"""
+    manager = make_manager()
+    manager.connected = True
+    manager.report_failure(ResponseError("WRONGTYPE"))
+    assert manager.connected
+    manager.report_failure(RedisConnectionError("reset by peer"))
+    assert not manager.connected
+
+
+def test_new_loop_gets_a_new_pool():
+    """A client created on one event loop is never reused on another"""
+    manager = make_manager()
+
+    async def bind():
+        await manager.connect()
+        pool = manager._pool
+        await manager.disconnect()
+        manager._closed = False
+        return pool
+
+    first = asyncio.run(bind())
+    second = asyncio.run(bind())
+    assert first is not None and second is not None
+    assert first is not second
+
+
+def test_binary_client_follows_connection_state():
+    """The bytes-reply client comes from its own pool and is withheld while Redis is down"""
+    manager = make_manager(decode_responses=True)
+
+    async def scenario():
+        await manager.connect()
+        binary = await manager.get_binary_client()
+        pools = manager._pool, manager._binary_pool
+        stats = manager.pool_stats()
+        await manager.disconnect()
+        return binary, pools, stats
+
+    binary, (text_pool, binary_pool), stats = asyncio.run(scenario())
+    assert binary is None
+    assert text_pool.connection_kwargs["decode_responses"] is True
+    assert binary_pool.connection_kwargs["decode_responses"] is False
+    assert stats["binary"]["max_connections"] == 20
+
+
+def test_cache_degrades_without_redis():
+    """Without Redis, RedisCache serves from its in-process tier and reports connection health"""
+    cache = RedisCache()
+    cache.manager = make_manager()
+
+    async def scenario():
+        await cache.connect()
+        results = (
+            await cache.get_cached_response("partners_list"),
+            await cache.cache_api_response("partners_list", {"partners": []}),
+            await cache.get_cached_response("partners_list"),
+            await cache.invalidate_cache("api:*"),
+            await cache.get_cache_stats()
+        )
+        await cache.disconnect()
+        return results
+
+    missing, stored, cached, deleted, stats = asyncio.run(scenario())
+    assert missing is None and stored is True and deleted == 1
+    assert cached["data"] == {"partners": []} and cached["cache_tier"] == "l1"
+    assert not cache.connected
+    assert stats["connected"] is False
+    assert stats["tiers"]["l1"]["hits"] == 1
+    assert stats["connection"]["reconnecting"] is True
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Redis connection lifecycle")
+    test_unreachable_redis_reconnects_in_background()
+    test_only_connection_errors_mark_redis_down()
+    test_new_loop_gets_a_new_pool()
+    test_binary_client_follows_connection_state()
+    test_cache_degrades_without_redis()
+    print("✅ All Redis connection tests passed")
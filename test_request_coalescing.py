@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test single-flight request coalescing for identical in-flight Habu GETs
+Runs against an in-process stand-in for the Habu API
+"""
+import asyncio
+import httpx
+from utils.single_flight import SingleFlight
+from test_support import mock_habu_config
+
+
+def make_config(state):
+    """HabuConfig wired to a mock API with a slow /exports endpoint"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path.endswith("/oauth/token"):
+            return httpx.Response(200, json={"accessToken": "token", "expiresIn": 3600})
+        state["upstream"] = state.get("upstream", 0) + 1
+        await asyncio.sleep(0.05)
+        if path.endswith("/queries"):
+            return httpx.Response(201, json={"id": f"q-{state['upstream']}"})
+        return httpx.Response(200, json={"path": path, "params": dict(request.url.params)})
+
+    return mock_habu_config(handler)
+
+
+def test_identical_gets_share_one_upstream_request():
+    """Ten identical concurrent GETs cause one upstream request"""
+    async def run():
+        state = {}
+        config = make_config(state)
+        await config.get_access_token()
+        responses = await asyncio.gather(*[config.request("GET", "/exports", params={"status": "READY"}) for _ in range(10)])
+        assert state["upstream"] == 1
+        assert all(r.json()["params"] == {"status": "READY"} for r in responses)
+        stats = config.get_stats()["single_flight"]
+        assert stats["upstream_calls"] == 1
+        assert stats["coalesced_calls"] == 9
+        assert stats["in_flight"] == 0
+        await config.aclose()
+
+    asyncio.run(run())
+
+
+def test_different_params_and_posts_are_not_coalesced():
+    """Different params and non-GET requests always go upstream"""
+    async def run():
+        state = {}
+        config = make_config(state)
+        await config.get_access_token()
+        await asyncio.gather(
+            config.request("GET", "/exports", params={"status": "READY"}),
+            config.request("GET", "/exports", params={"status": "FAILED"}),
+            config.request("POST", "/queries", json={}),
+            config.request("POST", "/queries", json={})
+        )
+        assert state["upstream"] == 4
+        await config.aclose()
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    """Cancelling the leader leaves the shared call running for the others"""
+    async def run():
+        flight = SingleFlight("test")
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        leader = asyncio.ensure_future(flight.do("key", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", slow))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await follower == "done"
+        assert flight.stats()["coalesced_calls"] == 1
+
+    asyncio.run(run())
+
+
+def test_errors_are_shared():
+    """Every awaiter sees the exception raised by the shared call"""
+    async def run():
+        flight = SingleFlight("test")
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(*[flight.do("key", failing) for _ in range(3)], return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert flight.stats()["upstream_calls"] == 1
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    print("🧪 Testing request coalescing")
+    test_identical_gets_share_one_upstream_request()
+    test_different_params_and_posts_are_not_coalesced()
+    test_cancelled_waiter_does_not_cancel_shared_call()
+    test_errors_are_shared()
+    print("✅ All request coalescing tests passed")
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Test precomputed ETag/gzip/brotli responses for cached catalog endpoints
+"""
+import asyncio
+import gzip
+import json
+from contextlib import contextmanager
+import brotli
+from starlette.testclient import TestClient
+import api_handlers
+import asgi_api
+import demo_api
+from redis_cache import cache
+from utils.response_cache import encode_response, etag_matches, from_redis_fields, response_cache, to_redis_fields
+from utils.tool_result import ToolResult
+from test_support import InMemoryRedis, StubManager
+
+
+class CountingPartners:
+    def __init__(self):
+        self.calls = 0
+        self.count = 50
+
+    async def __call__(self):
+        self.calls += 1
+        return ToolResult({
+            "status": "success",
+            "count": self.count,
+            "partners": [{"id": f"p-{i}", "name": f"Partner {i}"} for i in range(self.count)]
+        })
+
+
+@contextmanager
+def cached_partners():
+    redis = InMemoryRedis()
+    partners = CountingPartners()
+    original_manager, original_tool = cache.manager, api_handlers.habu_list_partners_result
+    cache.manager = StubManager(redis)
+    api_handlers.habu_list_partners_result = partners
+    response_cache.invalidate()
+    cache.local.clear()
+    try:
+        yield redis, partners
+    finally:
+        cache.manager, api_handlers.habu_list_partners_result = original_manager, original_tool
+        response_cache.invalidate()
+        cache.local.clear()
+
+
+def test_variants_and_etag():
+    encoded = encode_response({"templates": ["x" * 40] * 50}, {"cached": True})
+    assert gzip.decompress(encoded.gzip_body) == encoded.body
+    assert brotli.decompress(encoded.br_body) == encoded.body
+    assert encoded.select("gzip, deflate, br") == (encoded.br_body, "br")
+    assert encoded.select("gzip, br;q=0") == (encoded.gzip_body, "gzip")
+    assert encoded.select(None) == (encoded.body, None)
+    # Cache metadata doesn't change the validator
+    assert encoded.etag == encode_response({"templates": ["x" * 40] * 50}, {"cached": False}).etag
+    small = encode_response({"status": "success"})
+    assert small.gzip_body is None and small.br_body is None
+    assert etag_matches(f'"abc", {encoded.etag}', encoded.etag)
+    assert etag_matches(encoded.etag[2:], encoded.etag)
+    assert etag_matches("*", encoded.etag)
+    assert not etag_matches('W/"other"', encoded.etag)
+
+    # Stored as raw bytes; the binary client returns field names and text values as bytes too
+    fields = to_redis_fields(encoded)
+    assert fields["br"] == encoded.br_body
+    restored = from_redis_fields({name.encode(): value if isinstance(value, bytes) else value.encode()
+                                  for name, value in fields.items()})
+    assert (restored.etag, restored.body, restored.gzip_body, restored.br_body) == \
+        (encoded.etag, encoded.body, encoded.gzip_body, encoded.br_body)
+    assert from_redis_fields(to_redis_fields(small)).gzip_body is None
+
+
+def test_etag_ignores_timing_diagnostics():
+    def partners(elapsed_ms, partner_count=2):
+        return {"status": "success", "partners": ["a", "b"],
+                "cleanroom_timings": [{"cleanroom_id": "cr1", "status": "success",
+                                       "partner_count": partner_count, "elapsed_ms": elapsed_ms}]}
+
+    first = encode_response(partners(12.5))
+    assert encode_response(partners(80.1)).etag == first.etag
+    assert encode_response({**partners(3.0), "age_seconds": 4.2}).etag == first.etag
+    assert encode_response(partners(12.5, partner_count=3)).etag != first.etag
+    # The diagnostics are still in the body
+    assert json.loads(encode_response(partners(80.1)).body)["cleanroom_timings"][0]["elapsed_ms"] == 80.1
+
+
+def test_flask_serves_precompressed_and_304():
+    client = demo_api.app.test_client()
+    with cached_partners() as (redis, partners):
+        first = client.get("/api/mcp/habu_list_partners", headers={"Accept-Encoding": "gzip"})
+        second = client.get("/api/mcp/habu_list_partners", headers={"Accept-Encoding": "br"})
+        reads_before = len(redis.reads)
+        third = client.get("/api/mcp/habu_list_partners", headers={"If-None-Match": second.headers["ETag"]})
+
+    assert first.status_code == 200 and first.headers["X-Cache"] == "MISS"
+    assert json.loads(gzip.decompress(first.data))["cached"] is False
+    assert second.headers["Content-Encoding"] == "br" and second.headers["X-Cache"] == "HIT"
+    body = json.loads(brotli.decompress(second.data))
+    assert body["cached"] is True and body["count"] == 50
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert third.status_code == 304 and third.data == b""
+    assert partners.calls == 1
+    # The 304 never loaded the cached payload
+    assert len(redis.reads) == reads_before
+
+
+def test_asgi_serves_precompressed_and_304():
+    with cached_partners() as (redis, partners), TestClient(asgi_api.create_app()) as client:
+        client.get("/api/mcp/habu_list_partners")
+        hit = client.get("/api/mcp/habu_list_partners", headers={"Accept-Encoding": "gzip"})
+        not_modified = client.get("/api/mcp/habu_list_partners", headers={"If-None-Match": hit.headers["etag"]})
+
+    assert hit.headers["content-encoding"] == "gzip"
+    assert hit.json()["cached"] is True
+    assert not_modified.status_code == 304
+    assert partners.calls == 1
+    assert response_cache.stats()["not_modified"] >= 1
+
+
+def test_invalidation_drops_the_encoded_response():
+    client = demo_api.app.test_client()
+    with cached_partners() as (redis, partners):
+        client.get("/api/mcp/habu_list_partners")
+        etag = client.get("/api/mcp/habu_list_partners").headers["ETag"]
+        assert "resp:partners_list" in redis.hashes
+        partners.count = 51
+        asyncio.run(cache.invalidate_tags("partner"))
+        assert "resp:partners_list" not in redis.hashes and response_cache.stats()["entries"] == 0
+        after = client.get("/api/mcp/habu_list_partners", headers={"If-None-Match": etag})
+
+    assert after.status_code == 200 and after.headers["ETag"] != etag
+    assert json.loads(after.data)["count"] == 51
+    assert partners.calls == 2
+
+
+def test_other_workers_drop_their_encoded_response():
+    client = demo_api.app.test_client()
+    with cached_partners() as (redis, partners):
+        client.get("/api/mcp/habu_list_partners")
+        client.get("/api/mcp/habu_list_partners")
+        assert response_cache.stats()["entries"] == 1
+        cache.invalidator.apply(json.dumps({"origin": "other-worker", "op": "keys",
+                                            "keys": ["api:partners_list"], "version": 10**6}))
+        assert response_cache.stats()["entries"] == 0
+        client.get("/api/mcp/habu_list_partners")
+        cache.invalidator.apply(json.dumps({"origin": "other-worker", "op": "pattern",
+                                            "pattern": "api:partners_*", "version": 10**6}))
+        assert response_cache.stats()["entries"] == 0
+
+
+if __name__ == "__main__":
+    print("🧪 Testing precomputed response cache")
+    test_variants_and_etag()
+    test_etag_ignores_timing_diagnostics()
+    test_flask_serves_precompressed_and_304()
+    test_asgi_serves_precompressed_and_304()
+    test_invalidation_drops_the_encoded_response()
+    test_other_workers_drop_their_encoded_response()
+    print("✅ All response cache tests passed")
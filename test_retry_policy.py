@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Test the retry policy engine: classification, jitter, budget and nesting
+"""
+import asyncio
+import httpx
+from utils.error_handling import (
+    AuthenticationError,
+    CircuitOpenError,
+    RetryBudget,
+    RetryPolicy,
+    is_retryable,
+    retry_async
+)
+from utils.rate_limiter import TokenBucketLimiter
+from test_support import mock_habu_config
+
+
+def status_error(code):
+    request = httpx.Request("GET", "https://api.habu.com/v1/cleanrooms")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(code, request=request))
+
+
+def test_error_classification():
+    """Transient failures are retryable, client and auth errors are not"""
+    assert is_retryable(status_error(503))
+    assert is_retryable(status_error(429))
+    assert is_retryable(httpx.ConnectTimeout("timeout"))
+    assert not is_retryable(status_error(404))
+    assert not is_retryable(status_error(400))
+    assert not is_retryable(ValueError("bad input"))
+    assert not is_retryable(AuthenticationError("bad credentials"))
+    assert not is_retryable(CircuitOpenError())
+
+
+def test_decorrelated_jitter_stays_within_bounds():
+    """Delays vary, never drop below base and never exceed the cap"""
+    policy = RetryPolicy("test", base_delay=0.1, max_delay=2.0, budget=RetryBudget())
+    delay, delays = 0.1, []
+    for _ in range(50):
+        delay = policy.next_delay(delay)
+        delays.append(delay)
+    assert all(0.1 <= d <= 2.0 for d in delays)
+    assert len(set(delays)) > 1
+
+
+def test_only_transient_errors_are_retried():
+    """A 503 is retried until success; a 404 fails on the first attempt"""
+    async def run():
+        policy = RetryPolicy("test", max_attempts=3, base_delay=0.001, max_delay=0.002, budget=RetryBudget())
+        calls = {"flaky": 0, "missing": 0}
+
+        async def flaky():
+            calls["flaky"] += 1
+            if calls["flaky"] < 3:
+                raise status_error(503)
+            return "ok"
+
+        async def missing():
+            calls["missing"] += 1
+            raise status_error(404)
+
+        assert await policy.call(flaky) == "ok"
+        try:
+            await policy.call(missing)
+            assert False, "404 should not be retried"
+        except httpx.HTTPStatusError:
+            pass
+        return calls, policy.stats()
+
+    calls, stats = asyncio.run(run())
+    assert calls == {"flaky": 3, "missing": 1}
+    assert stats["retries"] == 2
+    assert stats["non_retryable_failures"] == 1
+
+
+def test_budget_caps_retries_during_outage():
+    """Once the budget is spent, failures are returned without retrying"""
+    async def run():
+        budget = RetryBudget(ratio=0.1, max_tokens=2)
+        policy = RetryPolicy("test", max_attempts=3, base_delay=0.001, max_delay=0.002, budget=budget)
+        attempts = []
+
+        async def down():
+            attempts.append(1)
+            raise status_error(503)
+
+        for _ in range(20):
+            try:
+                await policy.call(down)
+            except httpx.HTTPStatusError:
+                pass
+        return len(attempts), budget.stats()
+
+    attempts, stats = asyncio.run(run())
+    # 20 first attempts earn 2 retry tokens on top of the initial 2
+    assert attempts <= 20 + 4
+    assert stats["retries_denied"] > 0
+
+
+def test_nested_retries_are_refused():
+    """An inner retrying function runs once when an outer layer already retries"""
+    async def run():
+        calls = []
+
+        @retry_async(max_retries=3, delay=0.001)
+        async def inner():
+            calls.append(1)
+            raise httpx.ConnectError("refused")
+
+        @retry_async(max_retries=2, delay=0.001)
+        async def outer():
+            return await inner()
+
+        try:
+            await outer()
+        except httpx.ConnectError:
+            pass
+        return len(calls), inner.retry_policy.stats()
+
+    calls, inner_stats = asyncio.run(run())
+    assert calls == 2
+    assert inner_stats["nested_calls"] == 2
+
+
+def test_get_json_retries_transient_upstream_errors():
+    """HabuConfig.get_json retries a 502 and returns the eventual payload"""
+    async def run():
+        state = {"calls": 0}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.endswith("/oauth/token"):
+                return httpx.Response(200, json={"accessToken": "token", "expiresIn": 3600})
+            state["calls"] += 1
+            if state["calls"] == 1:
+                return httpx.Response(502)
+            return httpx.Response(200, json=[{"id": "cr-1"}])
+
+        config = mock_habu_config(handler,
+                                  rate_limiter=TokenBucketLimiter("test", rate=1000, burst=1000))
+        config.retry_policy = RetryPolicy("test", base_delay=0.001, max_delay=0.002, budget=RetryBudget())
+        data = await config.get_json("/cleanrooms")
+        await config.aclose()
+        return data, state["calls"]
+
+    data, calls = asyncio.run(run())
+    assert data == [{"id": "cr-1"}]
+    assert calls == 2
+
+
+if __name__ == "__main__":
+    print("🧪 Testing retry policy")
+    test_error_classification()
+    test_decorrelated_jitter_stays_within_bounds()
+    test_only_transient_errors_are_retried()
+    test_budget_caps_retries_during_outage()
+    test_nested_retries_are_refused()
+    test_get_json_retries_transient_upstream_errors()
+    print("✅ All retry policy tests passed")
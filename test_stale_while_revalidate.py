@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test stale-while-revalidate reads in RedisCache
+"""
+import asyncio
+import time
+from utils import rate_limiter
+from test_support import InMemoryRedis, make_redis_cache
+
+
+def make_cache():
+    return make_redis_cache(InMemoryRedis())
+
+
+def expire(cache, endpoint, seconds_ago=1):
+    """Move an entry's logical expiry into the past (the next read goes through to Redis)"""
+    key = cache._generate_cache_key('api', endpoint)
+    entry = cache.codec.decode(cache.manager.client.values[key])
+    entry['expires_at'] = time.time() - seconds_ago
+    cache.manager.client.values[key] = cache.codec.encode(entry)[0]
+    cache.local.delete(key)
+
+
+class SlowFetch:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+        self.priorities = []
+
+    async def __call__(self):
+        self.calls += 1
+        self.priorities.append(rate_limiter._current_priority.get())
+        await asyncio.sleep(self.delay)
+        return {"status": "success", "version": self.calls}
+
+
+def test_stale_entry_served_while_one_refresh_runs():
+    cache = make_cache()
+    fetch = SlowFetch()
+
+    async def scenario():
+        cold = await cache.get_or_refresh('partners_list', fetch, 'partner_data', max_stale=60)
+        expire(cache, 'partners_list')
+
+        started = time.perf_counter()
+        stale_reads = await asyncio.gather(*[
+            cache.get_or_refresh('partners_list', fetch, 'partner_data', max_stale=60) for _ in range(10)
+        ])
+        stale_latency = time.perf_counter() - started
+
+        await asyncio.gather(*cache._refreshing.values())
+        fresh = await cache.get_or_refresh('partners_list', fetch, 'partner_data', max_stale=60)
+        return cold, stale_reads, stale_latency, fresh
+
+    cold, stale_reads, stale_latency, fresh = asyncio.run(scenario())
+    assert cold['cache_hit'] is False and cold['data']['version'] == 1
+    assert all(r['stale'] and r['data']['version'] == 1 for r in stale_reads)
+    assert stale_latency < fetch.delay
+    assert fetch.calls == 2
+    assert fresh['stale'] is False and fresh['data']['version'] == 2
+    assert cache.swr_stats['stale_hits'] == 10 and cache.swr_stats['refreshes'] == 1
+    # The caller waited for the cold fetch; nobody waited for the refresh
+    assert fetch.priorities == ["interactive", "background"]
+
+
+def test_past_max_stale_fetches_inline():
+    cache = make_cache()
+    fetch = SlowFetch(delay=0)
+
+    async def scenario():
+        await cache.get_or_refresh('templates', fetch, 'template_data', max_stale=60)
+        expire(cache, 'templates', seconds_ago=120)
+        return await cache.get_or_refresh('templates', fetch, 'template_data', max_stale=60)
+
+    result = asyncio.run(scenario())
+    assert result['cache_hit'] is False and result['data']['version'] == 2
+
+
+def test_failed_refresh_keeps_stale_entry():
+    cache = make_cache()
+    responses = [{"status": "success", "partners": ["a"]}, {"status": "error", "error": "boom"}]
+
+    async def fetch():
+        return responses.pop(0)
+
+    async def scenario():
+        await cache.get_or_refresh('partners_list', fetch, max_stale=60,
+                                   should_cache=lambda data: data['status'] == 'success')
+        expire(cache, 'partners_list')
+        await cache.get_or_refresh('partners_list', fetch, max_stale=60,
+                                   should_cache=lambda data: data['status'] == 'success')
+        await asyncio.gather(*cache._refreshing.values())
+        return await cache.get_cached_response('partners_list', allow_stale=True)
+
+    entry = asyncio.run(scenario())
+    assert entry['data']['partners'] == ["a"] and entry['stale']
+    assert cache.swr_stats['refresh_failures'] == 1
+
+
+def test_plain_reads_never_return_stale_entries():
+    cache = make_cache()
+
+    async def scenario():
+        await cache.cache_api_response('partners_list', {"partners": []}, max_stale=60)
+        expire(cache, 'partners_list')
+        return await cache.get_cached_response('partners_list')
+
+    assert asyncio.run(scenario()) is None
+
+
+if __name__ == "__main__":
+    print("🧪 Testing stale-while-revalidate cache")
+    test_stale_entry_served_while_one_refresh_runs()
+    test_past_max_stale_fetches_inline()
+    test_failed_refresh_keeps_stale_entry()
+    test_plain_reads_never_return_stale_entries()
+    print("✅ All stale-while-revalidate tests passed")
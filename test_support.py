@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Shared test doubles: an in-memory Redis, a stand-in RedisConnectionManager and
+HabuConfig factories wired to stand-in Habu APIs
+"""
+import asyncio
+import fnmatch
+import hashlib
+import struct
+import threading
+from http.server import ThreadingHTTPServer
+import httpx
+from redis.exceptions import NoScriptError
+from config.habu_config import HabuConfig
+from redis_cache import WRITE_ENTRY_SCRIPT, RedisCache
+
+
+class InMemoryRedis:
+    """
+    The Redis commands the cache modules use (strings, hashes, sorted sets,
+    SCAN and pub/sub) over plain dicts. Several caches sharing one instance
+    stand in for several workers. KEYS is deliberately missing. Lua scripts
+    run as their Python equivalents below.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+        self.zsets = {}
+        self.published = []
+        self.subscribers = []
+        self.scripts = {}
+        # Keys read with GET, and tag/SCAN operations in the order they ran
+        self.reads = []
+        self.commands = []
+
+    async def get(self, key):
+        self.reads.append(key)
+        return self.values.get(key)
+
+    async def set(self, key, value, nx=False, px=None, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def setex(self, key, ttl, value):
+        self.values[key] = value
+        return True
+
+    async def delete(self, *keys):
+        deleted = 0
+        for key in keys:
+            for store in (self.values, self.hashes, self.zsets):
+                deleted += store.pop(key, None) is not None
+        return deleted
+
+    async def unlink(self, *keys):
+        self.commands.append(("unlink", keys))
+        return await self.delete(*keys)
+
+    async def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+    async def expire(self, key, seconds):
+        return True
+
+    async def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    async def hmget(self, key, *fields):
+        return [self.hashes.get(key, {}).get(field) for field in fields]
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    async def zremrangebyscore(self, key, low, high):
+        zset = self.zsets.get(key, {})
+        expired = [member for member, score in zset.items() if float(low) <= score <= float(high)]
+        for member in expired:
+            del zset[member]
+        return len(expired)
+
+    async def zrange(self, key, start, end):
+        self.commands.append(("zrange", key))
+        return [member for member, _ in sorted(self.zsets.get(key, {}).items(), key=lambda item: item[1])]
+
+    async def zpopmin(self, key, count):
+        members = sorted(self.zsets.get(key, {}).items(), key=lambda item: item[1])[:count]
+        for member, _ in members:
+            del self.zsets[key][member]
+        return members
+
+    async def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    async def zcount(self, key, low, high):
+        return sum(1 for score in self.zsets.get(key, {}).values() if float(low) <= score <= float(high))
+
+    async def scan_iter(self, match=None, count=None):
+        self.commands.append(("scan", match))
+        for key in list(self.values):
+            if match is None or fnmatch.fnmatchcase(key, match):
+                yield key
+
+    async def publish(self, channel, message):
+        self.published.append(message)
+        for subscriber in self.subscribers:
+            subscriber.put_nowait({"type": "message", "channel": channel, "data": message})
+        return len(self.subscribers)
+
+    async def script_load(self, script):
+        sha = hashlib.sha1(script).hexdigest()
+        self.scripts[sha] = script
+        return sha
+
+    async def evalsha(self, sha, numkeys, *keys_and_args):
+        if sha not in self.scripts:
+            raise NoScriptError("No matching script. Please use EVAL.")
+        keys, args = keys_and_args[:numkeys], keys_and_args[numkeys:]
+        if self.scripts[sha] == WRITE_ENTRY_SCRIPT.script:
+            return await self._write_entry(keys, args)
+        raise NotImplementedError("No Python equivalent for this script")
+
+    async def _write_entry(self, keys, args):
+        """redis_cache.WRITE_ENTRY_SCRIPT"""
+        version_key, entry_key, *tag_keys = keys
+        entry, offset, ttl_ms, now, stale_until, tag_ttl, channel, head, tail = args
+        version = await self.incr(version_key)
+        await self.set(entry_key, entry[:offset] + struct.pack(">Q", version) + entry[offset + 8:], px=ttl_ms)
+        for tag_key in tag_keys:
+            await self.zremrangebyscore(tag_key, "-inf", now)
+            await self.zadd(tag_key, {entry_key: stale_until})
+            await self.expire(tag_key, tag_ttl)
+        await self.publish(channel, f"{head}{version}{tail}")
+        return version
+
+    async def info(self):
+        return {"redis_version": "7.2.0"}
+
+    def pipeline(self, transaction=True):
+        return InMemoryPipeline(self)
+
+    def pubsub(self):
+        return InMemoryPubSub(self)
+
+
+class InMemoryPipeline:
+    """Queues commands and runs them against the InMemoryRedis on execute()"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        command = getattr(self.redis, name)
+        return lambda *args, **kwargs: self.calls.append((command, args, kwargs))
+
+    async def execute(self):
+        return [await command(*args, **kwargs) for command, args, kwargs in self.calls]
+
+
+class InMemoryPubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.redis.subscribers.append(self.queue)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        # Polls instead of wait_for(queue.get()), which can swallow a cancellation on 3.11
+        if self.queue.empty():
+            await asyncio.sleep(min(timeout, 0.01))
+            return None
+        return self.queue.get_nowait()
+
+    async def aclose(self):
+        if self.queue in self.redis.subscribers:
+            self.redis.subscribers.remove(self.queue)
+
+
+class StubManager:
+    """
+    Stands in for RedisConnectionManager with a fixed client (None: Redis is
+    down). Reported failures are recorded, or re-raised with raise_failures
+    so a test fails on an unexpected Redis error.
+    """
+
+    def __init__(self, client, raise_failures=False):
+        self.client = client
+        self.raise_failures = raise_failures
+        self.failures = []
+
+    @property
+    def connected(self):
+        return self.client is not None
+
+    async def connect(self):
+        return self.connected
+
+    async def disconnect(self):
+        pass
+
+    async def get_client(self):
+        return self.client
+
+    async def get_binary_client(self):
+        return self.client
+
+    def report_failure(self, error):
+        self.failures.append(error)
+        if self.raise_failures:
+            raise error
+
+    def health(self):
+        return {"connected": self.connected}
+
+
+def make_redis_cache(client, **manager_kwargs):
+    """RedisCache whose Redis is client (None for an L1-only cache)"""
+    cache = RedisCache()
+    cache.manager = StubManager(client, **manager_kwargs)
+    return cache
+
+
+def mock_habu_config(handler, **kwargs):
+    """HabuConfig with credentials whose requests all go to handler (sync or async)"""
+    config = HabuConfig(transport=httpx.MockTransport(handler), **kwargs)
+    config.client_id = "client"
+    config.client_secret = "secret"
+    return config
+
+
+def start_server(handler_class):
+    """Serve handler_class on a free local port from a daemon thread"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def stand_in_config(server, **kwargs):
+    """HabuConfig with credentials pointed at a stand-in server from start_server"""
+    config = HabuConfig(**kwargs)
+    config.base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    config.token_url = f"http://127.0.0.1:{server.server_port}/v1/oauth/token"
+    config.client_id = "client"
+    config.client_secret = "secret"
+    config.http2 = False
+    return config
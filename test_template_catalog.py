@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test the multi-cleanroom template catalog in habu_enhanced_templates
+Runs against an in-process stand-in for the Habu API
+"""
+import asyncio
+import importlib
+import json
+from contextlib import contextmanager
+import httpx
+from redis_cache import cache
+from utils.error_handling import RetryPolicy
+from test_support import mock_habu_config
+
+templates_module = importlib.import_module("tools.habu_enhanced_templates")
+
+CLEANROOMS = [{"id": "cr-a", "name": "Retail"}, {"id": "cr-b", "name": "Auto"}, {"id": "cr-c", "name": "Broken"}]
+QUESTIONS = {
+    "cr-a": [
+        {"id": "q-shared", "name": "Sentiment Analysis", "category": "Sentiment Analysis", "status": "MISSING_DATASETS"},
+        {"id": "q-a", "name": "Location Data", "category": "Location Data", "status": "READY"}
+    ],
+    "cr-b": [
+        {"id": "q-shared", "name": "Sentiment Analysis", "category": "Sentiment Analysis", "status": "READY"}
+    ]
+}
+
+
+def make_config(state):
+    """HabuConfig wired to a mock API with three cleanrooms, one of them failing"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path.endswith("/oauth/token"):
+            return httpx.Response(200, json={"accessToken": "token", "expiresIn": 3600})
+        if path.endswith("/cleanrooms"):
+            return httpx.Response(200, json=CLEANROOMS)
+        if path.endswith("/cleanroom-questions"):
+            cleanroom_id = path.split("/")[-2]
+            state.setdefault("question_calls", []).append(cleanroom_id)
+            if cleanroom_id not in QUESTIONS:
+                return httpx.Response(503)
+            return httpx.Response(200, json=QUESTIONS[cleanroom_id])
+        return httpx.Response(404)
+
+    config = mock_habu_config(handler)
+    # Failing cleanrooms fail once; retries are covered by test_retry_policy.py
+    config.retry_policy = RetryPolicy("test", max_attempts=1)
+    return config
+
+
+@contextmanager
+def patched_module(config, catalog):
+    """Point the templates tool at the stand-in API and a private catalog"""
+    original_config, original_catalog = templates_module.habu_config, templates_module.template_catalog
+    templates_module.habu_config, templates_module.template_catalog = config, catalog
+    # Cleanroom lists cached by another test's stand-in API
+    cache.local.clear()
+    try:
+        yield
+    finally:
+        templates_module.habu_config, templates_module.template_catalog = original_config, original_catalog
+
+
+async def fetch_catalog(config, catalog):
+    with patched_module(config, catalog):
+        return json.loads(await templates_module.habu_enhanced_templates(all_cleanrooms=True))
+
+
+def test_catalog_merges_and_tracks_provenance():
+    """Templates from every cleanroom are merged by id with per-cleanroom provenance"""
+    async def run():
+        state = {}
+        config = make_config(state)
+        result = await fetch_catalog(config, templates_module.TemplateCatalog())
+        await config.aclose()
+        return result, state
+
+    result, state = asyncio.run(run())
+    assert result["status"] == "success"
+    assert result["aggregated"] is True
+    assert result["count"] == 2
+    shared = next(t for t in result["templates"] if t["id"] == "q-shared")
+    assert [p["cleanroom_id"] for p in shared["available_in"]] == ["cr-a", "cr-b"]
+    assert shared["ready_to_execute"] is True
+    assert result["duplicates_merged"] == 1
+    assert result["categories"] == ["Location Data", "Sentiment Analysis"]
+    assert [f["cleanroom_id"] for f in result["failed_cleanrooms"]] == ["cr-c"]
+    assert sorted(state["question_calls"]) == ["cr-a", "cr-b", "cr-c"]
+
+
+def test_catalog_served_from_cache_and_refreshed_per_cleanroom():
+    """Fresh cleanrooms are not refetched; a stale one is refreshed on its own"""
+    async def run():
+        state = {}
+        config = make_config(state)
+        catalog = templates_module.TemplateCatalog(ttl=60, max_stale=60)
+        await fetch_catalog(config, catalog)
+        state["question_calls"] = []
+
+        # Second call: only the cleanroom that failed is retried
+        await fetch_catalog(config, catalog)
+        assert state["question_calls"] == ["cr-c"]
+
+        # Age one cleanroom past its TTL: stale data is served, then refreshed alone
+        state["question_calls"] = []
+        catalog._entries["cr-a"]["fetched_at"] -= 90
+        with patched_module(config, catalog):
+            result = json.loads(await templates_module.habu_enhanced_templates(all_cleanrooms=True))
+            assert result["count"] == 2
+            await catalog._refresh_task
+        assert sorted(state["question_calls"]) == ["cr-a", "cr-c"]
+        await config.aclose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    print("🧪 Testing aggregated template catalog")
+    test_catalog_merges_and_tracks_provenance()
+    test_catalog_served_from_cache_and_refreshed_per_cleanroom()
+    print("✅ All template catalog tests passed")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test typed tool results and single-pass serialization
+"""
+import asyncio
+import importlib
+import json
+import time
+from datetime import datetime
+from utils import tool_result
+from utils.tool_result import ToolResult, dumps, dumps_bytes
+
+status_module = importlib.import_module("tools.habu_check_status")
+
+
+def test_dumps_compact_and_pretty():
+    payload = {"status": "success", "count": 2, "items": [{"id": "a"}, {"id": "b"}]}
+    assert dumps(payload) == '{"status":"success","count":2,"items":[{"id":"a"},{"id":"b"}]}'
+    assert dumps(payload, pretty=True).startswith('{\n  "status": "success"')
+    assert json.loads(dumps_bytes(payload)) == payload
+
+
+def test_stdlib_fallback_matches():
+    payload = {"name": "Café", "when": datetime(2024, 1, 2), 3: "x"}
+    with_orjson = json.loads(dumps(payload))
+    original, tool_result.orjson = tool_result.orjson, None
+    try:
+        without_orjson = json.loads(dumps(payload))
+    finally:
+        tool_result.orjson = original
+    assert with_orjson["name"] == without_orjson["name"] == "Café"
+    assert with_orjson["3"] == without_orjson["3"] == "x"
+    assert with_orjson["when"].startswith("2024-01-02") and without_orjson["when"].startswith("2024-01-02")
+
+
+def test_tool_returns_result_and_mcp_wrapper_returns_string():
+    """The typed function is the source of truth; the string form is one dumps of it"""
+    async def fake_result(query_id):
+        return ToolResult({"status": "error", "query_id": query_id, "summary": "not found"})
+
+    original = status_module.habu_check_status_result
+    status_module.habu_check_status_result = fake_result
+    try:
+        text = asyncio.run(status_module.habu_check_status("q-1"))
+    finally:
+        status_module.habu_check_status_result = original
+    assert isinstance(text, str)
+    assert json.loads(text) == {"status": "error", "query_id": "q-1", "summary": "not found"}
+    assert not ToolResult(json.loads(text)).ok
+
+
+def measure_serialization(iterations=50):
+    """Old path (dumps indent → loads → dumps) against one compact dumps"""
+    catalog = ToolResult({
+        "status": "success",
+        "templates": [{"id": f"t-{i}", "name": f"Template {i}", "parameters": {"p": list(range(20))}}
+                      for i in range(2000)]
+    })
+    started = time.perf_counter()
+    for _ in range(iterations):
+        json.dumps(json.loads(json.dumps(catalog, indent=2)))
+    triple = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(iterations):
+        dumps_bytes(catalog)
+    single = time.perf_counter() - started
+    return triple, single
+
+
+if __name__ == "__main__":
+    print("🧪 Testing tool results and serialization")
+    test_dumps_compact_and_pretty()
+    test_stdlib_fallback_matches()
+    test_tool_returns_result_and_mcp_wrapper_returns_string()
+    print("✅ All tool result tests passed")
+
+    triple, single = measure_serialization()
+    print(f"\n📊 2000-template catalog x50")
+    print(f"   encode/decode/encode: {triple:.2f}s")
+    print(f"   single orjson pass:   {single:.2f}s")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test the in-process L1 tier in front of Redis in RedisCache
+"""
+import asyncio
+import time
+from utils.local_cache import LocalCache
+from test_support import InMemoryRedis, make_redis_cache
+
+
+def make_cache(client):
+    return make_redis_cache(client)
+
+
+def test_l1_serves_repeat_reads_without_redis_round_trips():
+    redis = InMemoryRedis()
+    cache = make_cache(redis)
+
+    async def scenario():
+        await cache.cache_api_response('partners_list', {"partners": ["a"]}, 'partner_data')
+        return [await cache.get_cached_response('partners_list') for _ in range(5)]
+
+    reads = asyncio.run(scenario())
+    assert all(r['cache_tier'] == 'l1' and r['data'] == {"partners": ["a"]} for r in reads)
+    assert redis.reads == []
+    # Decoded once: every hit shares the same data object
+    assert all(r['data'] is reads[0]['data'] for r in reads)
+    stats = cache.tier_stats()
+    assert stats['l1']['hits'] == 5 and stats['overall_hit_rate'] == 100.0
+
+
+def test_l2_hit_populates_l1():
+    redis = InMemoryRedis()
+    writer, reader = make_cache(redis), make_cache(redis)
+
+    async def scenario():
+        await writer.cache_api_response('templates_list', {"templates": [1, 2]}, 'template_data')
+        return await reader.get_cached_response('templates_list'), await reader.get_cached_response('templates_list')
+
+    first, second = asyncio.run(scenario())
+    assert first['cache_tier'] == 'l2' and second['cache_tier'] == 'l1'
+    assert len(redis.reads) == 1
+    stats = reader.tier_stats()
+    assert stats['l1']['hits'] == 1 and stats['l1']['misses'] == 1
+    assert stats['l2']['hits'] == 1 and stats['l2']['hit_rate'] == 100.0
+
+
+def test_same_ttl_policy_without_redis():
+    cache = make_cache(None)
+    cache.ttl_config['status_data'] = 0.05
+
+    async def scenario():
+        assert await cache.cache_api_response('status_q1', {"state": "RUNNING"}, 'status_data')
+        fresh = await cache.get_cached_response('status_q1')
+        await asyncio.sleep(0.1)
+        return fresh, await cache.get_cached_response('status_q1')
+
+    fresh, expired = asyncio.run(scenario())
+    assert fresh['data'] == {"state": "RUNNING"} and fresh['ttl'] == 0.05
+    assert expired is None
+
+
+def test_callers_cannot_corrupt_the_cached_envelope():
+    cache = make_cache(None)
+
+    async def scenario():
+        await cache.cache_api_response('partners_list', {"partners": []}, max_stale=60)
+        first = await cache.get_cached_response('partners_list')
+        first['stale'] = True
+        first['cache_hit'] = 'mutated'
+        return await cache.get_cached_response('partners_list')
+
+    entry = asyncio.run(scenario())
+    assert entry['stale'] is False and entry['cache_hit'] is True
+
+
+def test_local_cache_bounds():
+    local = LocalCache(max_entries=3, max_bytes=100)
+    for key in "abc":
+        local.set(key, key, ttl=60, size=10)
+    local.get("a")
+    local.set("d", "d", ttl=60, size=10)
+    # "b" was least recently used
+    assert "b" not in local and "a" in local and len(local) == 3
+
+    local.set("big", "x", ttl=60, size=90)
+    assert "big" in local and local.stats()["bytes"] <= 100
+    local.set("huge", "x", ttl=60, size=500)
+    assert "huge" not in local
+
+    local.set("short", 1, ttl=0.01, size=1)
+    time.sleep(0.02)
+    assert local.get("short") is None
+    assert local.stats()["expirations"] == 1
+
+    assert local.delete_matching("api:*") == 0
+    local.set("api:partners_x", 1, ttl=60)
+    assert local.delete_matching("api:partners_*") == 1
+
+
+if __name__ == "__main__":
+    print("🧪 Testing two-tier (L1 + Redis) cache")
+    test_l1_serves_repeat_reads_without_redis_round_trips()
+    test_l2_hit_populates_l1()
+    test_same_ttl_policy_without_redis()
+    test_callers_cannot_corrupt_the_cached_envelope()
+    test_local_cache_bounds()
+    print("✅ All two-tier cache tests passed")
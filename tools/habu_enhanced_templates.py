@@ -3,160 +3,176 @@ Enhanced Habu Templates Tool
 Uses the /cleanrooms/{cleanroom_id}/cleanroom-questions endpoint for richer template data
 """
 import httpx
-import json
-from typing import List, Dict, Any
+import os
+import time
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional, Tuple
 from config.habu_config import habu_config
+from utils.tool_result import ToolResult
+from utils.cleanrooms import list_cleanrooms
+from utils.concurrency import gather_limited
+from utils.rate_limiter import request_priority
+from utils.error_handling import habu_hedge_budget, with_hedging
 
-async def habu_enhanced_templates(cleanroom_id: str = None) -> str:
+logger = logging.getLogger(__name__)
+
+class TemplateCatalog:
+    """
+    Per-cleanroom cache of raw cleanroom-questions used by the aggregated catalog.
+    
+    Each cleanroom expires on its own. Missing (or too stale) cleanrooms are fetched
+    concurrently on demand; cleanrooms past their TTL keep being served while a single
+    background task refreshes them one cleanroom at a time.
+    """
+    
+    def __init__(self, ttl: float = 1800, max_stale: float = 1800):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+    
+    async def get_questions(self, cleanrooms: List[Dict[str, Any]],
+                            max_concurrency: int) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Get cached questions for the given cleanrooms, fetching any that are missing.
+        
+        Returns:
+            Tuple of ({cleanroom_id: entry}, [failed cleanrooms])
+        """
+        now = time.monotonic()
+        listed_ids = {c.get("id") for c in cleanrooms}
+        
+        # Forget cleanrooms that no longer exist
+        for cleanroom_id in list(self._entries):
+            if cleanroom_id not in listed_ids:
+                del self._entries[cleanroom_id]
+        
+        missing = []
+        stale = []
+        for cleanroom in cleanrooms:
+            entry = self._entries.get(cleanroom.get("id"))
+            age = now - entry["fetched_at"] if entry else None
+            if entry is None or age > self.ttl + self.max_stale:
+                missing.append(cleanroom)
+            elif age > self.ttl:
+                stale.append(cleanroom)
+        
+        failures = []
+        if missing:
+            outcomes = await gather_limited(missing, self._fetch, max_concurrency)
+            for outcome in outcomes:
+                if outcome["error"] is not None:
+                    error = outcome["error"]
+                    error_msg = f"HTTP error {error.response.status_code}" if isinstance(error, httpx.HTTPStatusError) else str(error)
+                    logger.warning(f"Failed to fetch templates for cleanroom {outcome['item'].get('id')}: {error_msg}")
+                    failures.append({
+                        "cleanroom_id": outcome["item"].get("id"),
+                        "cleanroom_name": outcome["item"].get("name", "Unknown"),
+                        "error": error_msg
+                    })
+        
+        if stale:
+            self._schedule_refresh(stale)
+        
+        entries = {c.get("id"): self._entries[c.get("id")] for c in cleanrooms if c.get("id") in self._entries}
+        return entries, failures
+    
+    def invalidate(self, cleanroom_id: Optional[str] = None):
+        """Drop one cleanroom (or the whole catalog) from the cache"""
+        if cleanroom_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(cleanroom_id, None)
+    
+    async def _fetch(self, cleanroom: Dict[str, Any]) -> Dict[str, Any]:
+        """Fetch one cleanroom's questions and store them"""
+        cleanroom_id = cleanroom.get("id")
+        questions = await habu_config.get_json(
+            f"/cleanrooms/{cleanroom_id}/cleanroom-questions",
+            timeout=30.0
+        )
+        entry = {
+            "cleanroom_id": cleanroom_id,
+            "cleanroom_name": cleanroom.get("name", "Unknown"),
+            "questions": questions if isinstance(questions, list) else [],
+            "fetched_at": time.monotonic()
+        }
+        self._entries[cleanroom_id] = entry
+        return entry
+    
+    def _schedule_refresh(self, cleanrooms: List[Dict[str, Any]]):
+        """Start the background refresh unless one is already running on this loop"""
+        task = self._refresh_task
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            return
+        self._refresh_task = asyncio.ensure_future(self._refresh_sequentially(cleanrooms))
+    
+    async def _refresh_sequentially(self, cleanrooms: List[Dict[str, Any]]):
+        """Refresh stale cleanrooms one at a time, keeping the old entry on failure"""
+        with request_priority("background"):
+            for cleanroom in cleanrooms:
+                try:
+                    await self._fetch(cleanroom)
+                except Exception as e:
+                    logger.warning(f"Background template refresh failed for cleanroom {cleanroom.get('id')}: {e}")
+
+# Global catalog instance
+template_catalog = TemplateCatalog(
+    ttl=float(os.getenv("HABU_TEMPLATE_CATALOG_TTL", "1800")),
+    max_stale=float(os.getenv("HABU_TEMPLATE_CATALOG_MAX_STALE", "1800"))
+)
+
+@with_hedging(habu_hedge_budget)
+async def habu_enhanced_templates_result(cleanroom_id: str = None, all_cleanrooms: bool = False) -> ToolResult:
     """
     Lists all available clean room questions (templates) with enhanced metadata
     from the Habu API using the /cleanroom-questions endpoint.
     
     Args:
         cleanroom_id: Specific cleanroom to get templates for. If None, uses default.
+        all_cleanrooms: Merge the templates of every cleanroom into one deduplicated
+            catalog, with the cleanrooms each template is available in.
     
     Returns:
-        str: JSON string containing enhanced template information
+        ToolResult: enhanced template information
     """
     try:
-        headers = await habu_config.get_auth_headers()
+        if all_cleanrooms:
+            return ToolResult(await _aggregate_catalog())
         
-        async with httpx.AsyncClient() as client:
-            # If no cleanroom_id provided, get the first available cleanroom
-            if not cleanroom_id:
-                cleanrooms_response = await client.get(
-                    f"{habu_config.base_url}/cleanrooms",
-                    headers=headers,
-                    timeout=30.0
-                )
-                
-                if cleanrooms_response.status_code == 401:
-                    habu_config.reset_token()
-                    headers = await habu_config.get_auth_headers()
-                    cleanrooms_response = await client.get(
-                        f"{habu_config.base_url}/cleanrooms",
-                        headers=headers,
-                        timeout=30.0
-                    )
-                
-                cleanrooms_response.raise_for_status()
-                cleanrooms_data = cleanrooms_response.json()
-                
-                if isinstance(cleanrooms_data, list) and cleanrooms_data:
-                    cleanroom_id = cleanrooms_data[0].get("id")
-                else:
-                    return json.dumps({
-                        "status": "error",
-                        "error": "No cleanrooms available",
-                        "summary": "No cleanrooms found to retrieve templates from"
-                    })
-            
-            # Get enhanced templates using the cleanroom-questions endpoint
-            response = await client.get(
-                f"{habu_config.base_url}/cleanrooms/{cleanroom_id}/cleanroom-questions",
-                headers=headers,
-                timeout=30.0
-            )
-            
-            if response.status_code == 401:
-                habu_config.reset_token()
-                headers = await habu_config.get_auth_headers()
-                response = await client.get(
-                    f"{habu_config.base_url}/cleanrooms/{cleanroom_id}/cleanroom-questions",
-                    headers=headers,
-                    timeout=30.0
-                )
-            
-            response.raise_for_status()
-            templates_data = response.json()
-            
-            # Process and structure the enhanced template data
-            enhanced_templates = []
-            categories = set()
-            question_types = set()
-            
-            if isinstance(templates_data, list):
-                for template in templates_data:
-                    # Get basic template data
-                    name = template.get("name", "Unknown Template")
-                    category = template.get("category", "General Analytics")
-                    status = template.get("status", "UNKNOWN")
-                    data_types = template.get("dataTypes", {})
-                    parameters = template.get("parameters", {})
-                    
-                    # Enhance parameter information based on template category and name
-                    enhanced_parameters = _enhance_parameters(name, category, parameters)
-                    
-                    # Enhance data types based on category
-                    enhanced_data_types = _enhance_data_types(category, data_types)
-                    
-                    # Extract and structure the enhanced fields
-                    enhanced_template = {
-                        "id": template.get("id"),
-                        "name": name,
-                        "displayId": template.get("displayId"),
-                        "description": template.get("description", _generate_description(name, category)),
-                        "category": category,
-                        "questionType": template.get("questionType", "ANALYTICAL"),
-                        "status": status,
-                        "createdOn": template.get("createdOn"),
-                        "dataTypes": enhanced_data_types,
-                        "parameters": enhanced_parameters,
-                        "dimension": template.get("dimension", "standard"),
-                        "cleanroom_id": cleanroom_id,
-                        # Enhanced business intelligence fields
-                        "is_active": status in ["ACTIVE", "READY"],
-                        "ready_to_execute": status == "READY",
-                        "setup_required": status == "MISSING_DATASETS",
-                        "parameter_count": len(enhanced_parameters.get("details", [])),
-                        "supported_data_types": len(enhanced_data_types) if isinstance(enhanced_data_types, (list, dict)) else 0,
-                        "complexity_level": _assess_complexity(name, category),
-                        "estimated_runtime": _estimate_runtime(name, category)
-                    }
-                    
-                    enhanced_templates.append(enhanced_template)
-                    categories.add(category)
-                    question_types.add(template.get("questionType", "ANALYTICAL"))
-            
-            # Calculate enhanced business intelligence summary
-            ready_templates = len([t for t in enhanced_templates if t.get("status") == "READY"])
-            missing_datasets = len([t for t in enhanced_templates if t.get("status") == "MISSING_DATASETS"])
-            active_templates = len([t for t in enhanced_templates if t.get("is_active")])
-            
-            # Enhanced parameter analysis
-            total_parameters = sum(len(t.get("parameters", {})) for t in enhanced_templates)
-            avg_parameters = total_parameters / len(enhanced_templates) if enhanced_templates else 0
-            
-            # Create enhanced summary with business intelligence
-            summary_data = {
-                "status": "success",
-                "count": len(enhanced_templates),
-                "templates": enhanced_templates,
-                "summary": f"Found {len(enhanced_templates)} enhanced query templates with detailed metadata",
-                "categories": list(categories),
-                "question_types": list(question_types),
-                "cleanroom_id": cleanroom_id,
-                "active_templates": active_templates,
-                "ready_templates": ready_templates,
-                "missing_datasets_templates": missing_datasets,
-                "total_parameters": total_parameters,
-                "avg_parameters_per_template": round(avg_parameters, 1),
-                "enhancement_features": {
-                    "parameter_metadata": True,
-                    "data_type_specifications": True,
-                    "categorization": True,
-                    "status_tracking": True,
-                    "display_ids": True,
-                    "business_intelligence": True,
-                    "real_api_integration": True
-                }
-            }
-            
-            return json.dumps(summary_data, indent=2)
+        # If no cleanroom_id provided, get the first available cleanroom
+        if not cleanroom_id:
+            cleanrooms_data = await list_cleanrooms(habu_config)
             
+            if isinstance(cleanrooms_data, list) and cleanrooms_data:
+                cleanroom_id = cleanrooms_data[0].get("id")
+            else:
+                return ToolResult({
+                    "status": "error",
+                    "error": "No cleanrooms available",
+                    "summary": "No cleanrooms found to retrieve templates from"
+                })
+        
+        # Get enhanced templates using the cleanroom-questions endpoint
+        templates_data = await habu_config.get_json(
+            f"/cleanrooms/{cleanroom_id}/cleanroom-questions",
+            timeout=30.0
+        )
+        
+        # Process and structure the enhanced template data
+        enhanced_templates = []
+        if isinstance(templates_data, list):
+            enhanced_templates = [_enhance_template(template, cleanroom_id) for template in templates_data]
+        
+        summary_data = _build_summary(enhanced_templates)
+        summary_data["cleanroom_id"] = cleanroom_id
+        
+        return ToolResult(summary_data)
+        
     except httpx.HTTPStatusError as e:
         error_msg = f"HTTP error {e.response.status_code}: {e.response.text}"
-        return json.dumps({
+        return ToolResult({
             "status": "error",
             "error": error_msg,
             "summary": f"Failed to retrieve enhanced templates from Habu API: {error_msg}",
@@ -164,13 +180,151 @@ async def habu_enhanced_templates(cleanroom_id: str = None) -> str:
         })
     except Exception as e:
         error_msg = str(e)
-        return json.dumps({
+        return ToolResult({
             "status": "error",
             "error": error_msg,
             "summary": f"An error occurred while fetching enhanced templates: {error_msg}",
             "cleanroom_id": cleanroom_id
         })
 
+async def habu_enhanced_templates(cleanroom_id: str = None, all_cleanrooms: bool = False) -> str:
+    """JSON string form of habu_enhanced_templates_result, for the MCP boundary"""
+    return (await habu_enhanced_templates_result(cleanroom_id, all_cleanrooms)).to_json()
+
+async def _aggregate_catalog() -> Dict[str, Any]:
+    """Build one deduplicated template catalog across all cleanrooms"""
+    cleanrooms_data = await list_cleanrooms(habu_config)
+    cleanrooms = [c for c in cleanrooms_data if c.get("id")] if isinstance(cleanrooms_data, list) else []
+    
+    entries, failed_cleanrooms = await template_catalog.get_questions(cleanrooms, habu_config.fanout_concurrency)
+    
+    # Merge templates, keeping track of every cleanroom a template is available in
+    merged: Dict[Any, Dict[str, Any]] = {}
+    cleanroom_summaries = []
+    now = time.monotonic()
+    for cleanroom in cleanrooms:
+        entry = entries.get(cleanroom.get("id"))
+        if entry is None:
+            continue
+        cleanroom_summaries.append({
+            "cleanroom_id": entry["cleanroom_id"],
+            "cleanroom_name": entry["cleanroom_name"],
+            "template_count": len(entry["questions"]),
+            "age_seconds": round(now - entry["fetched_at"], 1)
+        })
+        for template in entry["questions"]:
+            enhanced = _enhance_template(template, entry["cleanroom_id"])
+            provenance = {
+                "cleanroom_id": entry["cleanroom_id"],
+                "cleanroom_name": entry["cleanroom_name"],
+                "status": enhanced["status"],
+                "ready_to_execute": enhanced["ready_to_execute"]
+            }
+            key = enhanced["id"] or (enhanced["name"], enhanced["category"])
+            existing = merged.get(key)
+            if existing is None:
+                enhanced["available_in"] = [provenance]
+                merged[key] = enhanced
+            else:
+                existing["available_in"].append(provenance)
+                # A template is runnable if it is ready in any cleanroom
+                if enhanced["ready_to_execute"] and not existing["ready_to_execute"]:
+                    existing.update({k: enhanced[k] for k in ("status", "is_active", "ready_to_execute", "setup_required")})
+    
+    templates = list(merged.values())
+    summary_data = _build_summary(templates)
+    summary_data["summary"] = (
+        f"Found {len(templates)} unique query templates across {len(cleanroom_summaries)} cleanrooms"
+        + (f" ({len(failed_cleanrooms)} cleanroom(s) could not be loaded)" if failed_cleanrooms else "")
+    )
+    summary_data.update({
+        "aggregated": True,
+        "cleanroom_id": None,
+        "cleanroom_count": len(cleanrooms),
+        "cleanrooms": cleanroom_summaries,
+        "failed_cleanrooms": failed_cleanrooms,
+        "duplicates_merged": sum(len(t["available_in"]) - 1 for t in templates)
+    })
+    return summary_data
+
+def _enhance_template(template: Dict[str, Any], cleanroom_id: str) -> Dict[str, Any]:
+    """Turn a raw cleanroom question into an enhanced template record"""
+    # Get basic template data
+    name = template.get("name", "Unknown Template")
+    category = template.get("category", "General Analytics")
+    status = template.get("status", "UNKNOWN")
+    data_types = template.get("dataTypes", {})
+    parameters = template.get("parameters", {})
+    
+    # Enhance parameter information based on template category and name
+    enhanced_parameters = _enhance_parameters(name, category, parameters)
+    
+    # Enhance data types based on category
+    enhanced_data_types = _enhance_data_types(category, data_types)
+    
+    # Extract and structure the enhanced fields
+    return {
+        "id": template.get("id"),
+        "name": name,
+        "displayId": template.get("displayId"),
+        "description": template.get("description", _generate_description(name, category)),
+        "category": category,
+        "questionType": template.get("questionType", "ANALYTICAL"),
+        "status": status,
+        "createdOn": template.get("createdOn"),
+        "dataTypes": enhanced_data_types,
+        "parameters": enhanced_parameters,
+        "dimension": template.get("dimension", "standard"),
+        "cleanroom_id": cleanroom_id,
+        # Enhanced business intelligence fields
+        "is_active": status in ["ACTIVE", "READY"],
+        "ready_to_execute": status == "READY",
+        "setup_required": status == "MISSING_DATASETS",
+        "parameter_count": len(enhanced_parameters.get("details", [])),
+        "supported_data_types": len(enhanced_data_types) if isinstance(enhanced_data_types, (list, dict)) else 0,
+        "complexity_level": _assess_complexity(name, category),
+        "estimated_runtime": _estimate_runtime(name, category)
+    }
+
+def _build_summary(enhanced_templates: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the response envelope with business intelligence totals"""
+    categories = {t["category"] for t in enhanced_templates}
+    question_types = {t["questionType"] for t in enhanced_templates}
+    
+    # Calculate enhanced business intelligence summary
+    ready_templates = len([t for t in enhanced_templates if t.get("status") == "READY"])
+    missing_datasets = len([t for t in enhanced_templates if t.get("status") == "MISSING_DATASETS"])
+    active_templates = len([t for t in enhanced_templates if t.get("is_active")])
+    
+    # Enhanced parameter analysis
+    total_parameters = sum(len(t.get("parameters", {})) for t in enhanced_templates)
+    avg_parameters = total_parameters / len(enhanced_templates) if enhanced_templates else 0
+    
+    # Create enhanced summary with business intelligence
+    return {
+        "status": "success",
+        "count": len(enhanced_templates),
+        "templates": enhanced_templates,
+        "summary": f"Found {len(enhanced_templates)} enhanced query templates with detailed metadata",
+        # Sorted so identical catalogs serialize (and hash to an ETag) identically
+        "categories": sorted(categories, key=str),
+        "question_types": sorted(question_types, key=str),
+        "active_templates": active_templates,
+        "ready_templates": ready_templates,
+        "missing_datasets_templates": missing_datasets,
+        "total_parameters": total_parameters,
+        "avg_parameters_per_template": round(avg_parameters, 1),
+        "enhancement_features": {
+            "parameter_metadata": True,
+            "data_type_specifications": True,
+            "categorization": True,
+            "status_tracking": True,
+            "display_ids": True,
+            "business_intelligence": True,
+            "real_api_integration": True
+        }
+    }
+
 def _enhance_parameters(name: str, category: str, original_params: dict) -> dict:
     """Enhance parameter information based on template characteristics"""
     # If parameters exist, structure them better
@@ -286,9 +440,13 @@ def _estimate_runtime(name: str, category: str) -> str:
     return runtime_map.get(complexity, "5-10 minutes")
 
 # Backward compatibility function
-async def habu_list_templates() -> str:
+async def habu_list_templates_result() -> ToolResult:
     """
     Backward compatibility wrapper for the enhanced templates function.
     This maintains compatibility with existing code while providing enhanced data.
     """
-    return await habu_enhanced_templates()
\ No newline at end of file
+    return await habu_enhanced_templates_result()
+
+async def habu_list_templates() -> str:
+    """JSON string form of habu_list_templates_result, for the MCP boundary"""
+    return (await habu_list_templates_result()).to_json()
\ No newline at end of file
@@ -3,12 +3,14 @@ Habu Get Results Tool
 Fetches final results from a completed clean room query
 """
 import httpx
-import json
 import os
 from typing import Dict, Any, Optional
 from config.habu_config import habu_config
+from utils.tool_result import ToolResult
+from utils.error_handling import habu_hedge_budget, with_hedging
 
-async def habu_get_results(query_id: str, format_type: Optional[str] = "json") -> str:
+@with_hedging(habu_hedge_budget)
+async def habu_get_results_result(query_id: str, format_type: Optional[str] = "json") -> ToolResult:
     """
     Retrieves the results of a completed clean room query.
     
@@ -17,56 +19,39 @@ async def habu_get_results(query_id: str, format_type: Optional[str] = "json") -
         format_type (str, optional): Format for results ("json", "csv", "summary")
     
     Returns:
-        str: JSON string containing query results and analysis
+        ToolResult: query results and analysis
     """
     # Check if mock mode is enabled
     
     try:
-        headers = await habu_config.get_auth_headers()
+        # Get query results from the Habu API
+        results_data = await habu_config.get_json(
+            f"/queries/{query_id}/results",
+            timeout=60.0  # Longer timeout for potentially large result sets
+        )
+        
+        # Extract and analyze results
+        raw_results = results_data.get("results", results_data)
+        metadata = results_data.get("metadata", {})
+        record_count = metadata.get("record_count") or len(raw_results) if isinstance(raw_results, list) else 1
+        
+        # Generate business-friendly summary
+        summary_text = _generate_results_summary(raw_results, metadata, query_id)
+        
+        # Prepare the structured response
+        summary = {
+            "status": "success",
+            "query_id": query_id,
+            "record_count": record_count,
+            "metadata": metadata,
+            "results": raw_results,
+            "business_summary": summary_text,
+            "format": format_type,
+            "summary": f"Retrieved {record_count} result records for query {query_id}. {summary_text[:100]}..."
+        }
+        
+        return ToolResult(summary)
         
-        async with httpx.AsyncClient() as client:
-            # Get query results from the Habu API
-            response = await client.get(
-                f"{habu_config.base_url}/queries/{query_id}/results",
-                headers=headers,
-                timeout=60.0  # Longer timeout for potentially large result sets
-            )
-            
-            if response.status_code == 401:
-                # Token might be expired, reset and retry
-                habu_config.reset_token()
-                headers = await habu_config.get_auth_headers()
-                response = await client.get(
-                    f"{habu_config.base_url}/queries/{query_id}/results",
-                    headers=headers,
-                    timeout=60.0
-                )
-            
-            response.raise_for_status()
-            results_data = response.json()
-            
-            # Extract and analyze results
-            raw_results = results_data.get("results", results_data)
-            metadata = results_data.get("metadata", {})
-            record_count = metadata.get("record_count") or len(raw_results) if isinstance(raw_results, list) else 1
-            
-            # Generate business-friendly summary
-            summary_text = _generate_results_summary(raw_results, metadata, query_id)
-            
-            # Prepare the structured response
-            summary = {
-                "status": "success",
-                "query_id": query_id,
-                "record_count": record_count,
-                "metadata": metadata,
-                "results": raw_results,
-                "business_summary": summary_text,
-                "format": format_type,
-                "summary": f"Retrieved {record_count} result records for query {query_id}. {summary_text[:100]}..."
-            }
-            
-            return json.dumps(summary, indent=2)
-            
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
             error_msg = f"Results for query {query_id} not found or query not completed"
@@ -75,7 +60,7 @@ async def habu_get_results(query_id: str, format_type: Optional[str] = "json") -
         else:
             error_msg = f"HTTP error {e.response.status_code}: {e.response.text}"
         
-        return json.dumps({
+        return ToolResult({
             "status": "error",
             "error": error_msg,
             "query_id": query_id,
@@ -83,13 +68,17 @@ async def habu_get_results(query_id: str, format_type: Optional[str] = "json") -
         })
     except Exception as e:
         error_msg = str(e)
-        return json.dumps({
+        return ToolResult({
             "status": "error",
             "error": error_msg,
             "query_id": query_id,
             "summary": f"An error occurred while retrieving query results: {error_msg}"
         })
 
+async def habu_get_results(query_id: str, format_type: Optional[str] = "json") -> str:
+    """JSON string form of habu_get_results_result, for the MCP boundary"""
+    return (await habu_get_results_result(query_id, format_type)).to_json()
+
 def _generate_results_summary(results: Any, metadata: Dict[str, Any], query_id: str) -> str:
     """
     Generate a business-friendly summary of query results.
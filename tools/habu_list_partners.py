@@ -3,14 +3,15 @@ Habu List Partners Tool
 Returns a list of clean room partners available through the Habu API
 """
 import httpx
-import json
 import os
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from config.habu_config import habu_config
+from utils.tool_result import ToolResult
+from utils.cleanrooms import list_cleanrooms
+from utils.concurrency import gather_limited
 from utils.error_handling import (
-    retry_async, 
-    format_error_response, 
+    error_result,
     APIError, 
     NetworkError,
     habu_api_circuit_breaker,
@@ -19,91 +20,120 @@ from utils.error_handling import (
 
 logger = logging.getLogger(__name__)
 
-@retry_async(max_retries=3, delay=1.0)
+async def _fetch_cleanroom_partners(cleanroom: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Fetch the partners of one cleanroom, tagged with the cleanroom they belong to"""
+    cleanroom_id = cleanroom.get("id")
+    partners_data = await habu_config.get_json(
+        f"/cleanrooms/{cleanroom_id}/partners",
+        timeout=30.0
+    )
+    if not isinstance(partners_data, list):
+        return []
+    return [
+        {**partner, "cleanroom_id": cleanroom_id, "cleanroom_name": cleanroom.get("name", "Unknown")}
+        for partner in partners_data
+    ]
+
 @with_circuit_breaker(habu_api_circuit_breaker)
-async def habu_list_partners() -> str:
+async def habu_list_partners_result(max_concurrency: Optional[int] = None) -> ToolResult:
     """
     Lists all available clean room partners from the Habu API.
     
+    Partners are fetched for all cleanrooms concurrently. A cleanroom that fails
+    is reported in failed_cleanrooms instead of failing the whole listing.
+    
+    Args:
+        max_concurrency (int, optional): Cap on concurrent per-cleanroom requests
+            (defaults to HABU_FANOUT_CONCURRENCY)
+    
     Returns:
-        str: JSON string containing partner information
+        ToolResult: partner information
     """
     # Check if mock mode is enabled
     
     try:
         logger.info("Fetching partners from Habu API")
-        headers = await habu_config.get_auth_headers()
+        # First get cleanrooms, then get partners for each cleanroom
+        cleanrooms_data = await list_cleanrooms(habu_config)
+        
+        cleanrooms = [c for c in cleanrooms_data if c.get("id")] if isinstance(cleanrooms_data, list) else []
+        cleanroom_count = len(cleanrooms_data) if isinstance(cleanrooms_data, list) else 0
+        
+        # Get all partners from all cleanrooms concurrently
+        outcomes = await gather_limited(
+            cleanrooms,
+            _fetch_cleanroom_partners,
+            max_concurrency or habu_config.fanout_concurrency
+        )
+        
+        all_partners = []
+        cleanroom_timings = []
+        failed_cleanrooms = []
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # First get cleanrooms, then get partners for each cleanroom
-            response = await client.get(
-                f"{habu_config.base_url}/cleanrooms",
-                headers=headers,
-                timeout=30.0
-            )
-            
-            if response.status_code == 401:
-                logger.warning("Authentication failed, refreshing token")
-                # Token might be expired, reset and retry
-                habu_config.reset_token()
-                headers = await habu_config.get_auth_headers()
-                response = await client.get(
-                    f"{habu_config.base_url}/cleanrooms",
-                    headers=headers
-                )
-            
-            response.raise_for_status()
-            cleanrooms_data = response.json()
-            
-            # Get all partners from all cleanrooms
-            all_partners = []
-            
-            if isinstance(cleanrooms_data, list):
-                for cleanroom in cleanrooms_data:
-                    cleanroom_id = cleanroom.get("id")
-                    if cleanroom_id:
-                        # Get partners for this cleanroom
-                        partner_response = await client.get(
-                            f"{habu_config.base_url}/cleanrooms/{cleanroom_id}/partners",
-                            headers=headers,
-                            timeout=30.0
-                        )
-                        if partner_response.status_code == 200:
-                            partners_data = partner_response.json()
-                            if isinstance(partners_data, list):
-                                for partner in partners_data:
-                                    partner["cleanroom_id"] = cleanroom_id
-                                    partner["cleanroom_name"] = cleanroom.get("name", "Unknown")
-                                all_partners.extend(partners_data)
-            
-            # Create a summary for the LLM agent
-            if all_partners:
-                summary = {
-                    "status": "success",
-                    "count": len(all_partners),
-                    "partners": all_partners,
-                    "summary": f"Found {len(all_partners)} clean room partners across {len(cleanrooms_data) if isinstance(cleanrooms_data, list) else 0} cleanrooms."
-                }
+        for outcome in outcomes:
+            cleanroom = outcome["item"]
+            timing = {
+                "cleanroom_id": cleanroom.get("id"),
+                "cleanroom_name": cleanroom.get("name", "Unknown"),
+                "elapsed_ms": outcome["elapsed_ms"]
+            }
+            if outcome["error"] is None:
+                all_partners.extend(outcome["result"])
+                timing["status"] = "success"
+                timing["partner_count"] = len(outcome["result"])
             else:
-                summary = {
-                    "status": "success",
-                    "count": 0,
-                    "partners": [],
-                    "summary": f"No clean room partners found. You have {len(cleanrooms_data) if isinstance(cleanrooms_data, list) else 0} cleanrooms available."
-                }
-            
-            logger.info(f"Successfully retrieved {len(all_partners)} partners")
-            return json.dumps(summary, indent=2)
-            
+                error = outcome["error"]
+                if isinstance(error, httpx.HTTPStatusError):
+                    error_msg = f"HTTP error {error.response.status_code}"
+                else:
+                    error_msg = str(error) or type(error).__name__
+                logger.warning(f"Failed to fetch partners for cleanroom {timing['cleanroom_id']}: {error_msg}")
+                timing["status"] = "error"
+                timing["error"] = error_msg
+                failed_cleanrooms.append({
+                    "cleanroom_id": timing["cleanroom_id"],
+                    "cleanroom_name": timing["cleanroom_name"],
+                    "error": error_msg
+                })
+            cleanroom_timings.append(timing)
+        
+        # Create a summary for the LLM agent
+        if all_partners:
+            summary = {
+                "status": "success",
+                "count": len(all_partners),
+                "partners": all_partners,
+                "summary": f"Found {len(all_partners)} clean room partners across {cleanroom_count} cleanrooms."
+            }
+        else:
+            summary = {
+                "status": "success",
+                "count": 0,
+                "partners": [],
+                "summary": f"No clean room partners found. You have {cleanroom_count} cleanrooms available."
+            }
+        
+        if failed_cleanrooms:
+            summary["summary"] += f" Partners could not be loaded for {len(failed_cleanrooms)} cleanroom(s)."
+        summary["failed_cleanrooms"] = failed_cleanrooms
+        summary["cleanroom_timings"] = cleanroom_timings
+        
+        logger.info(f"Successfully retrieved {len(all_partners)} partners")
+        return ToolResult(summary)
+        
     except httpx.HTTPStatusError as e:
         logger.error(f"HTTP error fetching partners: {e.response.status_code}")
         error = APIError(f"HTTP error {e.response.status_code}: {e.response.text}", e.response.status_code)
-        return format_error_response(error)
+        return error_result(error)
     except httpx.TimeoutException as e:
         logger.error("Timeout fetching partners from Habu API")
         error = NetworkError("Request timeout while fetching partners")
-        return format_error_response(error)
+        return error_result(error)
     except Exception as e:
         logger.error(f"Unexpected error fetching partners: {e}")
         error = APIError(f"An error occurred while fetching partners: {str(e)}")
-        return format_error_response(error)
\ No newline at end of file
+        return error_result(error)
+
+async def habu_list_partners(max_concurrency: Optional[int] = None) -> str:
+    """JSON string form of habu_list_partners_result, for the MCP boundary"""
+    return (await habu_list_partners_result(max_concurrency)).to_json()
\ No newline at end of file
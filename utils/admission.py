@@ -0,0 +1,193 @@
+"""
+Admission control for expensive endpoints (load shedding in front of a downstream)
+
+Each downstream gets a limiter with a fixed number of concurrent slots and a
+bounded FIFO wait queue. A request that finds the queue full is rejected at
+once, and one that can't get a slot within the queue-time SLO is rejected when
+the SLO runs out, so an overloaded endpoint answers 503 + Retry-After quickly
+instead of piling up work. Endpoints that don't go through a limiter (health,
+cached catalogs) are unaffected.
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+
+from utils.error_handling import OverloadedError
+from utils.latency_tracker import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+class AdmissionController:
+    """
+    Concurrency limiter with a bounded wait queue and a queue-time SLO.
+
+    State is per worker process and lives on the serving event loop (the
+    Flask bridge loop or the ASGI worker loop). A released slot is handed
+    straight to the oldest waiter, so queued requests are served in order.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int,
+                 max_queue_wait: float, max_retry_after: float = 60.0):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_queue_wait = max_queue_wait
+        self.max_retry_after = max_retry_after
+
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.wait_times = LatencyHistogram()
+        self.service_times = LatencyHistogram()
+        self.admitted = 0
+        self.queued = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.peak_queue_depth = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Hold a slot for the duration of the block.
+
+        Raises:
+            OverloadedError: If the queue is full or no slot frees up within max_queue_wait
+        """
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.service_times.observe(time.monotonic() - started)
+            self.release()
+
+    async def acquire(self):
+        """Take a slot, waiting in the queue for at most max_queue_wait"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._rebind(loop)
+
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            self.wait_times.observe(0.0)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.shed_queue_full += 1
+            retry_after = self.retry_after()
+            logger.warning(f"🚦 {self.name} admission: queue full ({self.max_queue}), shedding request")
+            raise OverloadedError(f"{self.name} is overloaded, try again later", retry_after=retry_after)
+
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, len(self._waiters))
+        started = time.monotonic()
+        try:
+            # The slot is handed over by release(); the waiter's result means we own it
+            await asyncio.wait_for(waiter, self.max_queue_wait)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.shed_timeout += 1
+            self.wait_times.observe(time.monotonic() - started)
+            logger.warning(f"🚦 {self.name} admission: no slot within {self.max_queue_wait:.1f}s, shedding request")
+            raise OverloadedError(f"{self.name} is overloaded, try again later", retry_after=self.retry_after())
+        except asyncio.CancelledError:
+            self._discard(waiter)
+            if waiter.done() and not waiter.cancelled():
+                # Cancelled after the slot was handed over: pass it on
+                self.release()
+            raise
+        self.admitted += 1
+        self.wait_times.observe(time.monotonic() - started)
+
+    def release(self):
+        """Give the slot to the oldest waiter, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight = max(0, self.in_flight - 1)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue should have drained (median service time based)"""
+        median = self.service_times.percentile(50)
+        if median is None:
+            estimate = self.max_queue_wait
+        else:
+            estimate = median * (len(self._waiters) + 1) / self.max_concurrency
+        return int(min(self.max_retry_after, max(1, math.ceil(estimate))))
+
+    def _discard(self, waiter: asyncio.Future):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _rebind(self, loop: asyncio.AbstractEventLoop):
+        """Start over on a new serving loop; waiters on a finished loop can never be woken"""
+        if self._waiters:
+            logger.info(f"{self.name} admission: event loop changed, dropping {len(self._waiters)} stale waiters")
+        self._waiters.clear()
+        self.in_flight = 0
+        self._loop = loop
+
+    def stats(self) -> Dict[str, Any]:
+        """Slots, queue depth and queue wait percentiles for this worker"""
+        def ms(seconds: Optional[float]) -> Optional[float]:
+            return round(seconds * 1000, 1) if seconds is not None else None
+
+        requests = self.admitted + self.shed_queue_full + self.shed_timeout
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "max_queue_wait_seconds": self.max_queue_wait,
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "peak_queue_depth": self.peak_queue_depth,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+            "shed_rate": round(((self.shed_queue_full + self.shed_timeout) / requests) * 100, 2) if requests else 0.0,
+            "queue_wait_ms": {
+                "p50": ms(self.wait_times.percentile(50)),
+                "p95": ms(self.wait_times.percentile(95)),
+                "p99": ms(self.wait_times.percentile(99))
+            },
+            "service_time_ms": {
+                "p50": ms(self.service_times.percentile(50)),
+                "p95": ms(self.service_times.percentile(95))
+            }
+        }
+
+# Global limiters, one per downstream the chat endpoint spends its time in
+admission_controllers = {
+    "openai": AdmissionController(
+        "openai",
+        max_concurrency=int(os.getenv("OPENAI_CHAT_MAX_CONCURRENCY", "8")),
+        max_queue=int(os.getenv("OPENAI_CHAT_MAX_QUEUE", "16")),
+        max_queue_wait=float(os.getenv("OPENAI_CHAT_MAX_QUEUE_WAIT", "5"))
+    ),
+    "habu": AdmissionController(
+        "habu",
+        max_concurrency=int(os.getenv("HABU_CHAT_MAX_CONCURRENCY", "16")),
+        max_queue=int(os.getenv("HABU_CHAT_MAX_QUEUE", "32")),
+        max_queue_wait=float(os.getenv("HABU_CHAT_MAX_QUEUE_WAIT", "5"))
+    )
+}
+
+def admission_stats() -> Dict[str, Any]:
+    return {name: controller.stats() for name, controller in admission_controllers.items()}
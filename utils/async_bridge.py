@@ -0,0 +1,110 @@
+"""
+Persistent background event loop for calling async code from sync (Flask) handlers
+"""
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class BackgroundLoop:
+    """
+    One long-lived asyncio loop running in a daemon thread.
+
+    Sync code submits coroutines with run(); everything bound to the loop
+    (the shared Habu HTTP client, the Redis client, in-flight request
+    coalescing, token refresh) lives across requests instead of being thrown
+    away with a per-request loop. The loop is restarted lazily after a fork,
+    since threads do not survive it (e.g. gunicorn --preload).
+    """
+
+    def __init__(self, name: str = "async-bridge"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The running loop, started on first use (and again after a fork)"""
+        if self._loop is None or self._pid != os.getpid() or not self._loop.is_running():
+            with self._lock:
+                if self._loop is None or self._pid != os.getpid() or not self._loop.is_running():
+                    self._start()
+        return self._loop
+
+    def _start(self):
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run_forever():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(started.set)
+            loop.run_forever()
+
+        self._thread = threading.Thread(target=run_forever, name=self.name, daemon=True)
+        self._thread.start()
+        started.wait()
+        self._loop = loop
+        self._pid = os.getpid()
+        logger.info(f"Started background event loop '{self.name}' (pid {self._pid})")
+
+    def submit(self, coro: Awaitable[Any]) -> concurrent.futures.Future:
+        """Schedule a coroutine on the loop and return a thread-safe future"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        self.submitted += 1
+        future.add_done_callback(self._on_done)
+        return future
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and block the calling thread for its result"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def _on_done(self, future: concurrent.futures.Future):
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the loop and wait for its thread"""
+        loop, thread = self._loop, self._thread
+        if loop is None or self._pid != os.getpid():
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout)
+        loop.close()
+        self._loop = None
+        self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Loop state and submission counters"""
+        running = self._loop is not None and self._pid == os.getpid() and self._loop.is_running()
+        return {
+            "running": running,
+            "pid": self._pid,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "in_flight": self.submitted - self.completed - self.failed
+        }
+
+# Global loop shared by all Flask handlers in this worker process
+bridge_loop = BackgroundLoop()
+
+def run_async(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on the shared background loop from sync code"""
+    return bridge_loop.run(coro, timeout)
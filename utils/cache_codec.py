@@ -0,0 +1,170 @@
+"""
+Compact binary encoding of RedisCache entries
+
+An entry is stored as a fixed binary header (format, serializer, compressor,
+cache type, created_at in microseconds, version) followed by the serialized
+remainder of the envelope, compressed when it is large. The serializer
+(msgpack, or compact JSON when msgpack isn't installed) and the compressor
+(zstd, zlib or none) are recorded per entry, so workers with different
+settings read each other's entries. Entries are stored as raw bytes (read and
+written through the manager's binary client); plain JSON entries written by
+older versions are still read.
+"""
+import json
+import logging
+import os
+import struct
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple, Union
+from utils.tool_result import dumps_bytes
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:  # pragma: no cover - optional dependency
+        zstd = None
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+# format, serializer, compressor, cache type, created_at (us since epoch), version
+HEADER = struct.Struct(">BBBBqQ")
+# Where the 8-byte version sits in HEADER, so Redis can stamp it in on write
+VERSION_OFFSET = struct.calcsize(">BBBBq")
+
+SERIALIZERS = {"json": 0, "msgpack": 1}
+COMPRESSORS = {"none": 0, "zlib": 1, "zstd": 2}
+# Cache types with a one-byte code; others are stored by name in the body (code 0)
+CACHE_TYPES = ("api_response", "chat_context", "template_data", "partner_data",
+               "cleanroom_data", "status_data", "session_data")
+# Envelope fields stored in the body, in order
+BODY_FIELDS = ("data", "ttl", "expires_at", "stale_until", "tags", "compute_time", "cache_type")
+
+EPOCH = datetime(1970, 1, 1)
+
+class CacheCodecError(ValueError):
+    """Stored entry that can't be decoded (unknown format or missing dependency)"""
+
+def _isoformat_to_us(cached_at: Optional[str]) -> int:
+    if not cached_at:
+        return 0
+    return (datetime.fromisoformat(cached_at) - EPOCH) // timedelta(microseconds=1)
+
+def _us_to_isoformat(created_at: int) -> str:
+    return (EPOCH + timedelta(microseconds=created_at)).isoformat()
+
+class CacheCodec:
+    """
+    Encodes cache entry dicts to bytes for Redis and back.
+
+    Bodies of at least compress_min_bytes are compressed with the configured
+    compressor (level defaults: zstd 3, zlib 6).
+    """
+
+    def __init__(self, serializer: str = "msgpack", compressor: str = "zstd",
+                 compress_min_bytes: int = 1024, level: Optional[int] = None):
+        if serializer == "msgpack" and msgpack is None:
+            logger.warning("msgpack not installed, serializing cache entries as compact JSON")
+            serializer = "json"
+        if compressor == "zstd" and zstd is None:
+            logger.warning("zstd not available, compressing cache entries with zlib")
+            compressor = "zlib"
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"Unknown cache serializer: {serializer}")
+        if compressor not in COMPRESSORS:
+            raise ValueError(f"Unknown cache compressor: {compressor}")
+        self.serializer = serializer
+        self.compressor = compressor
+        self.compress_min_bytes = compress_min_bytes
+        self.level = level
+
+    @classmethod
+    def from_env(cls) -> "CacheCodec":
+        return cls(
+            serializer=os.getenv("CACHE_SERIALIZER", "msgpack"),
+            compressor=os.getenv("CACHE_COMPRESSION", "zstd"),
+            compress_min_bytes=int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "1024"))
+        )
+
+    def _serialize(self, body: list) -> bytes:
+        if self.serializer == "msgpack":
+            return msgpack.packb(body, default=str, use_bin_type=True)
+        return dumps_bytes(body)
+
+    @staticmethod
+    def _deserialize(serializer: int, payload: bytes) -> list:
+        if serializer == SERIALIZERS["msgpack"]:
+            if msgpack is None:
+                raise CacheCodecError("Entry was written with msgpack, which is not installed")
+            return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+        return json.loads(payload)
+
+    def _compress(self, payload: bytes) -> Tuple[int, bytes]:
+        if self.compressor == "none" or len(payload) < self.compress_min_bytes:
+            return COMPRESSORS["none"], payload
+        if self.compressor == "zstd":
+            return COMPRESSORS["zstd"], zstd.compress(payload, level=3 if self.level is None else self.level)
+        return COMPRESSORS["zlib"], zlib.compress(payload, 6 if self.level is None else self.level)
+
+    @staticmethod
+    def _decompress(compressor: int, payload: bytes) -> bytes:
+        if compressor == COMPRESSORS["zstd"]:
+            if zstd is None:
+                raise CacheCodecError("Entry was compressed with zstd, which is not available")
+            return zstd.decompress(payload)
+        if compressor == COMPRESSORS["zlib"]:
+            return zlib.decompress(payload)
+        return payload
+
+    def encode(self, entry: Dict[str, Any]) -> Tuple[bytes, int]:
+        """
+        Stored bytes for an entry plus its uncompressed size (for ratio stats and L1 accounting)
+
+        Raises TypeError/ValueError if the data can't be serialized.
+        """
+        cache_type = entry.get("cache_type")
+        type_code = CACHE_TYPES.index(cache_type) + 1 if cache_type in CACHE_TYPES else 0
+        body = [entry.get(field) for field in BODY_FIELDS[:-1]]
+        if type_code == 0:
+            body.append(cache_type)
+        payload = self._serialize(body)
+        compressor, compressed = self._compress(payload)
+        header = HEADER.pack(FORMAT_VERSION, SERIALIZERS[self.serializer], compressor, type_code,
+                             _isoformat_to_us(entry.get("cached_at")), entry.get("version") or 0)
+        return header + compressed, HEADER.size + len(payload)
+
+    def decode(self, stored: Union[bytes, str]) -> Dict[str, Any]:
+        """Entry dict from a stored value (binary or legacy JSON)"""
+        return self.decode_sized(stored)[0]
+
+    def decode_sized(self, stored: Union[bytes, str]) -> Tuple[Dict[str, Any], int]:
+        """Entry dict plus its uncompressed size, as returned by encode"""
+        if isinstance(stored, str):
+            stored = stored.encode("utf-8")
+        if stored[:1] == b"{":
+            return json.loads(stored), len(stored)
+        fmt, serializer, compressor, type_code, created_at, version = HEADER.unpack_from(stored)
+        if fmt != FORMAT_VERSION:
+            raise CacheCodecError(f"Unknown cache entry format {fmt}")
+        payload = self._decompress(compressor, stored[HEADER.size:])
+        entry = dict(zip(BODY_FIELDS, self._deserialize(serializer, payload)))
+        if type_code:
+            entry["cache_type"] = CACHE_TYPES[type_code - 1]
+        entry["cached_at"] = _us_to_isoformat(created_at)
+        entry["version"] = version
+        return entry, HEADER.size + len(payload)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "serializer": self.serializer,
+            "compressor": self.compressor,
+            "compress_min_bytes": self.compress_min_bytes
+        }
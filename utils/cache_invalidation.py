@@ -0,0 +1,203 @@
+"""
+Cross-worker invalidation of the in-process cache tier over Redis pub/sub
+
+Every cache write and invalidation publishes a message; every worker
+subscribes and evicts its local copies. Entries carry a cluster-wide version
+(INCR on one counter), so a message never evicts a newer local entry, and a
+Redis read that started before an invalidation arrived can't put the old
+version back into L1 (a short-lived tombstone remembers the invalidated
+version). After a lost subscription the local tier is dropped, since
+messages may have been missed in between.
+"""
+import asyncio
+import fnmatch
+import json
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache:invalidate"
+VERSION_KEY = "cache:version"
+
+class CacheInvalidator:
+    """
+    Publishes and applies invalidations for one RedisCache's local tier.
+
+    The subscriber runs as one task on the loop that started it (the serving
+    loop of this worker) and resubscribes with backoff when Redis drops.
+    """
+
+    def __init__(self, redis_cache, channel: str = CHANNEL, tombstone_ttl: float = 30.0,
+                 max_tombstones: int = 10000, max_backoff: float = 30.0):
+        self.redis_cache = redis_cache
+        self.channel = channel
+        self.tombstone_ttl = tombstone_ttl
+        self.max_tombstones = max_tombstones
+        self.max_backoff = max_backoff
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._key_tombstones: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._pattern_tombstones: List[Tuple[str, int, float]] = []
+        self._tasks: Dict[asyncio.AbstractEventLoop, asyncio.Task] = {}
+        self.subscribed = False
+        self.stats_counters = {"published": 0, "received": 0, "evicted": 0, "ignored_own": 0,
+                               "kept_newer": 0, "rejected_fills": 0, "resyncs": 0, "publish_failures": 0}
+
+    async def next_version(self, redis_client) -> int:
+        """Cluster-wide increasing version for a new entry"""
+        return int(await redis_client.incr(VERSION_KEY))
+
+    def message(self, **fields: Any) -> str:
+        return json.dumps({"origin": self.instance_id, **fields})
+
+    def message_parts(self, **fields: Any) -> Tuple[str, str]:
+        """message() without a version, split where a script inserts the one it assigns"""
+        return self.message(**fields)[:-1] + ', "version": ', "}"
+
+    async def publish_pattern(self, redis_client, pattern: str):
+        """Tell the other workers to drop keys matching pattern"""
+        try:
+            version = await self.next_version(redis_client)
+            await redis_client.publish(self.channel, self.message(op="pattern", pattern=pattern, version=version))
+            self.stats_counters["published"] += 1
+        except Exception as e:
+            self.stats_counters["publish_failures"] += 1
+            self.redis_cache.manager.report_failure(e)
+            logger.warning(f"Cache invalidation publish failed for {pattern}: {e}")
+
+    async def publish_keys(self, redis_client, keys: List[str]):
+        """Tell the other workers to drop these keys (e.g. everything under a tag)"""
+        if not keys:
+            return
+        try:
+            version = await self.next_version(redis_client)
+            await redis_client.publish(self.channel, self.message(op="keys", keys=keys, version=version))
+            self.stats_counters["published"] += 1
+        except Exception as e:
+            self.stats_counters["publish_failures"] += 1
+            self.redis_cache.manager.report_failure(e)
+            logger.warning(f"Cache invalidation publish failed for {len(keys)} keys: {e}")
+
+    def accepts(self, key: str, version: int) -> bool:
+        """Whether an entry read from Redis may be kept locally (no newer invalidation seen)"""
+        now = time.monotonic()
+        tombstone = self._key_tombstones.get(key)
+        if tombstone is not None and tombstone[1] > now and version < tombstone[0]:
+            self.stats_counters["rejected_fills"] += 1
+            return False
+        for pattern, pattern_version, expires in self._pattern_tombstones:
+            if expires > now and version < pattern_version and fnmatch.fnmatchcase(key, pattern):
+                self.stats_counters["rejected_fills"] += 1
+                return False
+        return True
+
+    def apply(self, raw: str):
+        """Apply one invalidation message to the local tier"""
+        try:
+            message = json.loads(raw)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring malformed cache invalidation message: {raw!r}")
+            return
+        self.stats_counters["received"] += 1
+        if message.get("origin") == self.instance_id:
+            self.stats_counters["ignored_own"] += 1
+            return
+
+        local = self.redis_cache.local
+        version = int(message.get("version") or 0)
+        expires = time.monotonic() + self.tombstone_ttl
+        if message.get("op") in ("key", "keys"):
+            keys = message["keys"] if message["op"] == "keys" else [message["key"]]
+            for key in keys:
+                self._key_tombstones[key] = (version, expires)
+                self._key_tombstones.move_to_end(key)
+                entry = local.peek(key)
+                if entry is not None and isinstance(entry, dict) and entry.get("version", 0) >= version:
+                    self.stats_counters["kept_newer"] += 1
+                elif local.delete(key):
+                    self.stats_counters["evicted"] += 1
+            self._prune()
+            self.redis_cache.evict_derived(set(keys).__contains__)
+        elif message.get("op") == "pattern":
+            pattern = message["pattern"]
+            self._pattern_tombstones.append((pattern, version, expires))
+            self._prune()
+            self.stats_counters["evicted"] += local.delete_matching(pattern)
+            self.redis_cache.evict_derived(lambda key: fnmatch.fnmatchcase(key, pattern))
+
+    def _prune(self):
+        now = time.monotonic()
+        while self._key_tombstones and (len(self._key_tombstones) > self.max_tombstones
+                                        or next(iter(self._key_tombstones.values()))[1] <= now):
+            self._key_tombstones.popitem(last=False)
+        self._pattern_tombstones = [t for t in self._pattern_tombstones if t[2] > now]
+
+    async def start(self):
+        """Run the subscriber on the running loop"""
+        loop = asyncio.get_running_loop()
+        self._tasks = {l: t for l, t in self._tasks.items() if not l.is_closed() and not t.done()}
+        if loop not in self._tasks:
+            self._tasks[loop] = loop.create_task(self._subscribe_loop())
+
+    async def stop(self):
+        """Stop the subscriber running on this loop"""
+        task = self._tasks.pop(asyncio.get_running_loop(), None)
+        if task is None or task.done():
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _subscribe_loop(self):
+        backoff = 1.0
+        while True:
+            redis_client = await self.redis_cache.manager.get_client()
+            if redis_client is None:
+                await asyncio.sleep(random.uniform(backoff / 2, backoff))
+                backoff = min(self.max_backoff, backoff * 2)
+                continue
+            pubsub = redis_client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                # Messages may have been missed while unsubscribed
+                self.redis_cache.local.clear()
+                self.redis_cache.evict_derived(lambda key: True)
+                self.stats_counters["resyncs"] += 1
+                self.subscribed = True
+                backoff = 1.0
+                logger.info(f"📡 Subscribed to cache invalidations on {self.channel}")
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None and message.get("type") == "message":
+                        self.apply(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.redis_cache.manager.report_failure(e)
+                logger.warning(f"Cache invalidation subscription lost, resubscribing: {e}")
+                await asyncio.sleep(random.uniform(backoff / 2, backoff))
+                backoff = min(self.max_backoff, backoff * 2)
+            finally:
+                self.subscribed = False
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "channel": self.channel,
+            "instance_id": self.instance_id,
+            "subscribed": self.subscribed,
+            "tombstones": len(self._key_tombstones) + len(self._pattern_tombstones),
+            **self.stats_counters
+        }
@@ -0,0 +1,206 @@
+"""
+Chat response cache for /api/enhanced-chat
+
+Entries are keyed on a SHA-256 of the normalized prompt plus the agent's
+conversation-context fingerprint, so every worker computes the same key and
+unrelated prompts never share one. Scopes:
+- global: answers that don't depend on the session (partners, templates, help)
+- session: conversational answers, only reused within the same session_id
+Time-sensitive or side-effecting intents (status, results, submitting a query,
+exports) always bypass the cache.
+
+Each scope keeps a sorted-set index ordered by last use; writes trim it to a
+maximum size, evicting the least recently used entries.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+from redis_cache import RedisCache, cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "chat:v1"
+
+# Checked in order; the first matching intent wins. Side-effecting intents come
+# first so "run an analysis with partner X" is never treated as a partners lookup.
+INTENT_PATTERNS = (
+    ("status", re.compile(r"\b(status|check|how is|progress)\b")),
+    ("results", re.compile(r"\b(results?|findings|what were)\b")),
+    ("submit", re.compile(r"(?<!can i )\b(run|execute|submit)\b|\banaly[sz]e\b")),
+    ("exports", re.compile(r"\b(exports?|download)\b")),
+    ("partners", re.compile(r"\b(partners?|who can|collaborat\w*)\b")),
+    ("templates", re.compile(r"\b(templates?|what can|analytics|available)\b")),
+)
+
+# Intents whose answers go stale within seconds or trigger work in Habu
+BYPASS_INTENTS = frozenset({"status", "results", "submit", "exports"})
+
+GLOBAL_INTENTS = frozenset({"partners", "templates"})
+
+def normalize_prompt(text: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return re.sub(r"\s+", " ", text).strip().lower().rstrip("?!. ")
+
+def classify_intent(text: str) -> str:
+    """Keyword intent used for cache policy (the agent still does its own routing)"""
+    normalized = normalize_prompt(text)
+    for intent, pattern in INTENT_PATTERNS:
+        if pattern.search(normalized):
+            return intent
+    return "general"
+
+def scope_for(intent: str) -> Optional[str]:
+    """'global', 'session', or None when the intent must not be cached"""
+    if intent in BYPASS_INTENTS:
+        return None
+    return "global" if intent in GLOBAL_INTENTS else "session"
+
+class ChatResponseCache:
+    """
+    Scoped, size-bounded cache of chat responses in Redis.
+
+    Lookups and writes never raise: a Redis problem is reported to the
+    connection manager and treated as a miss.
+    """
+
+    def __init__(self, redis_cache: RedisCache, ttl: int = 300,
+                 max_global_entries: int = 1000, max_session_entries: int = 50):
+        self.redis_cache = redis_cache
+        self.ttl = ttl
+        self.max_entries = {"global": max_global_entries, "session": max_session_entries}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self.evictions = 0
+
+    def cache_key(self, user_input: str, context: str, scope: str, session_id: str = "default") -> str:
+        """Stable key: identical across processes, independent of PYTHONHASHSEED"""
+        material = json.dumps({
+            "prompt": normalize_prompt(user_input),
+            "context": context,
+            "session": session_id if scope == "session" else None
+        }, sort_keys=True)
+        return f"{KEY_PREFIX}:{scope}:{hashlib.sha256(material.encode('utf-8')).hexdigest()}"
+
+    def _index_key(self, scope: str, session_id: str) -> str:
+        if scope == "global":
+            return f"{KEY_PREFIX}:index:global"
+        return f"{KEY_PREFIX}:index:session:{hashlib.sha256(session_id.encode('utf-8')).hexdigest()[:16]}"
+
+    def _count(self, intent: str, outcome: str):
+        counters = self._counters.setdefault(intent, {"hits": 0, "misses": 0, "bypassed": 0})
+        counters[outcome] += 1
+
+    async def get(self, user_input: str, context: str, session_id: str = "default") -> Optional[Dict[str, Any]]:
+        """Cached entry ({'response', 'cached_at', 'intent', 'scope'}) or None"""
+        intent = classify_intent(user_input)
+        scope = scope_for(intent)
+        if scope is None:
+            self._count(intent, "bypassed")
+            return None
+
+        entry = None
+        redis_client = await self.redis_cache.manager.get_client()
+        if redis_client is not None:
+            key = self.cache_key(user_input, context, scope, session_id)
+            try:
+                raw = await redis_client.get(key)
+                if raw:
+                    entry = json.loads(raw)
+                    # Refresh recency so eviction drops the least recently used entries
+                    await redis_client.zadd(self._index_key(scope, session_id), {key: time.time()})
+            except Exception as e:
+                self.redis_cache.manager.report_failure(e)
+                logger.warning(f"Chat cache read failed: {e}")
+                entry = None
+
+        self._count(intent, "hits" if entry else "misses")
+        return entry
+
+    async def set(self, user_input: str, context: str, response: str, session_id: str = "default") -> bool:
+        """Store a response under its scope and trim the scope's index"""
+        intent = classify_intent(user_input)
+        scope = scope_for(intent)
+        if scope is None:
+            return False
+
+        redis_client = await self.redis_cache.manager.get_client()
+        if redis_client is None:
+            return False
+
+        key = self.cache_key(user_input, context, scope, session_id)
+        index_key = self._index_key(scope, session_id)
+        now = time.time()
+        entry = {
+            "response": response,
+            "cached_at": datetime.now().isoformat(),
+            "intent": intent,
+            "scope": scope
+        }
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.set(key, json.dumps(entry), ex=self.ttl)
+                pipe.zadd(index_key, {key: now})
+                # Members whose entries have already expired
+                pipe.zremrangebyscore(index_key, "-inf", now - self.ttl)
+                pipe.expire(index_key, self.ttl)
+                pipe.zcard(index_key)
+                results = await pipe.execute()
+
+            overflow = results[-1] - self.max_entries[scope]
+            if overflow > 0:
+                evicted = [member for member, _ in await redis_client.zpopmin(index_key, overflow)]
+                if evicted:
+                    await redis_client.delete(*evicted)
+                    self.evictions += len(evicted)
+            return True
+        except Exception as e:
+            self.redis_cache.manager.report_failure(e)
+            logger.warning(f"Chat cache write failed: {e}")
+            return False
+
+    async def invalidate_session(self, session_id: str) -> int:
+        """Drop every session-scoped entry for one session"""
+        redis_client = await self.redis_cache.manager.get_client()
+        if redis_client is None:
+            return 0
+        index_key = self._index_key("session", session_id)
+        try:
+            keys = await redis_client.zrange(index_key, 0, -1)
+            if not keys:
+                return 0
+            await redis_client.delete(*keys, index_key)
+            return len(keys)
+        except Exception as e:
+            self.redis_cache.manager.report_failure(e)
+            logger.warning(f"Chat cache invalidation failed: {e}")
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rate per intent for this worker"""
+        by_intent = {}
+        for intent, counters in sorted(self._counters.items()):
+            lookups = counters["hits"] + counters["misses"]
+            by_intent[intent] = {
+                **counters,
+                "hit_rate": round((counters["hits"] / lookups) * 100, 2) if lookups else 0.0
+            }
+        hits = sum(c["hits"] for c in self._counters.values())
+        lookups = hits + sum(c["misses"] for c in self._counters.values())
+        return {
+            "ttl": self.ttl,
+            "max_entries": self.max_entries,
+            "hit_rate": round((hits / lookups) * 100, 2) if lookups else 0.0,
+            "evictions": self.evictions,
+            "by_intent": by_intent
+        }
+
+chat_cache = ChatResponseCache(
+    cache,
+    ttl=int(os.getenv("CHAT_CACHE_TTL", "300")),
+    max_global_entries=int(os.getenv("CHAT_CACHE_MAX_GLOBAL_ENTRIES", "1000")),
+    max_session_entries=int(os.getenv("CHAT_CACHE_MAX_SESSION_ENTRIES", "50"))
+)
@@ -0,0 +1,23 @@
+"""
+Shared, cached /cleanrooms listing used by the partner and template tools
+"""
+from typing import Any, Optional
+from config.habu_config import HabuConfig, habu_config
+from redis_cache import cache
+
+async def list_cleanrooms(config: Optional[HabuConfig] = None) -> Any:
+    """
+    The /cleanrooms listing, served stale-while-revalidate from Redis
+    
+    After warmup an expired listing is returned immediately while a single
+    background task refetches it; without Redis this is a plain GET.
+    """
+    config = config or habu_config
+    cached_result = await cache.get_or_refresh(
+        'cleanrooms_list',
+        lambda: config.get_json("/cleanrooms", timeout=30.0),
+        cache_type='cleanroom_data',
+        params={'base_url': config.base_url},
+        should_cache=lambda data: isinstance(data, list)
+    )
+    return cached_result['data']
@@ -0,0 +1,39 @@
+"""
+Concurrency helpers for fanning out Habu API calls
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List
+
+
+async def gather_limited(items: Iterable[Any],
+                         func: Callable[[Any], Awaitable[Any]],
+                         limit: int) -> List[Dict[str, Any]]:
+    """
+    Run func(item) for every item concurrently, at most `limit` at a time.
+
+    One failing item never fails the batch: each outcome is reported as a dict
+    with the item, its result or error, and how long it took.
+
+    Returns:
+        List of {"item", "result", "error", "elapsed_ms"} in input order
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run_one(item: Any) -> Dict[str, Any]:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await func(item)
+                error = None
+            except Exception as e:
+                result = None
+                error = e
+            return {
+                "item": item,
+                "result": result,
+                "error": error,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+            }
+
+    return await asyncio.gather(*(run_one(item) for item in items))
@@ -0,0 +1,86 @@
+"""
+Validator cache for conditional GET revalidation (ETag / Last-Modified)
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class ValidatorCache:
+    """
+    Bounded LRU of response validators and the already-parsed payload they describe.
+
+    On a 304 Not Modified the stored payload is returned as-is, so it is shared
+    between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self.revalidated = 0
+        self.full_fetches = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Look up the stored validators and payload for a request"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def conditional_headers(self, key: Hashable) -> Dict[str, str]:
+        """Build If-None-Match / If-Modified-Since headers for a request"""
+        entry = self.get(key)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, key: Hashable, etag: Optional[str], last_modified: Optional[str],
+              payload: Any, body_size: int):
+        """Remember a 200 response; responses without validators are not stored"""
+        self.full_fetches += 1
+        self.bytes_downloaded += body_size
+        if not etag and not last_modified:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "payload": payload,
+            "body_size": body_size,
+            "stored_at": time.time()
+        }
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def mark_not_modified(self, key: Hashable) -> Any:
+        """Record a 304 and return the stored payload"""
+        entry = self._entries[key]
+        entry["stored_at"] = time.time()
+        self.revalidated += 1
+        self.bytes_saved += entry["body_size"]
+        return entry["payload"]
+
+    def clear(self):
+        """Forget all validators"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Revalidation counters and bandwidth saved"""
+        total = self.revalidated + self.full_fetches
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "not_modified_responses": self.revalidated,
+            "full_responses": self.full_fetches,
+            "revalidation_rate": round((self.revalidated / total) * 100, 2) if total else 0.0,
+            "bytes_downloaded": self.bytes_downloaded,
+            "bytes_saved": self.bytes_saved
+        }
@@ -0,0 +1,215 @@
+"""
+Materialized dashboard snapshot
+
+Partners, templates, exports and health are combined into one document that is
+serialized and precompressed once per change and tagged with a version number.
+Once it has been requested, a background refresher rebuilds it every
+`interval` seconds; a short Redis lease makes one worker in the cluster do the
+fan-out while the others adopt the shared copy, so upstream load depends on the
+refresh interval, not on how many browsers are polling. Clients revalidate with If-None-Match.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from redis_cache import RedisCache
+from utils.concurrency import gather_limited
+from utils.rate_limiter import request_priority
+from utils.response_cache import EncodedResponse, content_etag, encode_response, from_redis_fields, to_redis_fields
+from utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = "dashboard:snapshot"
+VERSION_KEY = "dashboard:version"
+LEASE_KEY = "dashboard:refresh"
+
+class DashboardSnapshot:
+    """
+    Versioned, precompressed dashboard document kept current in the background.
+
+    `sources` maps a section name to a coroutine function returning that
+    section. A section that fails (or returns an error envelope) keeps its
+    previous value and is listed under "errors". The version only moves when
+    the document's ETag changes (timing diagnostics don't count), so an
+    unchanged refresh, on this worker or after adopting another's copy, keeps
+    the ETag and polling clients keep getting 304s.
+    """
+
+    def __init__(self, redis_cache: RedisCache, sources: Dict[str, Callable[[], Awaitable[Dict[str, Any]]]],
+                 interval: float = 60.0, section_timeout: float = 30.0):
+        self.redis_cache = redis_cache
+        self.sources = sources
+        self.interval = interval
+        self.section_timeout = section_timeout
+
+        self._encoded: Optional[EncodedResponse] = None
+        self._sections: Dict[str, Any] = {}
+        self._version = 0
+        self._refreshed_at = 0.0
+        self._tasks: Dict[asyncio.AbstractEventLoop, asyncio.Task] = {}
+        self._flight = SingleFlight("dashboard_snapshot")
+        self.stats_counters = {"builds": 0, "unchanged": 0, "adopted": 0, "section_failures": 0,
+                               "served": 0, "not_modified": 0}
+
+    @property
+    def max_age(self) -> float:
+        """Age after which a request rebuilds instead of trusting the refresher"""
+        return max(self.interval, 1.0) * 2
+
+    async def start(self):
+        """Run the periodic refresher on the running loop (no-op if interval <= 0)"""
+        if self.interval <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        # One refresher per serving loop; forget ones whose loop has gone away
+        self._tasks = {l: t for l, t in self._tasks.items() if not l.is_closed() and not t.done()}
+        if loop in self._tasks:
+            return
+        self._tasks[loop] = loop.create_task(self._run())
+        logger.info(f"📸 Dashboard snapshot refresher started (every {self.interval:.0f}s)")
+
+    async def stop(self):
+        """Stop the refresher running on this loop"""
+        task = self._tasks.pop(asyncio.get_running_loop(), None)
+        if task is None or task.done():
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self):
+        """Refresh every interval once the snapshot exists (the first request builds it)"""
+        while True:
+            await asyncio.sleep(self.interval)
+            if self._encoded is None:
+                continue
+            try:
+                with request_priority("background"):
+                    await self.refresh()
+            except Exception as e:
+                logger.warning(f"Dashboard snapshot refresh failed, keeping version {self._version}: {e}")
+
+    async def current(self) -> EncodedResponse:
+        """The latest snapshot; built on demand when missing or when the refresher has fallen behind"""
+        encoded = self._encoded
+        if encoded is not None and time.monotonic() - self._refreshed_at < self.max_age:
+            return encoded
+        try:
+            return await self.refresh()
+        except Exception:
+            if encoded is not None:
+                return encoded
+            raise
+
+    async def refresh(self) -> EncodedResponse:
+        """Rebuild if this worker holds the refresh lease, otherwise adopt the shared copy"""
+        return await self._flight.do("refresh", self._refresh)
+
+    async def _refresh(self) -> EncodedResponse:
+        # The snapshot hash holds raw compressed bodies
+        redis_client = await self.redis_cache.manager.get_binary_client()
+        if redis_client is not None:
+            try:
+                lease_ms = max(1, int(self.interval * 900))
+                if not await redis_client.set(LEASE_KEY, os.getpid(), nx=True, px=lease_ms):
+                    shared = await self._adopt(redis_client)
+                    if shared is not None:
+                        return shared
+            except Exception as e:
+                self.redis_cache.manager.report_failure(e)
+                logger.warning(f"Dashboard snapshot lease failed, building locally: {e}")
+        return await self._build(redis_client)
+
+    async def _adopt(self, redis_client) -> Optional[EncodedResponse]:
+        """Take the copy another worker published (None if there is none yet)"""
+        stored = await redis_client.hgetall(SNAPSHOT_KEY)
+        if not stored:
+            return None
+        shared = from_redis_fields(stored)
+        version = int(shared.version or 0)
+        if self._encoded is None or version > self._version:
+            self._encoded = shared
+            self._version = version
+            # A later local build compares with, and falls back on, the adopted sections
+            document = json.loads(self._encoded.body)
+            self._sections = {name: document.get(name) for name in self.sources}
+            self.stats_counters["adopted"] += 1
+        self._refreshed_at = time.monotonic()
+        return self._encoded
+
+    async def _build(self, redis_client) -> EncodedResponse:
+        """Fan out to every source at once and re-encode only if something changed"""
+        async def fetch(item):
+            name, source = item
+            return await asyncio.wait_for(source(), self.section_timeout)
+
+        outcomes = await gather_limited(list(self.sources.items()), fetch, len(self.sources))
+        sections = dict(self._sections)
+        errors = {}
+        for outcome in outcomes:
+            name = outcome["item"][0]
+            result = outcome["result"]
+            if outcome["error"] is not None or not isinstance(result, dict) or result.get("status") == "error":
+                self.stats_counters["section_failures"] += 1
+                error = outcome["error"]
+                errors[name] = f"{type(error).__name__}: {error}" if error is not None else \
+                    (result or {}).get("error", "Invalid response")
+                sections.setdefault(name, None)
+                continue
+            sections[name] = result
+
+        self._refreshed_at = time.monotonic()
+        document = {**sections, "errors": errors}
+        # Fan-out timings and entry ages differ on every refresh and are left out of the ETag
+        if self._encoded is not None and content_etag(document) == self._encoded.etag:
+            self.stats_counters["unchanged"] += 1
+            return self._encoded
+
+        version = self._version + 1
+        if redis_client is not None:
+            try:
+                version = int(await redis_client.incr(VERSION_KEY))
+            except Exception as e:
+                self.redis_cache.manager.report_failure(e)
+                redis_client = None
+
+        metadata = {
+            "version": version,
+            "generated_at": datetime.utcnow().isoformat(),
+            "refresh_interval": self.interval
+        }
+        encoded = encode_response(document, metadata, version=str(version), cache_status="HIT")
+        self._encoded, self._sections, self._version = encoded, sections, version
+        self.stats_counters["builds"] += 1
+        logger.info(f"📸 Dashboard snapshot v{version} built ({len(encoded.body)} bytes, {len(errors)} section errors)")
+
+        if redis_client is not None:
+            try:
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    pipe.hset(SNAPSHOT_KEY, mapping=to_redis_fields(encoded))
+                    pipe.expire(SNAPSHOT_KEY, max(int(self.max_age * 5), 300))
+                    await pipe.execute()
+            except Exception as e:
+                self.redis_cache.manager.report_failure(e)
+                logger.warning(f"Dashboard snapshot publish failed: {e}")
+        return encoded
+
+    def count_served(self, not_modified: bool):
+        self.stats_counters["not_modified" if not_modified else "served"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self._version,
+            "etag": self._encoded.etag if self._encoded else None,
+            "age_seconds": round(time.monotonic() - self._refreshed_at, 1) if self._encoded else None,
+            "interval": self.interval,
+            "refresher_running": any(not task.done() for task in self._tasks.values()),
+            **self.stats_counters
+        }
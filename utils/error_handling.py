@@ -2,11 +2,16 @@
 Comprehensive error handling and resilience utilities
 """
 import logging
+import os
 import traceback
 import asyncio
-from typing import Optional, Callable, Any, Dict
+import contextvars
+import random
+from typing import Optional, Callable, Any, Dict, Awaitable, Tuple
 from functools import wraps
 import json
+import httpx
+from utils.tool_result import ToolResult
 
 logger = logging.getLogger(__name__)
 
@@ -39,28 +44,177 @@ class NetworkError(HabuError):
     def __init__(self, message: str, details: Optional[Dict] = None):
         super().__init__(message, "NETWORK_ERROR", details)
 
-def retry_async(max_retries: int = 3, delay: float = 1.0, backoff: float = 2.0):
+class RateLimitExceededError(APIError):
+    """Outbound rate limit reached; retry_after is the suggested wait in seconds"""
+    def __init__(self, message: str, retry_after: Optional[float] = None, details: Optional[Dict] = None):
+        self.retry_after = retry_after
+        super().__init__(message, 429, details)
+
+class OverloadedError(APIError):
+    """Request shed by admission control; retry_after is the suggested wait in seconds"""
+    def __init__(self, message: str, retry_after: Optional[float] = None, details: Optional[Dict] = None):
+        self.retry_after = retry_after
+        super().__init__(message, 503, details)
+
+class CircuitOpenError(NetworkError):
+    """Call rejected because the circuit breaker is open"""
+    def __init__(self, message: str = "Service temporarily unavailable (circuit breaker open)",
+                 details: Optional[Dict] = None):
+        super().__init__(message, details)
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+def is_retryable(error: Exception, retry_on: Tuple[type, ...] = ()) -> bool:
+    """
+    Classify an error as transient (worth retrying) or permanent.
+    
+    Timeouts, connection failures and 408/425/429/5xx responses are transient.
+    Other 4xx, auth/config/validation errors, an open circuit breaker and our
+    own rate limiter giving up are not.
     """
-    Retry decorator for async functions with exponential backoff
+    if isinstance(error, (CircuitOpenError, RateLimitExceededError, AuthenticationError, ConfigurationError)):
+        return False
+    if retry_on and isinstance(error, retry_on):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError, NetworkError,
+                          asyncio.TimeoutError, ConnectionError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in RETRYABLE_STATUS_CODES
+    return False
+
+class RetryBudget:
+    """
+    Per-process cap on retries as a fraction of first attempts.
+    
+    Every first attempt earns `ratio` of a retry token (up to `max_tokens`); each
+    retry spends one, so during an outage retries add at most ~ratio extra load.
+    """
+    def __init__(self, ratio: float = 0.1, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.attempts = 0
+        self.retries = 0
+        self.retries_denied = 0
+    
+    def record_attempt(self):
+        """Earn retry credit for a first attempt"""
+        self.attempts += 1
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+    
+    def try_spend(self) -> bool:
+        """Take one retry token if available"""
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.retries += 1
+            return True
+        self.retries_denied += 1
+        return False
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ratio": self.ratio,
+            "tokens": round(self.tokens, 2),
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "retries_denied": self.retries_denied
+        }
+
+_retry_scope_active: contextvars.ContextVar = contextvars.ContextVar("retry_scope_active", default=False)
+
+class RetryPolicy:
+    """
+    Retry engine: error classification, decorrelated jitter and a shared budget.
+    
+    Retries happen at one layer only. A call made while an outer RetryPolicy is
+    already retrying runs exactly once and leaves retrying to the outer layer.
+    """
+    def __init__(self, name: str, max_attempts: int = 3, base_delay: float = 0.2,
+                 max_delay: float = 5.0, budget: Optional[RetryBudget] = None,
+                 retry_on: Tuple[type, ...] = ()):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or retry_budget
+        self.retry_on = retry_on
+        self.calls = 0
+        self.retries = 0
+        self.non_retryable_failures = 0
+        self.nested_calls = 0
+    
+    def next_delay(self, previous: float) -> float:
+        """Decorrelated jitter: uniform between base and 3x the previous delay, capped"""
+        return min(self.max_delay, random.uniform(self.base_delay, previous * 3))
+    
+    async def call(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run func(), retrying transient failures while attempts and budget allow"""
+        if _retry_scope_active.get():
+            self.nested_calls += 1
+            return await func()
+        
+        token = _retry_scope_active.set(True)
+        try:
+            self.calls += 1
+            self.budget.record_attempt()
+            delay = self.base_delay
+            attempt = 1
+            while True:
+                try:
+                    return await func()
+                except Exception as e:
+                    if not is_retryable(e, self.retry_on):
+                        self.non_retryable_failures += 1
+                        raise
+                    if attempt >= self.max_attempts:
+                        logger.error(f"{self.name} failed after {attempt} attempts: {e}")
+                        raise
+                    if not self.budget.try_spend():
+                        logger.warning(f"{self.name} retry budget exhausted, not retrying: {e}")
+                        raise
+                    delay = self.next_delay(delay)
+                    logger.warning(f"{self.name} attempt {attempt} failed: {e}. Retrying in {delay:.2f}s...")
+                    self.retries += 1
+                    attempt += 1
+                    await asyncio.sleep(delay)
+        finally:
+            _retry_scope_active.reset(token)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "non_retryable_failures": self.non_retryable_failures,
+            "nested_calls": self.nested_calls,
+            "budget": self.budget.stats()
+        }
+
+def retry_async(max_retries: int = 3, delay: float = 1.0, backoff: float = 2.0,
+                policy: Optional[RetryPolicy] = None):
+    """
+    Retry decorator for async functions, backed by RetryPolicy.
+    
+    Only transient errors are retried, with decorrelated jitter between `delay`
+    and `delay * backoff ** (max_retries - 1)`, within the process retry budget,
+    and never inside another retrying call.
     """
     def decorator(func: Callable):
+        retry_policy = policy or RetryPolicy(
+            func.__name__,
+            max_attempts=max_retries,
+            base_delay=delay,
+            max_delay=delay * backoff ** max(max_retries - 1, 0)
+        )
+        
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            last_exception = None
-            
-            for attempt in range(max_retries):
-                try:
-                    return await func(*args, **kwargs)
-                except Exception as e:
-                    last_exception = e
-                    if attempt < max_retries - 1:
-                        wait_time = delay * (backoff ** attempt)
-                        logger.warning(f"{func.__name__} attempt {attempt + 1} failed: {e}. Retrying in {wait_time}s...")
-                        await asyncio.sleep(wait_time)
-                    else:
-                        logger.error(f"{func.__name__} failed after {max_retries} attempts")
-            
-            raise last_exception
+            return await retry_policy.call(lambda: func(*args, **kwargs))
+        
+        wrapper.retry_policy = retry_policy
         return wrapper
     return decorator
 
@@ -92,15 +246,15 @@ def handle_exceptions(default_return: Any = None, log_error: bool = True):
         return async_wrapper if asyncio.iscoroutinefunction(func) else sync_wrapper
     return decorator
 
-def format_error_response(error: Exception, include_details: bool = False) -> str:
+def error_result(error: Exception, include_details: bool = False) -> ToolResult:
     """
-    Format error as JSON response for MCP tools
+    Format error as a tool result envelope
     """
-    error_response = {
+    error_response = ToolResult({
         "status": "error",
         "error_type": type(error).__name__,
         "message": str(error)
-    }
+    })
     
     if isinstance(error, HabuError):
         error_response["error_code"] = error.error_code
@@ -113,7 +267,13 @@ def format_error_response(error: Exception, include_details: bool = False) -> st
     # Add summary for LLM consumption
     error_response["summary"] = f"An error occurred: {str(error)}"
     
-    return json.dumps(error_response, indent=2)
+    return error_response
+
+def format_error_response(error: Exception, include_details: bool = False) -> str:
+    """
+    Format error as JSON response for MCP tools
+    """
+    return error_result(error, include_details).to_json(pretty=True)
 
 class CircuitBreaker:
     """
@@ -158,7 +318,7 @@ def with_circuit_breaker(circuit_breaker: CircuitBreaker):
         @wraps(func)
         async def wrapper(*args, **kwargs):
             if circuit_breaker.is_open():
-                raise NetworkError("Service temporarily unavailable (circuit breaker open)")
+                raise CircuitOpenError()
             
             try:
                 result = await func(*args, **kwargs)
@@ -171,6 +331,117 @@ def with_circuit_breaker(circuit_breaker: CircuitBreaker):
         return wrapper
     return decorator
 
+class HedgeBudget:
+    """
+    Caps hedged requests at a fraction of primary requests.
+
+    Every primary request earns `ratio` of a hedge token (up to `max_tokens`);
+    each hedge spends one, so hedging adds at most ~ratio extra upstream load.
+    """
+    def __init__(self, ratio: float = 0.05, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.primary_requests = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.hedges_denied = 0
+    
+    def record_request(self):
+        """Earn hedge credit for a primary request"""
+        self.primary_requests += 1
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+    
+    def try_spend(self) -> bool:
+        """Take one hedge token if available"""
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.hedges_sent += 1
+            return True
+        self.hedges_denied += 1
+        return False
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ratio": self.ratio,
+            "tokens": round(self.tokens, 2),
+            "primary_requests": self.primary_requests,
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+            "hedges_denied": self.hedges_denied
+        }
+
+_active_hedge_budget: contextvars.ContextVar = contextvars.ContextVar("active_hedge_budget", default=None)
+
+def current_hedge_budget() -> Optional[HedgeBudget]:
+    """Hedge budget enabled by with_hedging for the running call, if any"""
+    return _active_hedge_budget.get()
+
+def with_hedging(budget: HedgeBudget):
+    """
+    Decorator to opt a read-only function into hedged requests.
+    
+    Idempotent GETs made inside the function (HabuConfig.get_json/request) send a
+    second attempt if the first has not answered by the endpoint's p95.
+    """
+    def decorator(func: Callable):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = _active_hedge_budget.set(budget)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _active_hedge_budget.reset(token)
+        
+        return wrapper
+    return decorator
+
+async def hedged_call(func: Callable[[], Awaitable[Any]], delay: float, budget: HedgeBudget) -> Any:
+    """
+    Run func(); if it has not finished after `delay`, start a second attempt.
+    
+    The first attempt to succeed wins and the other is cancelled. If one attempt
+    fails the other is still awaited; the error is raised only if both fail.
+    """
+    budget.record_request()
+    primary = asyncio.ensure_future(func())
+    attempts = [primary]
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not budget.try_spend():
+            return await primary
+        
+        hedge = asyncio.ensure_future(func())
+        attempts.append(hedge)
+        pending = {primary, hedge}
+        first_error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        budget.hedges_won += 1
+                    return task.result()
+                first_error = first_error or task.exception()
+        raise first_error
+    finally:
+        # Also reached when the caller is cancelled: never leave an attempt running
+        for task in attempts:
+            if not task.done():
+                task.cancel()
+
 # Global circuit breaker instances
 habu_api_circuit_breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=30)
-openai_circuit_breaker = CircuitBreaker(failure_threshold=5, recovery_timeout=60)
\ No newline at end of file
+openai_circuit_breaker = CircuitBreaker(failure_threshold=5, recovery_timeout=60)
+
+# Global hedge budget for Habu reads
+habu_hedge_budget = HedgeBudget(ratio=float(os.getenv("HABU_HEDGE_BUDGET_RATIO", "0.05")))
+
+# Per-process retry budget shared by every retry policy
+retry_budget = RetryBudget(ratio=float(os.getenv("RETRY_BUDGET_RATIO", "0.1")))
+habu_retry_policy = RetryPolicy(
+    "habu_api",
+    max_attempts=int(os.getenv("HABU_RETRY_MAX_ATTEMPTS", "3")),
+    base_delay=float(os.getenv("HABU_RETRY_BASE_DELAY", "0.2")),
+    max_delay=float(os.getenv("HABU_RETRY_MAX_DELAY", "5"))
+)
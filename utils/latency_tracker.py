@@ -0,0 +1,194 @@
+"""
+Rolling per-endpoint latency histograms and the adaptive timeouts derived from them
+"""
+import bisect
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Log-spaced bucket upper bounds in seconds (5ms .. ~180s, +25% per bucket)
+BUCKET_BOUNDS: List[float] = []
+_bound = 0.005
+while _bound < 180:
+    BUCKET_BOUNDS.append(round(_bound, 4))
+    _bound *= 1.25
+
+def endpoint_template(path: str) -> str:
+    """
+    Collapse a REST path into its endpoint template.
+
+    Habu paths alternate collection and id segments, so every second segment is
+    an id: /cleanrooms/abc/partners -> /cleanrooms/{id}/partners
+    """
+    segments = [s for s in path.split("?")[0].split("/") if s]
+    return "/" + "/".join("{id}" if i % 2 else s for i, s in enumerate(segments))
+
+class LatencyHistogram:
+    """
+    Bucketed latency histogram over a sliding time window.
+
+    The window is split into slices; the oldest slice is dropped as time moves
+    on, so percentiles follow recent behaviour without keeping every sample.
+    Timed-out requests are counted per slice but are not latency samples: their
+    duration is the timeout itself, and feeding it back would let a dead
+    endpoint raise its own timeout.
+    """
+
+    def __init__(self, window: float = 300.0, slices: int = 5):
+        self.slice_seconds = window / slices
+        self.slices = slices
+        self._counts: Dict[int, List[int]] = {}
+        self._timeout_counts: Dict[int, int] = {}
+        self.total_count = 0
+        self.timeouts = 0
+
+    def _current_slice_id(self) -> int:
+        slice_id = int(time.monotonic() // self.slice_seconds)
+        for old in [s for s in self._counts if s <= slice_id - self.slices]:
+            del self._counts[old]
+        for old in [s for s in self._timeout_counts if s <= slice_id - self.slices]:
+            del self._timeout_counts[old]
+        return slice_id
+
+    def _current_slice(self) -> List[int]:
+        slice_id = self._current_slice_id()
+        if slice_id not in self._counts:
+            self._counts[slice_id] = [0] * (len(BUCKET_BOUNDS) + 1)
+        return self._counts[slice_id]
+
+    def observe(self, seconds: float, timed_out: bool = False):
+        """Record one request latency, or one timeout (not a latency sample)"""
+        if timed_out:
+            slice_id = self._current_slice_id()
+            self._timeout_counts[slice_id] = self._timeout_counts.get(slice_id, 0) + 1
+            self.timeouts += 1
+            return
+        self._current_slice()[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.total_count += 1
+
+    def window_timeouts(self) -> int:
+        """Timeouts in the live window"""
+        self._current_slice_id()
+        return sum(self._timeout_counts.values())
+
+    def merged(self) -> List[int]:
+        """Bucket counts summed over the live window"""
+        self._current_slice()
+        merged = [0] * (len(BUCKET_BOUNDS) + 1)
+        for counts in self._counts.values():
+            for i, count in enumerate(counts):
+                merged[i] += count
+        return merged
+
+    def count(self) -> int:
+        return sum(self.merged())
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th percentile (seconds), None if empty"""
+        merged = self.merged()
+        total = sum(merged)
+        if total == 0:
+            return None
+        rank = q / 100 * total
+        running = 0
+        for i, count in enumerate(merged):
+            running += count
+            if running >= rank:
+                return BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else BUCKET_BOUNDS[-1]
+        return BUCKET_BOUNDS[-1]
+
+class LatencyTracker:
+    """
+    Latency histograms keyed by "METHOD /endpoint/{id}" and adaptive timeouts.
+
+    Until an endpoint has min_samples in its window the caller's default timeout
+    is used. After that the timeout is p99 * multiplier + margin, clamped to
+    [floor, ceiling]; the connect timeout is the same budget capped at
+    connect_ceiling. Only completed requests count as samples; timeouts are
+    reported as a separate rate.
+    """
+
+    def __init__(self, window: float = 300.0, min_samples: int = 20, multiplier: float = 1.5,
+                 margin: float = 1.0, floor: float = 2.0, ceiling: float = 60.0,
+                 connect_ceiling: float = 10.0):
+        self.window = window
+        self.min_samples = min_samples
+        self.multiplier = multiplier
+        self.margin = margin
+        self.floor = floor
+        self.ceiling = ceiling
+        self.connect_ceiling = connect_ceiling
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(method: str, path: str) -> str:
+        return f"{method.upper()} {endpoint_template(path)}"
+
+    def histogram(self, method: str, path: str) -> LatencyHistogram:
+        key = self.key(method, path)
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = LatencyHistogram(window=self.window)
+            return self._histograms[key]
+
+    def observe(self, method: str, path: str, seconds: float, timed_out: bool = False):
+        """Record a completed (or timed out) request"""
+        histogram = self.histogram(method, path)
+        with self._lock:
+            histogram.observe(seconds, timed_out)
+
+    def percentile(self, method: str, path: str, q: float) -> Optional[float]:
+        """q-th percentile latency for the endpoint, None until min_samples are seen"""
+        histogram = self.histogram(method, path)
+        with self._lock:
+            if histogram.count() < self.min_samples:
+                return None
+            return histogram.percentile(q)
+
+    def read_timeout(self, method: str, path: str, default: float) -> float:
+        """Adaptive read timeout for the endpoint, or default while warming up"""
+        p99 = self.percentile(method, path, 99)
+        if p99 is None:
+            return default
+        return min(self.ceiling, max(self.floor, p99 * self.multiplier + self.margin))
+
+    def timeouts_for(self, method: str, path: str, default: float) -> Dict[str, float]:
+        """Connect/read/write/pool timeouts in the form accepted by httpx.Timeout"""
+        read = self.read_timeout(method, path, default)
+        return {"connect": min(read, self.connect_ceiling), "read": read, "write": read, "pool": read}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-endpoint percentiles, current timeout and non-empty histogram buckets"""
+        with self._lock:
+            items = list(self._histograms.items())
+        endpoints = {}
+        for key, histogram in items:
+            with self._lock:
+                merged = histogram.merged()
+                window_count = sum(merged)
+                window_timeouts = histogram.window_timeouts()
+                percentiles = {f"p{q}_ms": round(histogram.percentile(q) * 1000, 1)
+                               for q in (50, 95, 99)} if window_count else {}
+            method, path = key.split(" ", 1)
+            endpoints[key] = {
+                "window_count": window_count,
+                "total_count": histogram.total_count,
+                "timeouts": histogram.timeouts,
+                "window_timeouts": window_timeouts,
+                "timeout_rate": round(window_timeouts / (window_count + window_timeouts) * 100, 2)
+                if window_timeouts else 0.0,
+                **percentiles,
+                "adaptive_timeout_s": round(self.read_timeout(method, path, 0.0), 2) or None,
+                "histogram": {
+                    f"le_{BUCKET_BOUNDS[i] * 1000:g}ms" if i < len(BUCKET_BOUNDS) else "le_inf": count
+                    for i, count in enumerate(merged) if count
+                }
+            }
+        return {
+            "window_seconds": self.window,
+            "min_samples": self.min_samples,
+            "timeout_floor_s": self.floor,
+            "timeout_ceiling_s": self.ceiling,
+            "endpoints": endpoints
+        }
@@ -0,0 +1,124 @@
+"""
+Bounded in-process cache (L1) of already-decoded values
+"""
+import fnmatch
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+class _Entry(NamedTuple):
+    value: Any
+    expires_at: float
+    size: int
+
+class LocalCache:
+    """
+    LRU cache bounded by entry count and by approximate size in bytes.
+
+    Each entry carries its own expiry (wall clock, like the expires_at stored
+    in Redis entries); expired entries are dropped when read or when they reach
+    the LRU end. Values are shared, not copied: callers must treat them as
+    read-only. Not thread-safe; it lives on the worker's serving loop.
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.expires_at > time.time()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Value for key, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.time():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def peek(self, key: str) -> Optional[Any]:
+        """Value for key without touching recency or hit counters"""
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.time():
+            return None
+        return entry.value
+
+    def set(self, key: str, value: Any, ttl: float, size: int = 0):
+        """Store value for ttl seconds; size is its approximate footprint (e.g. serialized length)"""
+        if ttl <= 0 or size > self.max_bytes:
+            self.delete(key)
+            return
+        self._remove(key)
+        self._entries[key] = _Entry(value, time.time() + ttl, size)
+        self._bytes += size
+        self._evict()
+
+    def delete(self, key: str) -> bool:
+        return self._remove(key)
+
+    def delete_matching(self, pattern: str) -> int:
+        """Drop every key matching a Redis-style glob pattern"""
+        keys = [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def delete_where(self, predicate: Callable[[Any], bool]) -> List[str]:
+        """Drop every entry whose value satisfies predicate; returns their keys"""
+        keys = [key for key, entry in self._entries.items() if predicate(entry.value)]
+        for key in keys:
+            self._remove(key)
+        return keys
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry.size
+        return True
+
+    def _evict(self):
+        """Drop least recently used entries until within both bounds"""
+        now = time.time()
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key, entry = next(iter(self._entries.items()))
+            self._remove(key)
+            if entry.expires_at <= now:
+                self.expirations += 1
+            else:
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits / lookups) * 100, 2) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
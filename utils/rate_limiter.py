@@ -0,0 +1,258 @@
+"""
+Cluster-wide outbound rate limiting (token bucket shared through Redis)
+"""
+import asyncio
+import contextvars
+import email.utils
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from utils.error_handling import RateLimitExceededError
+from utils.redis_connection import RedisConnectionManager
+
+logger = logging.getLogger(__name__)
+
+# Share of the bucket each priority class must leave untouched. Background work
+# can only spend tokens above half the burst, so interactive calls always find some.
+PRIORITY_RESERVE = {
+    "interactive": 0.0,
+    "background": float(os.getenv("RATE_LIMIT_BACKGROUND_RESERVE", "0.5"))
+}
+
+_current_priority = contextvars.ContextVar("rate_limit_priority", default="interactive")
+
+@contextmanager
+def request_priority(priority: str):
+    """Run outbound calls made inside the block with the given priority class"""
+    if priority not in PRIORITY_RESERVE:
+        raise ValueError(f"Unknown priority class: {priority}")
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+# Atomically refill and take tokens using the Redis server clock, so every
+# instance sees the same bucket. Returns {granted, wait_ms}.
+_ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local reserve = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'blocked_until')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+local blocked_until = tonumber(state[3]) or 0
+if blocked_until > now then
+    return {0, blocked_until - now}
+end
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+local granted = 0
+local wait = 0
+if tokens - cost >= reserve then
+    tokens = tokens - cost
+    granted = 1
+else
+    wait = math.ceil((cost + reserve - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 60000)
+return {granted, wait}
+"""
+
+# Block the bucket until now + ARGV[1] ms (never shortens an existing block)
+_BLOCK_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local blocked_until = now + tonumber(ARGV[1])
+local current = tonumber(redis.call('HGET', KEYS[1], 'blocked_until')) or 0
+if blocked_until > current then
+    redis.call('HSET', KEYS[1], 'blocked_until', blocked_until)
+    redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[1]) + 60000)
+end
+return blocked_until
+"""
+
+class TokenBucketLimiter:
+    """
+    Token bucket for one upstream service, shared by every instance through Redis.
+
+    Tokens refill at `rate` per second up to `burst`. Each priority class may only
+    spend tokens above its reserve, so background work backs off first. A
+    Retry-After from upstream blocks the whole bucket for that long. When Redis is
+    unavailable the same bucket runs in-process while the connection manager
+    reconnects in the background.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, redis_url: Optional[str] = None,
+                 max_wait: float = 30.0, redis_retry_interval: float = 30.0,
+                 manager: Optional[RedisConnectionManager] = None):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.key = f"ratelimit:{name}"
+
+        # In-process fallback bucket
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+
+        # Per-loop pool and reconnects are owned by the manager (shared by the global limiters)
+        if manager is None and redis_url:
+            manager = _limiter_manager(redis_url, redis_retry_interval)
+        self.manager = manager
+
+        self.granted = {priority: 0 for priority in PRIORITY_RESERVE}
+        self.throttled = {priority: 0 for priority in PRIORITY_RESERVE}
+        self.rejected = 0
+        self.retry_after_events = 0
+        self.total_wait = 0.0
+
+    async def acquire(self, cost: float = 1.0, priority: Optional[str] = None,
+                      max_wait: Optional[float] = None):
+        """
+        Wait until `cost` tokens are available for the priority class.
+
+        Raises:
+            RateLimitExceededError: If the wait would exceed max_wait
+        """
+        priority = priority or _current_priority.get()
+        reserve = self.burst * PRIORITY_RESERVE.get(priority, 0.0)
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        waited = False
+
+        while True:
+            wait = await self._try_acquire(cost, reserve)
+            if wait <= 0:
+                self.granted[priority] += 1
+                return
+            if not waited:
+                self.throttled[priority] += 1
+                waited = True
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                self.rejected += 1
+                raise RateLimitExceededError(
+                    f"{self.name} rate limit: no capacity within {max_wait:.0f}s",
+                    retry_after=wait
+                )
+            logger.debug(f"{self.name} rate limiter: {priority} call waiting {wait:.2f}s")
+            self.total_wait += wait
+            await asyncio.sleep(wait)
+
+    async def block_for(self, seconds: float):
+        """Stop handing out tokens for `seconds` (upstream sent Retry-After)"""
+        self.retry_after_events += 1
+        logger.warning(f"{self.name} rate limited upstream, pausing for {seconds:.1f}s")
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        client = await self._get_redis()
+        if client is None:
+            return
+        try:
+            await client.eval(_BLOCK_SCRIPT, 1, self.key, int(seconds * 1000))
+        except Exception as e:
+            self._redis_failed(e)
+
+    async def _try_acquire(self, cost: float, reserve: float) -> float:
+        """Take tokens if possible; otherwise return the seconds to wait"""
+        client = await self._get_redis()
+        if client is not None:
+            try:
+                granted, wait_ms = await client.eval(
+                    _ACQUIRE_SCRIPT, 1, self.key, self.rate, self.burst, cost, reserve
+                )
+                return 0.0 if int(granted) else max(int(wait_ms) / 1000, 0.001)
+            except Exception as e:
+                self._redis_failed(e)
+        return self._try_acquire_local(cost, reserve)
+
+    def _try_acquire_local(self, cost: float, reserve: float) -> float:
+        """In-process version of the acquire script"""
+        now = time.monotonic()
+        if self._blocked_until > now:
+            return self._blocked_until - now
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        if self._tokens - cost >= reserve:
+            self._tokens -= cost
+            return 0.0
+        return (cost + reserve - self._tokens) / self.rate
+
+    async def _get_redis(self):
+        """Redis client for the running loop, or None while Redis is unavailable"""
+        if self.manager is None:
+            return None
+        return await self.manager.get_client()
+
+    def _redis_failed(self, error: Exception):
+        """Use the in-process bucket for this call; connection errors start a reconnect"""
+        logger.warning(f"{self.name} rate limiter using in-process bucket, Redis unavailable: {error}")
+        self.manager.report_failure(error)
+
+    def stats(self) -> Dict[str, Any]:
+        """Limiter settings and counters"""
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "backend": "redis" if self.manager is not None and self.manager.connected else "local",
+            "granted": dict(self.granted),
+            "throttled": dict(self.throttled),
+            "rejected": self.rejected,
+            "retry_after_events": self.retry_after_events,
+            "total_wait_seconds": round(self.total_wait, 3)
+        }
+
+_managers: Dict[str, RedisConnectionManager] = {}
+
+def _limiter_manager(redis_url: str, retry_interval: float) -> RedisConnectionManager:
+    """One connection manager per Redis URL, shared by the limiters using it"""
+    if redis_url not in _managers:
+        _managers[redis_url] = RedisConnectionManager(
+            redis_url,
+            max_connections=int(os.getenv("RATE_LIMIT_REDIS_MAX_CONNECTIONS", "10")),
+            max_backoff=retry_interval,
+            decode_responses=True,
+            socket_timeout=1,
+            socket_connect_timeout=1
+        )
+    return _managers[redis_url]
+
+_redis_url = os.getenv("RATE_LIMIT_REDIS_URL", os.getenv("REDIS_URL"))
+
+# Global limiters, one per upstream service
+habu_rate_limiter = TokenBucketLimiter(
+    "habu",
+    rate=float(os.getenv("HABU_RATE_LIMIT_RPS", "10")),
+    burst=float(os.getenv("HABU_RATE_LIMIT_BURST", "20")),
+    redis_url=_redis_url,
+    max_wait=float(os.getenv("HABU_RATE_LIMIT_MAX_WAIT", "30"))
+)
+openai_rate_limiter = TokenBucketLimiter(
+    "openai",
+    rate=float(os.getenv("OPENAI_RATE_LIMIT_RPS", "3")),
+    burst=float(os.getenv("OPENAI_RATE_LIMIT_BURST", "6")),
+    redis_url=_redis_url,
+    max_wait=float(os.getenv("OPENAI_RATE_LIMIT_MAX_WAIT", "30"))
+)
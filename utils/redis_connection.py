@@ -0,0 +1,205 @@
+"""
+Redis connection lifecycle: one pool per worker loop, background reconnect, health
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import redis.asyncio as redis
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the connection (not the command) is broken
+CONNECTION_ERRORS = (RedisConnectionError, RedisTimeoutError, ConnectionError, OSError, asyncio.TimeoutError)
+
+class RedisConnectionManager:
+    """
+    Owns the Redis connection pool for this worker process.
+
+    The pool and client are bound to the event loop that created them; a call
+    from a different loop (or after a fork) builds a fresh pool instead of
+    reusing a dead one. A second pool with decode_responses=False serves
+    binary values (get_binary_client); both share the connection state.
+    When Redis is unreachable a single background task retries with jittered
+    exponential backoff, and `connected` reflects the latest known state
+    rather than the result of the first connect.
+    """
+
+    def __init__(self, url: str, min_backoff: float = 1.0, max_backoff: float = 30.0,
+                 max_connections: int = 20, **client_kwargs: Any):
+        self.url = url
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.max_connections = max_connections
+        self.client_kwargs = client_kwargs
+
+        self.connected = False
+        self._client: Optional[redis.Redis] = None
+        self._pool: Optional[redis.ConnectionPool] = None
+        self._binary_client: Optional[redis.Redis] = None
+        self._binary_pool: Optional[redis.ConnectionPool] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pid: Optional[int] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        self.last_error: Optional[str] = None
+        self.last_connected_at: Optional[float] = None
+        self.last_failure_at: Optional[float] = None
+        self.reconnect_attempts = 0
+        self.reconnects = 0
+
+    async def connect(self) -> bool:
+        """Build the pool for the running loop and check it with PING"""
+        self._closed = False
+        self._bind_to_running_loop()
+        try:
+            await self._client.ping()
+        except Exception as e:
+            self._mark_down(e)
+            return False
+        self._mark_up()
+        return True
+
+    async def get_client(self) -> Optional[redis.Redis]:
+        """Client for the running loop, or None while Redis is down"""
+        if self._closed:
+            return None
+        if self._client is None or self._loop is not asyncio.get_running_loop() or self._pid != os.getpid():
+            # First use on this loop/process: connect now (fast fail, reconnect in background)
+            if not await self.connect():
+                return None
+        return self._client if self.connected else None
+
+    async def get_binary_client(self) -> Optional[redis.Redis]:
+        """Like get_client, but replies are bytes (for values that aren't text)"""
+        if await self.get_client() is None:
+            return None
+        return self._binary_client
+
+    def report_failure(self, error: Exception):
+        """Record a failed command; connection-level errors start a reconnect"""
+        if isinstance(error, CONNECTION_ERRORS):
+            self._mark_down(error)
+
+    async def disconnect(self):
+        """Stop reconnecting and close the pool"""
+        self._closed = True
+        task = self._reconnect_task
+        if task is not None and not task.done():
+            task.cancel()
+        self._reconnect_task = None
+        clients = (self._client, self._binary_client)
+        self._client = self._pool = self._binary_client = self._binary_pool = None
+        self.connected = False
+        if self._loop is asyncio.get_running_loop():
+            for client in clients:
+                if client is not None:
+                    await client.aclose(close_connection_pool=True)
+
+    def _bind_to_running_loop(self):
+        """Create the pool and client on the running loop, dropping ones from a dead loop"""
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._loop is loop and self._pid == os.getpid():
+            return
+        if self._client is not None:
+            logger.info("Redis client belongs to another event loop or process, creating a new pool")
+            task = self._reconnect_task
+            if task is not None and not task.done() and self._pid == os.getpid() and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(task.cancel)
+        self._pool = redis.ConnectionPool.from_url(
+            self.url, max_connections=self.max_connections, **self.client_kwargs
+        )
+        self._client = redis.Redis(connection_pool=self._pool)
+        self._binary_pool = redis.ConnectionPool.from_url(
+            self.url, max_connections=self.max_connections, **{**self.client_kwargs, "decode_responses": False}
+        )
+        self._binary_client = redis.Redis(connection_pool=self._binary_pool)
+        self._loop = loop
+        self._pid = os.getpid()
+        self._reconnect_task = None
+
+    def _mark_up(self):
+        if not self.connected and self.last_connected_at is not None:
+            self.reconnects += 1
+            logger.info("✅ Redis connection restored")
+        self.connected = True
+        self.last_connected_at = time.time()
+        self.reconnect_attempts = 0
+
+    def _mark_down(self, error: Exception):
+        if self.connected:
+            logger.warning(f"⚠️ Redis connection lost: {error}")
+        self.connected = False
+        self.last_error = f"{type(error).__name__}: {error}"
+        self.last_failure_at = time.time()
+        self._schedule_reconnect()
+
+    def _schedule_reconnect(self):
+        """Start the background reconnect unless one is already running on this loop"""
+        if self._closed:
+            return
+        task = self._reconnect_task
+        if task is not None and not task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if loop is not self._loop:
+            return
+        self._reconnect_task = loop.create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self):
+        """PING with jittered exponential backoff until Redis answers"""
+        backoff = self.min_backoff
+        client = self._client
+        # Stop if the manager was rebound to another loop in the meantime
+        while not self._closed and not self.connected and self._client is client:
+            await asyncio.sleep(random.uniform(backoff / 2, backoff))
+            self.reconnect_attempts += 1
+            try:
+                await client.ping()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.last_failure_at = time.time()
+                logger.debug(f"Redis reconnect attempt {self.reconnect_attempts} failed: {e}")
+                backoff = min(self.max_backoff, backoff * 2)
+                continue
+            self._mark_up()
+
+    def _pool_counts(self, pool: Optional[redis.ConnectionPool]) -> Dict[str, Any]:
+        if pool is None:
+            return {"max_connections": self.max_connections, "in_use": 0, "available": 0}
+        return {
+            "max_connections": pool.max_connections,
+            "in_use": len(getattr(pool, "_in_use_connections", ())),
+            "available": len(getattr(pool, "_available_connections", ()))
+        }
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection counts for the current pool (the binary pool's under "binary")"""
+        return {**self._pool_counts(self._pool), "binary": self._pool_counts(self._binary_pool)}
+
+    def health(self) -> Dict[str, Any]:
+        """Connection and pool health for monitoring endpoints"""
+        parts = urlsplit(self.url)
+        # Drop credentials from the URL
+        safe_url = urlunsplit(parts._replace(netloc=(parts.hostname or "") + (f":{parts.port}" if parts.port else "")))
+        return {
+            "connected": self.connected,
+            "url": safe_url,
+            "pid": self._pid,
+            "last_error": self.last_error,
+            "last_connected_at": self.last_connected_at,
+            "last_failure_at": self.last_failure_at,
+            "reconnecting": self._reconnect_task is not None and not self._reconnect_task.done(),
+            "reconnect_attempts": self.reconnect_attempts,
+            "reconnects": self.reconnects,
+            "pool": self.pool_stats()
+        }
@@ -0,0 +1,258 @@
+"""
+Precomputed HTTP representations of cached API payloads
+
+A cached payload is serialized, hashed and compressed once (identity, gzip and
+brotli) and the result is kept next to its Redis entry and in a small
+in-process map. Repeat requests are answered from those bytes, and a matching
+If-None-Match gets a 304 from the ETag alone, without loading the payload or
+touching the tool layer.
+"""
+import copy
+import gzip
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+from redis_cache import RedisCache, cache
+from utils.tool_result import dumps_bytes
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Bodies smaller than this are sent uncompressed (matches flask_compress' default minimum)
+MIN_COMPRESS_SIZE = 500
+
+# Diagnostics that differ on every fetch of unchanged data (fan-out timings, entry ages)
+VOLATILE_FIELDS = frozenset({"elapsed_ms", "age_seconds"})
+
+class EncodedResponse:
+    """Serialized body plus its precompressed variants and weak ETag"""
+
+    def __init__(self, etag: str, body: bytes, gzip_body: Optional[bytes] = None,
+                 br_body: Optional[bytes] = None, version: Optional[str] = None,
+                 expires_at: Optional[float] = None, cache_status: str = "MISS"):
+        self.etag = etag
+        self.body = body
+        self.gzip_body = gzip_body
+        self.br_body = br_body
+        self.version = version
+        self.expires_at = expires_at
+        self.cache_status = cache_status
+
+    def select(self, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """Smallest variant the client accepts: (body, Content-Encoding or None)"""
+        accepted = _accepted_encodings(accept_encoding)
+        if self.br_body is not None and "br" in accepted:
+            return self.br_body, "br"
+        if self.gzip_body is not None and "gzip" in accepted:
+            return self.gzip_body, "gzip"
+        return self.body, None
+
+    def headers(self, content_encoding: Optional[str] = None) -> Dict[str, str]:
+        """Response headers shared by both frameworks"""
+        headers = {
+            "ETag": self.etag,
+            "Vary": "Accept-Encoding",
+            "Cache-Control": "no-cache",
+            "X-Cache": self.cache_status
+        }
+        if content_encoding:
+            headers["Content-Encoding"] = content_encoding
+        return headers
+
+    def tagged(self, cache_status: str) -> "EncodedResponse":
+        """Shallow copy with a per-request X-Cache status (the bodies are shared)"""
+        tagged = copy.copy(self)
+        tagged.cache_status = cache_status
+        return tagged
+
+def _accepted_encodings(accept_encoding: Optional[str]) -> set:
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+def _text(value: Union[bytes, str, None]) -> Optional[str]:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+def to_redis_fields(encoded: EncodedResponse) -> Dict[str, Union[str, bytes]]:
+    """Hash fields for an encoded response (bodies as raw bytes, for the binary client)"""
+    return {
+        "etag": encoded.etag,
+        "version": encoded.version or "",
+        "expires_at": str(encoded.expires_at or 0),
+        "body": encoded.body,
+        "gzip": encoded.gzip_body or b"",
+        "br": encoded.br_body or b""
+    }
+
+def from_redis_fields(stored: Dict[Any, Any], expires_at: Optional[float] = None) -> EncodedResponse:
+    """Inverse of to_redis_fields, for a hash read through the binary client"""
+    stored = {_text(name): value for name, value in stored.items()}
+    return EncodedResponse(
+        _text(stored["etag"]),
+        stored["body"],
+        stored.get("gzip") or None,
+        stored.get("br") or None,
+        version=_text(stored.get("version")) or None,
+        expires_at=expires_at
+    )
+
+def without_volatile(payload: Any) -> Any:
+    """Copy of a payload with VOLATILE_FIELDS removed at any depth"""
+    if isinstance(payload, dict):
+        return {key: without_volatile(value) for key, value in payload.items() if key not in VOLATILE_FIELDS}
+    if isinstance(payload, list):
+        return [without_volatile(value) for value in payload]
+    return payload
+
+def content_etag(payload: Any) -> str:
+    """Weak ETag from the payload content (independent of cache metadata and timing diagnostics)"""
+    return f'W/"{hashlib.sha256(dumps_bytes(without_volatile(payload))).hexdigest()[:32]}"'
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """Weak comparison as required for If-None-Match"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+def encode_response(data: Any, metadata: Optional[Dict[str, Any]] = None, version: Optional[str] = None,
+                    expires_at: Optional[float] = None, cache_status: str = "MISS") -> EncodedResponse:
+    """
+    Serialize once and build the compressed variants
+    
+    The ETag covers `data` only, minus its timing diagnostics; `metadata`
+    (cached/cached_at) is merged into the body but doesn't change the validator.
+    """
+    body = dumps_bytes({**data, **metadata} if metadata else data)
+    gzip_body = br_body = None
+    if len(body) >= MIN_COMPRESS_SIZE:
+        gzip_body = gzip.compress(body, compresslevel=6)
+        if brotli is not None:
+            br_body = brotli.compress(body, quality=5)
+    return EncodedResponse(content_etag(data), body, gzip_body, br_body,
+                           version=version, expires_at=expires_at, cache_status=cache_status)
+
+class ResponseCache:
+    """
+    Encoded responses per cache key, in process and in Redis.
+
+    An entry is valid for one version of the underlying cache entry (its
+    cached_at), so a refresh of the data builds a new representation.
+    Variants are stored as raw bytes through the binary client. Invalidating the cache entry drops both copies
+    (they are registered with the cache as derived data), so an old ETag
+    stops matching as soon as its entry is gone.
+    """
+
+    def __init__(self, redis_cache: RedisCache, max_entries: int = 256):
+        self.redis_cache = redis_cache
+        self.max_entries = max_entries
+        self._local: "OrderedDict[str, EncodedResponse]" = OrderedDict()
+        self.stats_counters = {"not_modified": 0, "local_hits": 0, "redis_hits": 0, "encoded": 0}
+        redis_cache.add_derived("resp:", self.evict_where)
+
+    def _redis_key(self, cache_key: str) -> str:
+        return f"resp:{cache_key}"
+
+    def _remember(self, cache_key: str, encoded: EncodedResponse):
+        self._local[cache_key] = encoded
+        self._local.move_to_end(cache_key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    async def fresh_etag(self, cache_key: str) -> Optional[str]:
+        """ETag of the current, unexpired representation (None if unknown or stale)"""
+        encoded = self._local.get(cache_key)
+        if encoded is None:
+            redis_client = await self.redis_cache.manager.get_binary_client()
+            if redis_client is None:
+                return None
+            try:
+                etag, expires_at = await redis_client.hmget(self._redis_key(cache_key), "etag", "expires_at")
+            except Exception as e:
+                self.redis_cache.manager.report_failure(e)
+                return None
+            if not etag or not expires_at:
+                return None
+            return _text(etag) if time.time() < float(expires_at) else None
+        if encoded.expires_at is not None and time.time() >= encoded.expires_at:
+            return None
+        return encoded.etag
+
+    def count_not_modified(self):
+        self.stats_counters["not_modified"] += 1
+
+    async def get_or_encode(self, cache_key: str, data: Any, metadata: Dict[str, Any], version: str,
+                            expires_at: Optional[float], cache_status: str) -> EncodedResponse:
+        """Encoded form of a cached payload version, building and storing it on first use"""
+        encoded = self._local.get(cache_key)
+        if encoded is not None and encoded.version == version:
+            self.stats_counters["local_hits"] += 1
+            self._local.move_to_end(cache_key)
+            return encoded.tagged(cache_status)
+
+        redis_client = await self.redis_cache.manager.get_binary_client()
+        if redis_client is not None:
+            try:
+                stored = await redis_client.hgetall(self._redis_key(cache_key))
+                encoded = from_redis_fields(stored, expires_at) if stored else None
+                if encoded is not None and encoded.version == version:
+                    self.stats_counters["redis_hits"] += 1
+                    self._remember(cache_key, encoded)
+                    return encoded.tagged(cache_status)
+            except Exception as e:
+                self.redis_cache.manager.report_failure(e)
+                logger.warning(f"Encoded response read failed for {cache_key}: {e}")
+
+        encoded = encode_response(data, metadata, version=version, expires_at=expires_at, cache_status=cache_status)
+        self.stats_counters["encoded"] += 1
+        self._remember(cache_key, encoded)
+
+        if redis_client is not None:
+            fields = to_redis_fields(encoded)
+            ttl = max(1, int((expires_at or time.time()) - time.time()) + self.redis_cache.max_stale)
+            try:
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    pipe.hset(self._redis_key(cache_key), mapping=fields)
+                    pipe.expire(self._redis_key(cache_key), ttl)
+                    await pipe.execute()
+            except Exception as e:
+                self.redis_cache.manager.report_failure(e)
+                logger.warning(f"Encoded response write failed for {cache_key}: {e}")
+        return encoded
+
+    def invalidate(self, cache_key: Optional[str] = None):
+        """Forget local representations (Redis copies are versioned and expire on their own)"""
+        if cache_key is None:
+            self._local.clear()
+        else:
+            self._local.pop(cache_key, None)
+
+    def evict_where(self, matches: Callable[[str], bool]) -> int:
+        """Forget local representations whose cache entry key satisfies matches"""
+        keys = [key for key in self._local if matches(self.redis_cache._generate_cache_key('api', key))]
+        for key in keys:
+            del self._local[key]
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._local), "max_entries": self.max_entries, **self.stats_counters}
+
+response_cache = ResponseCache(cache, max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256")))
@@ -0,0 +1,55 @@
+"""
+Request coalescing (single-flight) for identical in-flight calls
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """
+    Collapse identical concurrent calls into one.
+
+    The first caller for a key (the leader) starts the call as a task; callers
+    arriving while it is in flight await the same task and get the same result
+    or exception. Cancelling one awaiter never cancels the shared call.
+    Calls are only shared within one event loop.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run func() once per key at a time and share its outcome"""
+        task = self._calls.get(key)
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+            logger.debug(f"{self.name}: coalesced call for {key}")
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(func())
+        self._calls[key] = task
+        self.leaders += 1
+        task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        """Drop a finished call and mark its exception as retrieved"""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters showing how many calls were coalesced"""
+        total = self.leaders + self.coalesced
+        return {
+            "upstream_calls": self.leaders,
+            "coalesced_calls": self.coalesced,
+            "in_flight": len(self._calls),
+            "coalesced_rate": round((self.coalesced / total) * 100, 2) if total else 0.0
+        }
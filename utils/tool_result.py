@@ -0,0 +1,56 @@
+"""
+Typed tool results and single-pass JSON serialization
+
+Tools return a ToolResult (a dict envelope with "status"/"summary"/...), which
+in-process consumers (the demo API, the chat agents) use directly. The result is
+serialized once, where it leaves the process: the MCP tool boundary
+(to_json) or the HTTP response (dumps_bytes). orjson is used when installed.
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+def _default(obj: Any) -> Any:
+    """Fallback for values neither encoder handles natively (matches json.dumps(default=str))"""
+    return str(obj)
+
+def dumps_bytes(obj: Any, pretty: bool = False) -> bytes:
+    """UTF-8 JSON, compact unless pretty is requested"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+    return dumps(obj, pretty).encode("utf-8")
+
+def dumps(obj: Any, pretty: bool = False) -> str:
+    """JSON text, compact unless pretty is requested"""
+    if orjson is not None:
+        return dumps_bytes(obj, pretty).decode("utf-8")
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=_default)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=_default)
+
+class ToolResult(dict):
+    """
+    Result envelope returned by the Habu tools
+
+    A plain dict subclass, so existing `result["status"]` style access keeps
+    working and it can be cached or returned from a handler without copying.
+    """
+
+    @property
+    def status(self) -> str:
+        return self.get("status", "success")
+
+    @property
+    def ok(self) -> bool:
+        return self.status != "error"
+
+    def to_json(self, pretty: bool = False) -> str:
+        """String form for the MCP boundary"""
+        return dumps(self, pretty)